@@ -4,148 +4,200 @@ Data ingestion module for FoS prediction with Ru (pore pressure ratio) incorpora
 Based on Bishop's Simplified Method with pore pressure.
 """
 
+import csv
+import glob
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+
 import pandas as pd
 import numpy as np
 from pathlib import Path
 
+# Values of the material column (column 1) that mark header rows, not materials
+HEADER_CELLS = {'', 'Material', 'Point 1', 'Point 2', 'Point 3', 'Point 4', 'Point 5',
+                'Point 6', 'Point 7', 'Point 8', 'Point 9', 'Point 10', 'Cohesion (kPa)'}
+
+# Column blocks of the survey sheet: (first column, season, ru_applied). Each
+# block holds cohesion, friction angle, unit weight, FoS and Ru in consecutive
+# columns; the material name of the row is in column 1.
+SURVEY_BLOCKS = (
+    (2, 'pre_monsoon', False),
+    (9, 'pre_monsoon', True),
+    (16, 'post_monsoon', False),
+    (23, 'post_monsoon', True)
+)
+BLOCK_COLUMNS = ['cohesion', 'friction_angle', 'unit_weight', 'fos', 'ru']
+
+# Model features; compact=True stores them as float32
+FEATURE_COLUMNS = ['cohesion', 'friction_angle', 'unit_weight', 'ru']
+# Repeated labels, stored as categories
+CATEGORY_COLUMNS = ['material', 'season']
+# Provenance of records ingested from several files (not part of a record)
+PROVENANCE_COLUMNS = ['site', 'source_file']
+
+# Bump when parsing or cleaning changes, so that datasets cached by another
+# parser version are parsed again
+PARSER_VERSION = 2
+# Parsed-dataset cache directory, next to the source CSV
+CACHE_DIR = '.cache'
+
+# read_csv options of a survey sheet. round_trip parses numbers exactly as
+# float() does, so a value does not depend on whether pandas typed its
+# column (or chunk of rows) as numbers or as text.
+CSV_OPTIONS = {'header': None, 'float_precision': 'round_trip'}
+# CSV rows per chunk in stream_survey_csv
+STREAM_CHUNK_ROWS = 100000
+
+# Manifest of a dataset directory maintained by update_dataset
+DATASET_MANIFEST = 'manifest.json'
+DATASET_FORMAT_VERSION = 1
+
+# Values converted per float64 cast; a chunk holding a value float() rejects
+# is converted value by value
+CONVERT_CHUNK_SIZE = 4096
+
+
+def _float_or_nan(value):
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def _is_number(text):
+    try:
+        float(text)
+        return True
+    except (ValueError, TypeError):
+        return False
+
 
-def load_and_prepare_data(csv_path, include_ru=True):
+def _to_float(column):
     """
-    Load data from CSV and prepare features including Ru values.
-    
+    float() of every value of a column, NaN where float() fails.
+
+    Casting an object array to float64 calls float() on each value in C, so
+    the result is the same as float() (pd.to_numeric rounds long decimals
+    differently and rejects some values float() accepts).
+    """
+    values = column.to_numpy()
+    try:
+        return values.astype(np.float64)
+    except (ValueError, TypeError):
+        pass
+    converted = np.empty(len(values))
+    for start in range(0, len(values), CONVERT_CHUNK_SIZE):
+        chunk = values[start:start + CONVERT_CHUNK_SIZE]
+        try:
+            converted[start:start + CONVERT_CHUNK_SIZE] = chunk.astype(np.float64)
+        except (ValueError, TypeError):
+            converted[start:start + CONVERT_CHUNK_SIZE] = [_float_or_nan(value) for value in chunk]
+    return converted
+
+
+def _material_names(column):
+    """Stripped material name of every row, and a mask of the rows that name a material"""
+    # Only the distinct values are checked: a sheet repeats a few names
+    codes, uniques = pd.factorize(column)
+    names = np.array([str(value).strip() for value in uniques] + [''], dtype=object)
+    is_material = np.array([name not in HEADER_CELLS and not _is_number(name)
+                            for name in names[:-1]] + [False])
+    # Missing values have code -1, i.e. the trailing '' / False entry
+    return names[codes], is_material[codes]
+
+
+def parse_survey_frame(df):
+    """
+    Extract the (material, block) records of a raw survey sheet.
+
+    The blocks are sliced as whole columns: every value column is converted
+    once, and header, blank and numeric rows are masked out for all rows at
+    a time.
+
     Parameters:
     -----------
-    csv_path : str or Path
+    df : pandas.DataFrame
+        The sheet (or a range of its rows) read with header=None
+
+    Returns:
+    --------
+    records : pandas.DataFrame
+        One record per material row and block with a FoS value, in file
+        order (row by row, blocks left to right); duplicates and NaN or
+        non-positive values are not removed yet
+    """
+    materials, is_material = _material_names(df.iloc[:, 1])
+    rows, blocks, values = [], [], {name: [] for name in BLOCK_COLUMNS}
+    for block, (first, season, ru_applied) in enumerate(SURVEY_BLOCKS):
+        fos_col = first + BLOCK_COLUMNS.index('fos')
+        ru_col = first + BLOCK_COLUMNS.index('ru')
+        if df.shape[1] <= fos_col:
+            continue
+        block_rows = np.flatnonzero(is_material & df.iloc[:, fos_col].notna().to_numpy())
+        for offset, name in enumerate(BLOCK_COLUMNS[:-1]):
+            values[name].append(_to_float(df.iloc[block_rows, first + offset]))
+
+        # A missing Ru is 0 (as is a blank one in the first block); a value
+        # float() rejects gives NaN and the record is dropped with the others
+        if df.shape[1] > ru_col:
+            ru_values = df.iloc[block_rows, ru_col]
+            ru = _to_float(ru_values)
+            missing = ru_values.isna().to_numpy(copy=True)
+            if block == 0:
+                failed = np.flatnonzero(np.isnan(ru) & ~missing)
+                missing[failed] = [str(value).strip() == '' for value in ru_values.iloc[failed]]
+            ru[missing] = 0.0
+        else:
+            ru = np.zeros(len(block_rows))
+        values['ru'].append(ru)
+        rows.append(block_rows)
+        blocks.append(np.full(len(block_rows), block))
+
+    if not rows:
+        rows, blocks = [np.empty(0, dtype=np.intp)], [np.empty(0, dtype=np.intp)]
+        values = {name: [np.empty(0)] for name in BLOCK_COLUMNS}
+    # Stable sort by row keeps the blocks of a row left to right
+    rows, blocks = np.concatenate(rows), np.concatenate(blocks)
+    order = np.argsort(rows, kind='stable')
+    rows, blocks = rows[order], blocks[order]
+    seasons = np.array([season for _, season, _ in SURVEY_BLOCKS], dtype=object)
+    ru_applied = np.array([applied for _, _, applied in SURVEY_BLOCKS])
+
+    records = {'material': materials[rows]}
+    records.update((name, np.concatenate(values[name])[order]) for name in BLOCK_COLUMNS)
+    records['season'] = seasons[blocks]
+    records['ru_applied'] = ru_applied[blocks]
+    return pd.DataFrame(records)
+
+
+def parse_survey_csv(csv_path):
+    """
+    Read a survey CSV and return its cleaned dataset.
+
+    Parameters:
+    -----------
+    csv_path : str, Path or file object
         Path to the Overall Data.csv file
-    include_ru : bool
-        Whether to include Ru values as features (default: True)
-    
+
     Returns:
     --------
-    X : pandas.DataFrame
-        Feature matrix with cohesion, friction angle, unit weight, and optionally Ru
-    y : pandas.Series
-        Target variable (FoS values)
+    data_df : pandas.DataFrame
+        Unique records with a positive FoS and no missing value, with
+        categorical material and season
     """
     # Read the CSV file - no headers
-    df = pd.read_csv(csv_path, header=None)
-    
-    # Extract data rows - skip headers
-    # The CSV has multiple sections, we need to parse carefully
-    data_rows = []
-    
-    # Parse the CSV structure
-    for idx, row in df.iterrows():
-        # Skip empty rows or header rows
-        if pd.isna(row.iloc[1]) or str(row.iloc[1]).strip() in ['', 'Material', 'Point 1', 'Point 2', 'Point 3', 
-                                                                   'Point 4', 'Point 5', 'Point 6', 'Point 7', 
-                                                                   'Point 8', 'Point 9', 'Point 10', 'Cohesion (kPa)']:
-            continue
-        
-        # Look for material rows with numerical cohesion value
-        try:
-            material_name = str(row.iloc[1]).strip()
-            
-            # Try to convert to float - if it's a material name, this will fail
-            try:
-                float(material_name)
-                continue  # Skip if it's a number (not a material name)
-            except (ValueError, TypeError):
-                pass  # It's likely a material name
-            
-            # Pre-monsoon without Ru (columns 1-6)
-            if not pd.isna(row.iloc[5]) and row.iloc[5] != '':  # FoS value exists
-                try:
-                    cohesion = float(row.iloc[2])
-                    friction_angle = float(row.iloc[3])
-                    unit_weight = float(row.iloc[4])
-                    fos = float(row.iloc[5])
-                    ru = float(row.iloc[6]) if not pd.isna(row.iloc[6]) and str(row.iloc[6]).strip() != '' else 0.0
-                    
-                    data_rows.append({
-                        'material': material_name,
-                        'cohesion': cohesion,
-                        'friction_angle': friction_angle,
-                        'unit_weight': unit_weight,
-                        'fos': fos,
-                        'ru': ru,
-                        'season': 'pre_monsoon',
-                        'ru_applied': False
-                    })
-                except (ValueError, TypeError):
-                    pass
-            
-            # Pre-monsoon with Ru (columns 8-13)
-            if len(row) > 12 and not pd.isna(row.iloc[12]):
-                try:
-                    cohesion = float(row.iloc[9])
-                    friction_angle = float(row.iloc[10])
-                    unit_weight = float(row.iloc[11])
-                    fos = float(row.iloc[12])
-                    ru = float(row.iloc[13]) if len(row) > 13 and not pd.isna(row.iloc[13]) else 0.0
-                    
-                    data_rows.append({
-                        'material': material_name,
-                        'cohesion': cohesion,
-                        'friction_angle': friction_angle,
-                        'unit_weight': unit_weight,
-                        'fos': fos,
-                        'ru': ru,
-                        'season': 'pre_monsoon',
-                        'ru_applied': True
-                    })
-                except (ValueError, TypeError):
-                    pass
-            
-            # Post-monsoon without Ru (columns 15-20)
-            if len(row) > 19 and not pd.isna(row.iloc[19]):
-                try:
-                    cohesion = float(row.iloc[16])
-                    friction_angle = float(row.iloc[17])
-                    unit_weight = float(row.iloc[18])
-                    fos = float(row.iloc[19])
-                    ru = float(row.iloc[20]) if len(row) > 20 and not pd.isna(row.iloc[20]) else 0.0
-                    
-                    data_rows.append({
-                        'material': material_name,
-                        'cohesion': cohesion,
-                        'friction_angle': friction_angle,
-                        'unit_weight': unit_weight,
-                        'fos': fos,
-                        'ru': ru,
-                        'season': 'post_monsoon',
-                        'ru_applied': False
-                    })
-                except (ValueError, TypeError):
-                    pass
-            
-            # Post-monsoon with Ru (columns 22-27)
-            if len(row) > 26 and not pd.isna(row.iloc[26]):
-                try:
-                    cohesion = float(row.iloc[23])
-                    friction_angle = float(row.iloc[24])
-                    unit_weight = float(row.iloc[25])
-                    fos = float(row.iloc[26])
-                    ru = float(row.iloc[27]) if len(row) > 27 and not pd.isna(row.iloc[27]) else 0.0
-                    
-                    data_rows.append({
-                        'material': material_name,
-                        'cohesion': cohesion,
-                        'friction_angle': friction_angle,
-                        'unit_weight': unit_weight,
-                        'fos': fos,
-                        'ru': ru,
-                        'season': 'post_monsoon',
-                        'ru_applied': True
-                    })
-                except (ValueError, TypeError):
-                    pass
-                    
-        except (ValueError, IndexError, TypeError):
-            continue
+    df = pd.read_csv(csv_path, **CSV_OPTIONS)
     
-    # Create DataFrame
-    data_df = pd.DataFrame(data_rows)
+    # The CSV has multiple sections; parse the four column blocks of every
+    # material row
+    data_df = parse_survey_frame(df)
     
     # Remove duplicates
     data_df = data_df.drop_duplicates()
@@ -159,11 +211,528 @@ def load_and_prepare_data(csv_path, include_ru=True):
     # Reset index
     data_df = data_df.reset_index(drop=True)
     
+    return data_df.astype({name: 'category' for name in CATEGORY_COLUMNS})
+
+
+def record_hashes(records):
+    """64-bit hash of every record, equal for records drop_duplicates treats as equal"""
+    # drop_duplicates treats -0.0 and 0.0 as equal; adding 0.0 maps -0.0 to 0.0
+    floats = records.select_dtypes('float').columns
+    normalized = records.assign(**{name: records[name] + 0.0 for name in floats})
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+
+class SeenRecords:
+    """
+    Hashes of the records kept so far, to deduplicate across chunks.
+
+    The 64-bit hashes are kept in a sorted array, i.e. 8 bytes per distinct
+    record. Two different records get the same hash with probability about
+    n^2 / 2^65 (3e-6 for 10^7 records).
+    """
+
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def first_seen(self, records):
+        """Mask of the records not seen in an earlier chunk or earlier in this one (then remembered)"""
+        hashes = record_hashes(records)
+        unique, first = np.unique(hashes, return_index=True)
+        position = np.searchsorted(self.hashes, unique)
+        known = np.zeros(len(unique), dtype=bool)
+        if len(self.hashes):
+            known = self.hashes[np.minimum(position, len(self.hashes) - 1)] == unique
+        self.hashes = np.insert(self.hashes, position[~known], unique[~known])
+        mask = np.zeros(len(records), dtype=bool)
+        mask[first[~known]] = True
+        return mask
+
+
+def _csv_width(csv_path):
+    """
+    Column count for reading a CSV in chunks: the first line's, and at least
+    the survey layout's. Without it every chunk takes its width from its own
+    first row, and a chunk starting on a short row (exports drop trailing
+    empty cells) fails on the longer rows after it.
+    """
+    with open(csv_path, newline='') as f:
+        first = next(csv.reader(f), [])
+    return max(len(first), SURVEY_BLOCKS[-1][0] + len(BLOCK_COLUMNS))
+
+
+def stream_survey_csv(csv_path, output_path, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Parse a survey CSV chunk by chunk into a Parquet dataset (requires pyarrow).
+
+    Each chunk of CSV rows is parsed, its records with a NaN or a FoS <= 0
+    are dropped, records already written are skipped, and the rest is
+    appended to the output as a row group. Memory stays at about one chunk
+    plus 8 bytes per distinct record however large the CSV is, and the
+    dataset holds the same records, in the same order, as parse_survey_csv.
+
+    Parameters:
+    -----------
+    csv_path : str, Path or file object
+        Path to the survey CSV
+    output_path : str or Path
+        Parquet file to write (replaced once complete)
+    chunk_rows : int
+        CSV rows per chunk (default: STREAM_CHUNK_ROWS)
+
+    Returns:
+    --------
+    summary : dict
+        CSV rows read, chunks, records written, duplicates and invalid
+        records skipped
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Fixed, so that every chunk (an empty one too) writes the same schema
+    types = {'material': pa.string(), 'season': pa.string(), 'ru_applied': pa.bool_()}
+    schema = pa.schema([(name, types.get(name, pa.float64()))
+                        for name in ['material'] + BLOCK_COLUMNS + ['season', 'ru_applied']])
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output_path.with_name(f'.{output_path.name}.{os.getpid()}.tmp')
+    seen = SeenRecords()
+    summary = {'rows': 0, 'chunks': 0, 'records': 0, 'duplicates': 0, 'invalid': 0}
+    try:
+        with pq.ParquetWriter(tmp, schema) as writer, \
+                pd.read_csv(csv_path, chunksize=chunk_rows, names=range(_csv_width(csv_path)),
+                            **CSV_OPTIONS) as chunks:
+            for df in chunks:
+                records = parse_survey_frame(df)
+                # Filtering before deduplicating gives the records of
+                # drop_duplicates then filtering: invalid records are dropped either way
+                valid = (records['fos'] > 0) & records.notna().all(axis=1)
+                records = records[valid.to_numpy()]
+                first = seen.first_seen(records)
+                writer.write_table(pa.Table.from_pandas(records[first], schema=schema, preserve_index=False))
+
+                summary['rows'] += len(df)
+                summary['chunks'] += 1
+                summary['records'] += int(first.sum())
+                summary['duplicates'] += int((~first).sum())
+                summary['invalid'] += int((~valid).sum())
+        os.replace(tmp, output_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    print(f"✓ Streamed {summary['rows']} rows in {summary['chunks']} chunks: {summary['records']} records "
+          f"({summary['duplicates']} duplicates, {summary['invalid']} invalid skipped)")
+    return summary
+
+
+def file_digest(path, block_size=1 << 20):
+    """SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def dataset_cache_path(csv_path, cache_dir=None):
+    """
+    Cache file of a survey CSV's parsed dataset.
+
+    The name holds the CSV's content hash and PARSER_VERSION, so an edited
+    sheet or a new parser never reuses an old entry.
+    """
+    csv_path = Path(csv_path)
+    cache_dir = Path(cache_dir) if cache_dir is not None else csv_path.parent / CACHE_DIR
+    return cache_dir / f'{csv_path.stem}.{file_digest(csv_path)[:16]}.v{PARSER_VERSION}.parquet'
+
+
+def read_dataset_cache(cache_path):
+    """The cached dataset, or None if there is none or it cannot be read"""
+    if not cache_path.exists():
+        return None
+    try:
+        data_df = pd.read_parquet(cache_path)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"  ⚠️  Ignoring dataset cache {cache_path.name} ({e})")
+        return None
+    # Streamed datasets store the labels as strings
+    return data_df.astype({name: 'category' for name in CATEGORY_COLUMNS})
+
+
+def write_dataset_cache(data_df, cache_path):
+    """Write a parsed dataset to the cache and remove the older entries of the same CSV"""
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = cache_path.with_name(f'.{cache_path.name}.{os.getpid()}.tmp')
+    try:
+        data_df.to_parquet(tmp, index=False)
+    except ImportError:
+        print("  ⚠️  Dataset cache skipped (needs pyarrow: pip install pyarrow)")
+        return
+    except OSError as e:
+        tmp.unlink(missing_ok=True)
+        print(f"  ⚠️  Dataset cache skipped ({e})")
+        return
+    os.replace(tmp, cache_path)
+    _prune_cache(cache_path)
+
+
+def _prune_cache(cache_path):
+    """Remove the entries of the same CSV other than cache_path"""
+    # <stem>.<digest>.v<version>.parquet
+    stem = cache_path.name.rsplit('.', 3)[0]
+    entry = re.compile(re.escape(stem) + r'\.[0-9a-f]{16}\.v\d+\.parquet')
+    for old in cache_path.parent.iterdir():
+        if old != cache_path and entry.fullmatch(old.name):
+            old.unlink(missing_ok=True)
+
+
+def _load_streamed(csv_path, cache_path, chunk_rows):
+    """Stream a CSV into its cache entry (or a temporary file) and load the result"""
+    with tempfile.TemporaryDirectory() as tmp:
+        output_path = cache_path if cache_path is not None else Path(tmp) / 'dataset.parquet'
+        try:
+            stream_survey_csv(csv_path, output_path, chunk_rows)
+        except ImportError:
+            print("  ⚠️  Streaming skipped (needs pyarrow: pip install pyarrow)")
+            return None
+        if cache_path is not None:
+            _prune_cache(cache_path)
+        return read_dataset_cache(output_path)
+
+
+def _load_dataset(csv_path, use_cache=True, refresh_cache=False, cache_dir=None, chunk_rows=None):
+    """
+    The cleaned dataset of one CSV, from the cache or parsed.
+
+    Returns (data_df, seconds, cached), cached being the cache file read or
+    None if the CSV was parsed.
+    """
+    started = time.perf_counter()
+    data_df = cache_path = None
+    if use_cache and isinstance(csv_path, (str, os.PathLike)):
+        cache_path = dataset_cache_path(csv_path, cache_dir)
+        if not refresh_cache:
+            data_df = read_dataset_cache(cache_path)
+    cached = cache_path if data_df is not None else None
+    if data_df is None and chunk_rows:
+        data_df = _load_streamed(csv_path, cache_path, chunk_rows)
+    if data_df is None:
+        data_df = parse_survey_csv(csv_path)
+        if cache_path is not None:
+            write_dataset_cache(data_df, cache_path)
+    return data_df, time.perf_counter() - started, cached
+
+
+def find_survey_files(sources):
+    """
+    The CSV files of a directory (searched recursively), a glob pattern, a
+    file, or a list of these; sorted, each once.
+    """
+    if isinstance(sources, (str, os.PathLike)):
+        sources = [sources]
+    files = set()
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            files.update(path.rglob('*.csv'))
+        elif _is_pattern(source):
+            files.update(Path(match) for match in glob.glob(str(source), recursive=True))
+        else:
+            files.add(path)
+    return sorted(files)
+
+
+def _is_pattern(source):
+    return re.search(r'[*?[]', str(source)) is not None
+
+
+def _is_multi_source(csv_path):
+    if isinstance(csv_path, (list, tuple)):
+        return True
+    return isinstance(csv_path, (str, os.PathLike)) and (Path(csv_path).is_dir() or _is_pattern(csv_path))
+
+
+def _load_files(files, workers=None, use_cache=True, refresh_cache=False):
+    """_load_dataset of every file, on a process pool: (results in file order, workers used)"""
+    workers = max(1, min(workers or os.cpu_count() or 1, len(files)))
+    arguments = (files, repeat(use_cache), repeat(refresh_cache))
+    if workers == 1:
+        return list(map(_load_dataset, *arguments)), workers
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_load_dataset, *arguments)), workers
+
+
+def _with_provenance(path, data_df):
+    return data_df.assign(site=path.parent.name, source_file=str(path))
+
+
+def _deduplicate(data_df):
+    """
+    Drop the records already in an earlier file (provenance is not part of
+    a record, so the first file keeps it): (dataset, duplicated mask)
+    """
+    duplicated = data_df.duplicated(subset=[name for name in data_df.columns
+                                            if name not in PROVENANCE_COLUMNS]).to_numpy()
+    data_df = data_df[~duplicated].reset_index(drop=True)
+    data_df = data_df.astype({name: 'category' for name in CATEGORY_COLUMNS + PROVENANCE_COLUMNS})
+    return data_df.apply(lambda column: column.cat.remove_unused_categories()
+                         if isinstance(column.dtype, pd.CategoricalDtype) else column), duplicated
+
+
+def ingest_survey_files(sources, workers=None, use_cache=True, refresh_cache=False):
+    """
+    Parse many survey CSVs (one per site and campaign) in parallel.
+
+    Each file is loaded in a worker process (from its own dataset cache
+    when unchanged). The datasets are concatenated in file order with
+    provenance columns, then records already seen in an earlier file are
+    dropped, so the result does not depend on which worker finished first.
+
+    Parameters:
+    -----------
+    sources : str, Path or list
+        Directory (searched recursively for *.csv), glob pattern or files
+    workers : int, optional
+        Worker processes (default: CPU count, at most one per file)
+    use_cache : bool
+        Read and write each file's parsed-dataset cache (default: True)
+    refresh_cache : bool
+        Parse every file even if it is cached
+
+    Returns:
+    --------
+    data_df : pandas.DataFrame
+        The records of all files, with categorical 'site' (the name of the
+        directory holding the file) and 'source_file' (its path)
+    report : list of dict
+        Per file: source_file, site, records, duplicates (records dropped
+        as already in an earlier file), seconds and cached
+    """
+    files = find_survey_files(sources)
+    if not files:
+        raise FileNotFoundError(f'No survey CSV files in {sources}')
+    started = time.perf_counter()
+    results, workers = _load_files(files, workers, use_cache, refresh_cache)
+
+    frames = [_with_provenance(path, data_df) for path, (data_df, _, _) in zip(files, results)]
+    data_df, duplicated = _deduplicate(pd.concat(frames, ignore_index=True))
+
+    report = []
+    source = np.repeat(np.arange(len(files)), [len(frame) for frame in frames])
+    file_duplicates = np.bincount(source[duplicated], minlength=len(files))
+    for path, frame, dropped, (_, seconds, cached) in zip(files, frames, file_duplicates.tolist(), results):
+        report.append({'source_file': str(path), 'site': path.parent.name, 'records': len(frame) - dropped,
+                       'duplicates': dropped, 'seconds': seconds, 'cached': cached is not None})
+        timing = 'cached' if cached is not None else f'{seconds:.2f} s'
+        print(f"  • {path}: {report[-1]['records']} records, {dropped} duplicates ({timing})")
+    print(f"✓ Ingested {len(files)} files on {workers} worker(s) in {time.perf_counter() - started:.2f} s: "
+          f"{len(data_df)} records, {int(duplicated.sum())} duplicates across files")
+    return data_df, report
+
+
+def _read_dataset(dataset_dir):
+    """The manifest and per-file records of a dataset directory, or (None, None)"""
+    manifest_path = Path(dataset_dir) / DATASET_MANIFEST
+    if not manifest_path.exists():
+        return None, None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != DATASET_FORMAT_VERSION:
+        raise ValueError(f"Unsupported dataset format version: {manifest.get('format_version')}")
+    return manifest, pd.read_parquet(Path(dataset_dir) / manifest['records_file'])
+
+
+def load_dataset(dataset_dir):
+    """
+    The dataset of a directory maintained by update_dataset: the records of
+    all its files, without records already in an earlier file (the same
+    result as ingest_survey_files on those files).
+    """
+    manifest, records = _read_dataset(dataset_dir)
+    if manifest is None:
+        raise FileNotFoundError(f'No {DATASET_MANIFEST} in {dataset_dir}')
+    return _deduplicate(records)[0]
+
+
+def update_dataset(sources, dataset_dir, workers=None, use_cache=True):
+    """
+    Bring a dataset directory up to date with a set of survey CSVs.
+
+    The directory holds the records of every file (each file deduplicated
+    on its own) and a manifest of each file's SHA-256, site and record
+    count. Only files that are new or whose hash changed are parsed (in
+    parallel); the records of changed and deleted files are dropped. A
+    parser version change parses every file again. The records file is
+    written under a new name and the manifest last, so a reader never sees
+    half an update.
+
+    Parameters:
+    -----------
+    sources : str, Path or list
+        Directory (searched recursively for *.csv), glob pattern or files;
+        give them the same way every time, as files are keyed by path
+    dataset_dir : str or Path
+        Dataset directory (created on the first update)
+    workers : int, optional
+        Worker processes (default: CPU count)
+    use_cache : bool
+        Use the parsed-dataset cache of each file (default: True)
+
+    Returns:
+    --------
+    summary : dict
+        added, modified and removed file paths, unchanged file count, the
+        records added to and removed from the dataset load_dataset returns,
+        its record count, changed (whether that dataset changed, i.e.
+        whether models trained on it are stale) and seconds
+    """
+    started = time.perf_counter()
+    dataset_dir = Path(dataset_dir)
+    files = find_survey_files(sources)
+    manifest, records = _read_dataset(dataset_dir)
+    previous = manifest['files'] if manifest is not None else {}
+    reparse = manifest is not None and manifest.get('parser_version') != PARSER_VERSION
+    if reparse:
+        print(f"  ⚠️  Dataset parsed by parser version {manifest.get('parser_version')}; parsing every file again")
+
+    digests = {str(path): file_digest(path) for path in files}
+    added = [path for path in files if str(path) not in previous]
+    modified = [path for path in files if str(path) in previous
+                and (reparse or previous[str(path)]['sha256'] != digests[str(path)])]
+    removed = sorted(name for name in previous if name not in digests)
+    unchanged = len(files) - len(added) - len(modified)
+    summary = {
+        'added': [str(path) for path in added],
+        'modified': [str(path) for path in modified],
+        'removed': removed,
+        'unchanged': unchanged,
+        'records_added': 0,
+        'records_removed': 0,
+        'records': None,
+        'changed': False
+    }
+    if manifest is not None and not (added or modified or removed):
+        summary['records'] = manifest['records']
+        summary['seconds'] = time.perf_counter() - started
+        print(f"✓ Dataset up to date ({unchanged} files, {manifest['records']} records)")
+        return summary
+    if not files and manifest is None:
+        raise FileNotFoundError(f'No survey CSV files in {sources}')
+
+    parse = added + modified
+    results, workers = _load_files(parse, workers, use_cache) if parse else ([], 0)
+    frames = [_with_provenance(path, data_df) for path, (data_df, _, _) in zip(parse, results)]
+    if records is not None:
+        stale = set(removed) | {str(path) for path in modified}
+        frames.insert(0, records[~records['source_file'].astype(str).isin(stale).to_numpy()])
+    updated = pd.concat(frames, ignore_index=True)
+    # Keep the records in path order, as ingest_survey_files does
+    rank = {str(path): i for i, path in enumerate(files)}
+    order = np.argsort(updated['source_file'].astype(str).map(rank).to_numpy(), kind='stable')
+    updated = updated.iloc[order].reset_index(drop=True)
+    updated = updated.astype({name: 'category' for name in CATEGORY_COLUMNS + PROVENANCE_COLUMNS})
+
+    # The diff is taken on the deduplicated datasets, i.e. what a model is trained on
+    after = record_hashes(_deduplicate(updated)[0].drop(columns=PROVENANCE_COLUMNS))
+    before = np.empty(0, dtype=np.uint64)
+    if records is not None and len(records):
+        before = record_hashes(_deduplicate(records)[0].drop(columns=PROVENANCE_COLUMNS))
+    summary['records_added'] = int((~np.isin(after, before)).sum())
+    summary['records_removed'] = int((~np.isin(before, after)).sum())
+    summary['records'] = len(after)
+    summary['changed'] = bool(summary['records_added'] or summary['records_removed'])
+
+    generation = manifest['generation'] + 1 if manifest is not None else 1
+    counts = updated['source_file'].astype(str).value_counts()
+    new_manifest = {
+        'format_version': DATASET_FORMAT_VERSION,
+        'parser_version': PARSER_VERSION,
+        'generation': generation,
+        'updated': datetime.now().isoformat(timespec='seconds'),
+        'records_file': f'records-{generation:06d}.parquet',
+        'records': summary['records'],
+        'files': {
+            str(path): {'sha256': digests[str(path)], 'site': path.parent.name,
+                        'records': int(counts.get(str(path), 0))}
+            for path in files
+        }
+    }
+    dataset_dir.mkdir(parents=True, exist_ok=True)
+    updated.to_parquet(dataset_dir / new_manifest['records_file'], index=False)
+    tmp = dataset_dir / f'.{DATASET_MANIFEST}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(dict(new_manifest, last_update=summary), f, indent=2)
+    os.replace(tmp, dataset_dir / DATASET_MANIFEST)
+    if manifest is not None:
+        (dataset_dir / manifest['records_file']).unlink(missing_ok=True)
+
+    summary['seconds'] = time.perf_counter() - started
+    for label, paths in (('+', summary['added']), ('~', summary['modified'])):
+        for path in paths:
+            print(f"  {label} {path}: {new_manifest['files'][path]['records']} records")
+    for path in removed:
+        print(f"  - {path}: {previous[path]['records']} records")
+    print(f"✓ Dataset updated in {summary['seconds']:.2f} s: {len(added)} added, {len(modified)} modified, "
+          f"{len(removed)} removed, {unchanged} unchanged files; "
+          f"+{summary['records_added']} / -{summary['records_removed']} records ({summary['records']} total)")
+    return summary
+
+
+def load_and_prepare_data(csv_path, include_ru=True, use_cache=True, refresh_cache=False,
+                          cache_dir=None, compact=False, chunk_rows=None, workers=None):
+    """
+    Load data from CSV and prepare features including Ru values.
+    
+    The parsed dataset is cached as Parquet (in .cache/ next to the CSV) and
+    reused while the CSV's contents and PARSER_VERSION are unchanged.
+    
+    Parameters:
+    -----------
+    csv_path : str or Path
+        Path to the Overall Data.csv file; a directory, glob pattern or list
+        of files is ingested with ingest_survey_files, and a dataset
+        directory of update_dataset is loaded with load_dataset
+    include_ru : bool
+        Whether to include Ru values as features (default: True)
+    use_cache : bool
+        Read and write the parsed-dataset cache (default: True; needs pyarrow)
+    refresh_cache : bool
+        Parse the CSV even if it is cached, and replace the cache entry
+    cache_dir : str or Path, optional
+        Cache directory (default: .cache next to the CSV)
+    compact : bool
+        Return the features as float32 (half the memory; the values differ
+        from the float64 ones after about 7 digits)
+    chunk_rows : int, optional
+        Parse the CSV in chunks of this many rows with stream_survey_csv,
+        so that memory peaks at the dataset plus one chunk instead of
+        several times the CSV
+    workers : int, optional
+        Worker processes for several files (default: CPU count)
+    
+    Returns:
+    --------
+    X : pandas.DataFrame
+        Feature matrix with cohesion, friction angle, unit weight, and optionally Ru
+    y : pandas.Series
+        Target variable (FoS values)
+    """
+    if isinstance(csv_path, (str, os.PathLike)) and (Path(csv_path) / DATASET_MANIFEST).exists():
+        data_df = load_dataset(csv_path)
+    elif _is_multi_source(csv_path):
+        data_df, _ = ingest_survey_files(csv_path, workers, use_cache, refresh_cache)
+    else:
+        data_df, _, cached = _load_dataset(csv_path, use_cache, refresh_cache, cache_dir, chunk_rows)
+        if cached is not None:
+            print(f"✓ Parsed data loaded from cache ({cached.name})")
+    if compact:
+        data_df = data_df.astype({name: np.float32 for name in FEATURE_COLUMNS})
+    
     # Prepare features and target
     if include_ru:
-        X = data_df[['cohesion', 'friction_angle', 'unit_weight', 'ru']]
+        X = data_df[FEATURE_COLUMNS]
     else:
-        X = data_df[['cohesion', 'friction_angle', 'unit_weight']]
+        X = data_df[FEATURE_COLUMNS[:-1]]
     
     y = data_df['fos']
     
@@ -208,10 +777,102 @@ def train_test_split_data(X, y, test_size=0.2, random_state=42):
     return X_train, X_test, y_train, y_test
 
 
+def write_synthetic_survey(csv_path, n_rows, section_rows=10, seed=42):
+    """
+    Write a survey sheet with random values in the layout of Overall Data.csv.
+
+    Every section starts with a 'Point N' row and a header row, followed by
+    material rows holding the four column blocks (the blocks without Ru
+    leave the Ru column blank). Used to benchmark ingestion on large files.
+
+    Parameters:
+    -----------
+    csv_path : str or Path
+        Output file
+    n_rows : int
+        Total rows, header rows included
+    section_rows : int
+        Material rows per section (default: 10)
+    seed : int
+        Random seed
+    """
+    rng = np.random.default_rng(seed)
+    materials = np.array(['Overburden dump', 'Sandstone', 'Shale', 'Coal', 'Clay',
+                          'Weathered sandstone', 'Carbonaceous shale', 'Soil'], dtype=object)
+    header = ['Material', 'Cohesion (kPa)', 'Friction Angle (deg)', 'Unit Weight (kN/m3)', 'FoS', 'Ru']
+    width = SURVEY_BLOCKS[-1][0] + len(BLOCK_COLUMNS)
+    sheet = np.full((n_rows, width), '', dtype=object)
+
+    position = np.arange(n_rows) % (section_rows + 2)
+    point_rows = np.flatnonzero(position == 0)
+    header_rows = np.flatnonzero(position == 1)
+    data_rows = np.flatnonzero(position > 1)
+    sheet[point_rows, 1] = [f'Point {p % 10 + 1}' for p in range(len(point_rows))]
+    sheet[:, 0] = np.arange(1, n_rows + 1).astype(str)
+
+    names = materials[rng.integers(0, len(materials), len(data_rows))]
+    cohesion = rng.uniform(5, 60, len(data_rows))
+    friction = rng.uniform(15, 40, len(data_rows))
+    unit_weight = rng.uniform(16, 24, len(data_rows))
+    for first, season, ru_applied in SURVEY_BLOCKS:
+        sheet[header_rows, first - 1:first + len(BLOCK_COLUMNS)] = header
+        sheet[data_rows, first - 1] = names
+        # The post-monsoon blocks are wetter: less cohesion and friction
+        wet = 0.85 if season == 'post_monsoon' else 1.0
+        ru = rng.uniform(0.1, 0.5, len(data_rows)) if ru_applied else np.zeros(len(data_rows))
+        fos = ((cohesion * wet / (unit_weight * 5) + np.tan(np.radians(friction * wet)) * (1 - ru))
+               * rng.normal(1, 0.05, len(data_rows)))
+        for offset, values in enumerate((cohesion * wet, friction * wet, unit_weight, fos)):
+            sheet[data_rows, first + offset] = ['%.3f' % value for value in values.tolist()]
+        if ru_applied:
+            sheet[data_rows, first + 4] = ['%.2f' % value for value in ru.tolist()]
+    with open(csv_path, 'w', newline='') as f:
+        csv.writer(f).writerows(sheet.tolist())
+
+
 if __name__ == "__main__":
-    # Test the data loading
-    csv_path = Path(__file__).parent / "data" / "Overall Data.csv"
-    X, y, df = load_and_prepare_data(csv_path, include_ru=True)
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Load and summarise a survey sheet')
+    parser.add_argument('csv_path', nargs='?', default=str(Path(__file__).parent / "data" / "Overall Data.csv"),
+                        help='Survey CSV, or a directory or glob pattern of them (default: data/Overall Data.csv)')
+    parser.add_argument('--synthetic', type=int, metavar='ROWS',
+                        help='Load a synthetic sheet of ROWS rows instead (written to a temporary file), '
+                             'parsing it and then loading it from the cache')
+    parser.add_argument('--refresh-cache', action='store_true', help='Parse the CSV even if it is cached')
+    parser.add_argument('--no-cache', action='store_true', help='Neither read nor write the dataset cache')
+    parser.add_argument('--chunk-rows', type=int, metavar='ROWS',
+                        help='Parse the CSV in chunks of ROWS rows (bounded memory)')
+    parser.add_argument('--workers', type=int, help='Worker processes for several CSVs (default: CPU count)')
+    parser.add_argument('--stream', metavar='OUTPUT',
+                        help='Only stream the parsed dataset into the Parquet file OUTPUT')
+    parser.add_argument('--update', metavar='DATASET_DIR',
+                        help='Only bring the dataset directory DATASET_DIR up to date with the CSVs')
+    args = parser.parse_args()
+
+    if args.update:
+        update_dataset(args.csv_path, args.update, workers=args.workers, use_cache=not args.no_cache)
+        raise SystemExit(0)
+
+    if args.stream:
+        started = time.perf_counter()
+        stream_survey_csv(args.csv_path, args.stream, args.chunk_rows or STREAM_CHUNK_ROWS)
+        print(f"✓ Wrote {args.stream} in {time.perf_counter() - started:.2f} s")
+        raise SystemExit(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = args.csv_path
+        if args.synthetic:
+            csv_path = Path(tmp) / 'synthetic.csv'
+            write_synthetic_survey(csv_path, args.synthetic)
+            print(f"✓ Wrote {args.synthetic} synthetic rows")
+        for _ in range(2 if args.synthetic and not args.no_cache else 1):
+            started = time.perf_counter()
+            X, y, df = load_and_prepare_data(csv_path, include_ru=True, use_cache=not args.no_cache,
+                                             refresh_cache=args.refresh_cache, chunk_rows=args.chunk_rows,
+                                             workers=args.workers)
+            print(f"✓ Loaded in {time.perf_counter() - started:.2f} s")
     
     print(f"\n📋 Dataset Info:")
     print(X.describe())
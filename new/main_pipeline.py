@@ -19,7 +19,7 @@ from train_models import FoSModelTrainer
 from generate_visualizations import create_all_visualizations
 
 
-def run_pipeline(csv_path, include_ru=True, test_size=0.2, random_state=42):
+def run_pipeline(csv_path, include_ru=True, test_size=0.2, random_state=42, refresh_cache=False):
     """
     Run the complete ML pipeline for FoS prediction.
     
@@ -33,6 +33,8 @@ def run_pipeline(csv_path, include_ru=True, test_size=0.2, random_state=42):
         Proportion of test data (default: 0.2 = 20%)
     random_state : int
         Random seed for reproducibility
+    refresh_cache : bool
+        Parse the CSV again instead of loading the cached dataset
     """
     
     print("\n" + "="*80)
@@ -42,7 +44,7 @@ def run_pipeline(csv_path, include_ru=True, test_size=0.2, random_state=42):
     
     # Step 1: Load and prepare data
     print("\n📂 STEP 1: Loading Data...")
-    X, y, df = load_and_prepare_data(csv_path, include_ru=include_ru)
+    X, y, df = load_and_prepare_data(csv_path, include_ru=include_ru, refresh_cache=refresh_cache)
     
     # Step 2: Split data
     print("\n✂️  STEP 2: Splitting Data...")
@@ -59,6 +61,10 @@ def run_pipeline(csv_path, include_ru=True, test_size=0.2, random_state=42):
     print("\n🧪 STEP 4: Testing Top Models (GB & XGBoost)...")
     test_results = trainer.test_best_models()
     
+    # Step 4b: Quantile models for prediction intervals, ensemble metrics
+    print("\n📐 STEP 4b: Training Quantile Models...")
+    trainer.train_uncertainty_models()
+    
     # Step 5: Save models and results
     print("\n💾 STEP 5: Saving Models and Results...")
     models_dir = Path(__file__).parent / "models"
@@ -96,6 +102,13 @@ def run_pipeline(csv_path, include_ru=True, test_size=0.2, random_state=42):
 
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Run the FoS prediction pipeline')
+    parser.add_argument('--refresh-cache', action='store_true',
+                        help='Parse Overall Data.csv again instead of loading the cached dataset')
+    args = parser.parse_args()
+    
     # Set paths
     base_dir = Path(__file__).parent.parent
     csv_path = base_dir / "new" / "data" / "Overall Data.csv"
@@ -112,7 +125,8 @@ if __name__ == "__main__":
         csv_path=csv_path,
         include_ru=True,
         test_size=0.2,
-        random_state=42
+        random_state=42,
+        refresh_cache=args.refresh_cache
     )
     
     print("✨ All done! Check the 'models' and 'visualizations' directories for outputs.")
@@ -0,0 +1 @@
+../web-app/backend/model_artifact.py
\ No newline at end of file
@@ -17,6 +17,10 @@ import xgboost as xgb
 import lightgbm as lgb
 import json
 
+# model_artifact.py and tree_engine.py link to the API's own modules
+# (web-app/backend), so the trainer writes exactly what the server loads
+from model_artifact import ARTIFACT_DIR, write_artifact
+
 
 class FoSModelTrainer:
     """
@@ -49,6 +53,9 @@ class FoSModelTrainer:
         self.best_model_name = None
         self.best_model = None
         self.test_results = None
+        self.quantile_models = {}
+        self.quantile_results = None
+        self.ensemble_results = None
         
     def train_all_models(self):
         """Train all models on 80% training data and evaluate."""
@@ -177,6 +184,61 @@ class FoSModelTrainer:
         
         return self.test_results
     
+    def train_uncertainty_models(self, quantiles=(0.05, 0.95)):
+        """
+        Train quantile models for prediction intervals and evaluate the
+        ensemble of the tested models.
+
+        Each quantile model is a Gradient Boosting model with the tuned
+        hyperparameters and the quantile loss, so the interval width follows
+        the local difficulty of the inputs instead of one global RMSE.
+        """
+        if not self.test_results:
+            raise ValueError("Must test models first before training uncertainty models!")
+
+        print("\n" + "="*80)
+        print(f"UNCERTAINTY MODELS - Quantiles {', '.join(f'{q:g}' for q in quantiles)}")
+        print("="*80)
+
+        base_params = self.models['Gradient Boosting'].get_params()
+        for q in quantiles:
+            print(f"\n📊 Training {q:g} quantile model...")
+            model = GradientBoostingRegressor(**dict(base_params, loss='quantile', alpha=q))
+            model.fit(self.X_train_scaled, self.y_train)
+            self.quantile_models[q] = model
+            below = np.mean(self.y_test.values <= model.predict(self.X_test_scaled))
+            print(f"  ✓ Test rows below the quantile: {below:.1%}")
+
+        # Interval coverage of the outermost quantiles on the test data
+        lower = self.quantile_models[min(quantiles)].predict(self.X_test_scaled)
+        upper = self.quantile_models[max(quantiles)].predict(self.X_test_scaled)
+        lower, upper = np.minimum(lower, upper), np.maximum(lower, upper)
+        actual = self.y_test.values
+        self.quantile_results = {
+            'levels': sorted(float(q) for q in quantiles),
+            'test_coverage': float(np.mean((actual >= lower) & (actual <= upper))),
+            'mean_width': float(np.mean(upper - lower))
+        }
+        print(f"\n  ✓ Interval coverage = {self.quantile_results['test_coverage']:.1%} "
+              f"(nominal {max(quantiles) - min(quantiles):.0%})")
+        print(f"  ✓ Mean width = {self.quantile_results['mean_width']:.4f}")
+
+        # Ensemble = mean of the tested models
+        ensemble_pred = np.mean([results['predictions'] for results in self.test_results.values()], axis=0)
+        self.ensemble_results = {
+            'members': list(self.test_results),
+            'r2': float(r2_score(actual, ensemble_pred)),
+            'rmse': float(np.sqrt(mean_squared_error(actual, ensemble_pred))),
+            'mae': float(mean_absolute_error(actual, ensemble_pred))
+        }
+        print(f"\n📊 Ensemble ({' + '.join(self.ensemble_results['members'])}):")
+        print(f"  ✓ R² = {self.ensemble_results['r2']:.4f}")
+        print(f"  ✓ RMSE = {self.ensemble_results['rmse']:.4f}")
+        print(f"  ✓ MAE = {self.ensemble_results['mae']:.4f}")
+        print("="*80)
+
+        return self.quantile_results
+
     def save_models_and_results(self, output_dir):
         """Save all trained models and results."""
         output_dir = Path(output_dir)
@@ -195,6 +257,15 @@ class FoSModelTrainer:
             if model_name in self.models:
                 safe_name = model_name.lower().replace(' ', '_')
                 joblib.dump(self.models[model_name], output_dir / f'best_model_{safe_name}.pkl')
+
+        # Save quantile models (quantile_model_q05.pkl = 5% quantile)
+        for q, model in self.quantile_models.items():
+            joblib.dump(model, output_dir / f'quantile_model_q{round(q * 100):02d}.pkl')
+        
+        # Save the pickle-free serving artifact (compiled trees + scaler as
+        # memory-mappable arrays) before results_summary.json, which makes
+        # the directory a complete model version for the API
+        self.save_serving_artifact(output_dir)
         
         # Save training results as CSV
         training_data = []
@@ -259,7 +330,12 @@ class FoSModelTrainer:
                     for k, v in results.items()
                 }
                 for model_name, results in self.test_results.items()
-            } if self.test_results else None
+            } if self.test_results else None,
+            'ensemble': {
+                'members': self.ensemble_results['members'],
+                'test': {k: self.ensemble_results[k] for k in ('r2', 'rmse', 'mae')}
+            } if self.ensemble_results else None,
+            'quantile_models': self.quantile_results
         }
         
         with open(output_dir / 'results_summary.json', 'w') as f:
@@ -267,6 +343,25 @@ class FoSModelTrainer:
         
         print(f"\n✓ Saved all models and results to {output_dir}")
     
+    def save_serving_artifact(self, output_dir):
+        """
+        Save the tested models and quantile models for the API as flat NumPy
+        arrays plus a manifest (output_dir/artifact, see model_artifact.py),
+        loaded without unpickling.
+        """
+        output_dir = Path(output_dir)
+        models = {}
+        for model_name in self.test_model_names:
+            if model_name in self.models:
+                models[model_name.lower().replace(' ', '_')] = self.models[model_name]
+        sources = [output_dir / 'scaler.pkl'] + [output_dir / f'best_model_{key}.pkl' for key in models]
+        sources += [output_dir / f'quantile_model_q{round(q * 100):02d}.pkl' for q in self.quantile_models]
+        
+        manifest = write_artifact(output_dir / ARTIFACT_DIR, models, self.scaler, self.quantile_models, sources)
+        print(f"  ✓ Saved serving artifact ({len(manifest['models'])} models, "
+              f"{len(manifest['quantiles'])} quantile models)")
+        return manifest
+    
     def get_training_comparison_data(self):
         """Get data for training comparison chart (all models, 80% data)."""
         comparison_data = []
@@ -293,6 +388,7 @@ if __name__ == "__main__":
     trainer = FoSModelTrainer(X_train, y_train, X_test, y_test)
     trainer.train_all_models()
     trainer.test_best_models()
+    trainer.train_uncertainty_models()
     
     # Save results
     trainer.save_models_and_results(Path(__file__).parent / "models")
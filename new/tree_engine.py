@@ -0,0 +1 @@
+../web-app/backend/tree_engine.py
\ No newline at end of file
@@ -4,29 +4,69 @@ Flask API for FoS Prediction
 Serves trained models via REST API
 """
 
-from flask import Flask, request, jsonify
+import time
+
+# Start of the import, for the startup timings reported by /health
+STARTUP_STARTED = time.perf_counter()
+
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import joblib
+import bulk_scoring
+import hmac
+import json
 import numpy as np
+import os
+import shutil
+import tempfile
+import threading
+import wire_format
 from pathlib import Path
+from input_schema import InputSchema, column_to_float
+from inverse_solver import solve_inverse, MODES as INVERSE_SEARCH_MODES, MET_AT_BOUND, NOT_REACHABLE
+from metrics import MetricsRegistry, LAYER_BUCKETS, STAGE_BUCKETS
+from model_registry import EnsembleModel, ModelRegistry, ModelUnavailable, ScaledModel, load_version
+from prediction_cache import PredictionCache
+from reliability import LayerModel, run_simulation, summarise
+from request_coalescer import RequestCoalescer, QueueFullError
+
+STARTUP = {'imports_seconds': round(time.perf_counter() - STARTUP_STARTED, 3)}
 
 app = Flask(__name__)
-CORS(app)  # Enable CORS for frontend
+CORS(app, expose_headers=list(wire_format.HEADERS))  # Enable CORS for frontend
 
-# Load models and scaler
 MODEL_DIR = Path(__file__).parent / 'models'
 
-try:
-    gb_model = joblib.load(MODEL_DIR / 'best_model_gradient_boosting.pkl')
-    xgb_model = joblib.load(MODEL_DIR / 'best_model_xgboost.pkl')
-    scaler = joblib.load(MODEL_DIR / 'scaler.pkl')
-    print("Models loaded successfully!")
-except Exception as e:
-    print(f"Error loading models: {e}")
-    print("Please copy model files from ../new/models/ to ./backend/models/")
-    gb_model = None
-    xgb_model = None
-    scaler = None
+# Versioned model directories (one per trainer run); when empty, the flat
+# models/ directory is served as version 'default'
+MODEL_REGISTRY_DIR = Path(os.environ.get('FOS_MODEL_REGISTRY', MODEL_DIR / 'versions'))
+
+# 'model' serves the trained models; 'grid' serves interpolated lookup grids
+# built by lookup_grid.py, without unpickling (or importing) sklearn/xgboost
+SERVING_MODE = os.environ.get('FOS_SERVING_MODE', 'model')
+GRID_DIR = Path(os.environ.get('FOS_GRID_DIR', MODEL_DIR / 'grid'))
+
+# 'compiled' evaluates the trees with the pure-NumPy engine in tree_engine.py
+# (scaler folded into the thresholds); 'native' calls the library predict()
+INFERENCE_ENGINE = os.environ.get('FOS_INFERENCE_ENGINE', 'compiled')
+
+# With the compiled engine, memory-map the pickle-free artifact/ written by
+# the trainer (see model_artifact.py) when a version has one;
+# FOS_MODEL_ARTIFACT=0 always unpickles
+USE_MODEL_ARTIFACT = os.environ.get('FOS_MODEL_ARTIFACT', '1') == '1'
+
+# Extra trainer models (model_<name>.pkl) averaged into "model": "ensemble",
+# e.g. FOS_ENSEMBLE_MEMBERS=random_forest,lightgbm
+ENSEMBLE_MEMBERS = [name.strip() for name in os.environ.get('FOS_ENSEMBLE_MEMBERS', '').split(',') if name.strip()]
+
+# Models loaded in the background after startup, so the first requests to
+# the others are not delayed, e.g. FOS_LAZY_MODELS=xgboost or =ensemble;
+# requests for a model still loading wait up to LAZY_WAIT seconds
+LAZY_MODELS = [name.strip() for name in os.environ.get('FOS_LAZY_MODELS', '').split(',') if name.strip()]
+LAZY_WAIT = float(os.environ.get('FOS_LAZY_WAIT', 30))
+
+# Seeded random rows added to the warm-up batch every model predicts while
+# it loads; 0 also skips the warm-up requests at startup
+WARMUP_ROWS = int(os.environ.get('FOS_WARMUP_ROWS', 256))
 
 # Model metadata
 MODEL_INFO = {
@@ -50,125 +90,695 @@ MODEL_INFO = {
     }
 }
 
+# Input features in the column order the scaler and models expect
+FEATURE_NAMES = ['cohesion', 'friction_angle', 'unit_weight', 'ru']
 
-@app.route('/')
-def home():
-    """API home endpoint"""
-    return jsonify({
+FEATURE_RANGES = {
+    'cohesion': {'min': 0, 'max': 100, 'unit': 'kPa'},
+    'friction_angle': {'min': 0, 'max': 45, 'unit': 'degrees'},
+    'unit_weight': {'min': 15, 'max': 25, 'unit': 'kN/m³'},
+    'ru': {'min': 0, 'max': 1, 'unit': 'ratio'}
+}
+
+RANGE_ERRORS = {
+    'cohesion': 'Cohesion must be between 0 and 100 kPa',
+    'friction_angle': 'Friction angle must be between 0 and 45 degrees',
+    'unit_weight': 'Unit weight must be between 15 and 25 kN/m³',
+    'ru': 'Ru must be between 0 and 1'
+}
+
+# Safety classes, indexed by np.searchsorted(SAFETY_THRESHOLDS, fos, side='right')
+SAFETY_THRESHOLDS = np.array([1.0, 1.3, 1.5])
+SAFETY_LEVELS = [
+    {'status': 'CRITICAL', 'message': 'Slope is unstable - immediate action required', 'color': 'red'},
+    {'status': 'WARNING', 'message': 'Slope stability is marginal - review required', 'color': 'orange'},
+    {'status': 'CAUTION', 'message': 'Slope is stable but monitor conditions', 'color': 'yellow'},
+    {'status': 'SAFE', 'message': 'Slope is stable', 'color': 'green'}
+]
+
+# Safety level names, indexed by the "safety_class" of compact responses
+SAFETY_STATUSES = [level['status'] for level in SAFETY_LEVELS]
+
+# Optional fields and their values when omitted from a batch record
+BATCH_DEFAULTS = {'ru': 0.0}
+
+# Input schema compiled once from the ranges above; every endpoint validates
+# against it, so all of them enforce the same bounds
+INPUT_SCHEMA = InputSchema(FEATURE_NAMES, FEATURE_RANGES, BATCH_DEFAULTS, RANGE_ERRORS)
+
+# Upper bound on rows (or layers) accepted by a batch request
+MAX_BATCH_SIZE = int(os.environ.get('FOS_MAX_BATCH_SIZE', 10000))
+
+# Monte Carlo limits for /reliability
+RELIABILITY_DEFAULT_SAMPLES = 100000
+RELIABILITY_MAX_SAMPLES = int(os.environ.get('FOS_RELIABILITY_MAX_SAMPLES', 1000000))
+RELIABILITY_MAX_LAYERS = 50
+RELIABILITY_TIME_BUDGET = float(os.environ.get('FOS_RELIABILITY_TIME_BUDGET', 10))
+RELIABILITY_CHUNK_ROWS = int(os.environ.get('FOS_RELIABILITY_CHUNK_ROWS', 262144))
+
+# Parameter sweeps: largest grid accepted, and the size above which the
+# response is streamed row by row instead of encoded in one piece
+SWEEP_DEFAULT_STEPS = 21
+SWEEP_MAX_POINTS = int(os.environ.get('FOS_SWEEP_MAX_POINTS', 250000))
+SWEEP_STREAM_POINTS = int(os.environ.get('FOS_SWEEP_STREAM_POINTS', 10000))
+
+# Sweep payload entries held as NumPy arrays until they are encoded
+SWEEP_ARRAYS = ('fos', 'safety_class')
+
+# Inverse design: default search per solved input ('minimum' = smallest
+# value meeting the target FoS, 'maximum' = largest value still meeting it)
+INVERSE_MODES = {'cohesion': 'minimum', 'friction_angle': 'minimum', 'unit_weight': 'maximum', 'ru': 'maximum'}
+INVERSE_MAX_SECTIONS = int(os.environ.get('FOS_INVERSE_MAX_SECTIONS', 1000))
+
+# Bulk file scoring (/predict/file): rows read, validated and scored per chunk
+UPLOAD_CHUNK_ROWS = int(os.environ.get('FOS_UPLOAD_CHUNK_ROWS', 50000))
+
+# gzip responses of at least COMPRESS_MIN_BYTES for clients that accept it
+# (streamed responses always); FOS_COMPRESS_LEVEL=0 turns compression off
+COMPRESS_MIN_BYTES = int(os.environ.get('FOS_COMPRESS_MIN_BYTES', 1024))
+COMPRESS_LEVEL = int(os.environ.get('FOS_COMPRESS_LEVEL', 5))
+
+
+def load_model_version(name, path):
+    """Registry loader: load, compile and warm up the models in one version directory"""
+    grid_dir = GRID_DIR if Path(path) == MODEL_DIR else None
+    # Only the version loaded at startup defers models; a hot reload loads
+    # and warms up everything before the swap
+    lazy_models = LAZY_MODELS if model_registry.current is None else ()
+    return load_version(name, path, MODEL_INFO, SERVING_MODE, INFERENCE_ENGINE, grid_dir,
+                        warmup_features=WARMUP_FEATURES, n_jobs=os.environ.get('FOS_NATIVE_THREADS'),
+                        ensemble_members=ENSEMBLE_MEMBERS, lazy_models=lazy_models,
+                        use_artifact=USE_MODEL_ARTIFACT)
+
+
+# Range corners and centre plus WARMUP_ROWS random rows, predicted by every
+# model before a version goes live
+WARMUP_FEATURES = np.vstack([
+    [INPUT_SCHEMA.lower, INPUT_SCHEMA.upper, (INPUT_SCHEMA.lower + INPUT_SCHEMA.upper) / 2],
+    np.random.default_rng(0).uniform(INPUT_SCHEMA.lower, INPUT_SCHEMA.upper, (WARMUP_ROWS, len(FEATURE_NAMES)))
+])
+
+# Token required by the /admin endpoints (unset = admin endpoints disabled)
+ADMIN_TOKEN = os.environ.get('FOS_ADMIN_TOKEN')
+
+model_registry = ModelRegistry(
+    MODEL_REGISTRY_DIR,
+    load_model_version,
+    fallback_dir=MODEL_DIR,
+    keep=int(os.environ.get('FOS_MODEL_KEEP', 3)),
+    poll_interval=float(os.environ.get('FOS_MODEL_WATCH_INTERVAL', 0))
+)
+started = time.perf_counter()
+model_registry.start()
+STARTUP['model_load_seconds'] = round(time.perf_counter() - started, 3)
+if model_registry.current is not None:
+    print(f"Models loaded successfully! (version {model_registry.current.name}, "
+          f"{model_registry.current.engine} engine)")
+    print(f"✓ Imports {STARTUP['imports_seconds']:.2f}s, models {STARTUP['model_load_seconds']:.2f}s ("
+          + ', '.join(f'{step} {seconds:.2f}s' for step, seconds in model_registry.current.load_times.items())
+          + ')')
+elif SERVING_MODE == 'grid':
+    print("Build the lookup grids with: python lookup_grid.py")
+else:
+    print("Please copy model files from ../new/models/ to ./backend/models/")
+
+
+# Per-row prediction cache (FOS_CACHE_SIZE=0 disables it)
+prediction_cache = PredictionCache(
+    maxsize=int(os.environ.get('FOS_CACHE_SIZE', 4096)),
+    ttl=float(os.environ.get('FOS_CACHE_TTL', 300)),
+    precision=int(os.environ.get('FOS_CACHE_PRECISION', 6)),
+    fingerprint=lambda: model_registry.current.name if model_registry.current else None
+)
+
+
+# Request, stage and layer-count metrics served at /metrics (FOS_METRICS=0 disables them)
+metrics = MetricsRegistry(enabled=os.environ.get('FOS_METRICS', '1') == '1')
+REQUESTS = metrics.counter(
+    'fos_requests_total', 'HTTP requests by endpoint, method and status', ('endpoint', 'method', 'status'))
+REQUEST_ERRORS = metrics.counter(
+    'fos_request_errors_total', 'Responses with status >= 400 by endpoint and status', ('endpoint', 'status'))
+REQUEST_LATENCY = metrics.histogram(
+    'fos_request_duration_seconds', 'Request latency by endpoint and model', ('endpoint', 'model'))
+STAGE_LATENCY = metrics.histogram(
+    'fos_stage_duration_seconds', 'Time per request stage (parse, validate, scale, predict, serialize, compress)',
+    ('endpoint', 'stage'), STAGE_BUCKETS)
+PREDICTED_ROWS = metrics.counter('fos_predicted_rows_total', 'Feature rows scored, by model', ('model',))
+LAYER_COUNT = metrics.histogram('fos_profile_layers', 'Layers per multi-layer profile', (), LAYER_BUCKETS)
+
+# Endpoint and model labels of the request being handled by this thread
+request_context = threading.local()
+
+
+def observe_stage(stage, started):
+    """Record the time since started (a perf_counter value) for a request stage"""
+    STAGE_LATENCY.observe(time.perf_counter() - started, getattr(request_context, 'endpoint', 'background'), stage)
+
+
+def api_info():
+    """API home payload"""
+    return {
         'message': 'FoS Prediction API',
         'version': '1.0',
         'endpoints': {
             '/predict': 'POST - Make FoS prediction',
+            '/predict/batch': 'POST - Score many records in one request',
+            '/predict/file': 'POST - Score a CSV or Parquet file, streamed back as CSV or NDJSON',
+            '/reliability': 'POST - Monte Carlo probability of failure',
+            '/sweep': 'POST - FoS over a 1-D or 2-D parameter grid',
+            '/inverse': 'POST - Input value required for a target FoS',
             '/models': 'GET - Get model information',
-            '/health': 'GET - Check API health'
+            '/models/versions': 'GET - List model versions',
+            '/health': 'GET - Check API health',
+            '/health/live': 'GET - Liveness probe (the process is serving)',
+            '/health/ready': 'GET - Readiness probe (models loaded and warmed up)',
+            '/metrics': 'GET - Prometheus metrics'
         }
-    })
+    }
+
+
+@app.route('/')
+def home():
+    """API home endpoint"""
+    return jsonify(api_info())
+
+
+def models_loaded():
+    """True when a model version is active"""
+    return model_registry.current is not None
+
+
+def startup_status():
+    """Startup timings, per-step model load times and models still loading in the background"""
+    version = model_registry.current
+    return dict(
+        STARTUP,
+        model_load_steps=dict(version.load_times) if version else {},
+        loading=version.loading() if version else [],
+        load_errors=dict(version.load_errors) if version else {}
+    )
+
+
+def health_status():
+    """Health check payload"""
+    version = model_registry.current
+    loaded = version is not None
+    return {
+        'status': 'healthy' if loaded else 'models not loaded',
+        'models_loaded': loaded,
+        'ready': readiness()[1] == 200,
+        'model_version': version.name if loaded else None,
+        'inference_engine': version.engine if loaded else None,
+        'startup': startup_status(),
+        'cache': prediction_cache.stats(),
+        'coalescer': request_coalescer.stats() if request_coalescer else None
+    }
+
+
+def liveness():
+    """Liveness probe payload: the process is up and answering requests"""
+    return {'status': 'alive', 'uptime_seconds': round(time.perf_counter() - STARTUP_STARTED, 1)}
+
+
+def readiness():
+    """
+    Readiness probe (payload, status): 200 once a model version is active
+    and startup (including the warm-up) has finished, else 503. Models
+    still loading in the background are listed but do not hold readiness
+    back; requests for them wait until they are loaded.
+    """
+    version = model_registry.current
+    if version is None:
+        return {'status': 'not ready', 'reason': 'models not loaded'}, 503
+    if 'ready_seconds' not in STARTUP:
+        return {'status': 'not ready', 'reason': 'starting up'}, 503
+    return {'status': 'ready', 'model_version': version.name, 'loading': version.loading()}, 200
 
 
 @app.route('/health')
 def health():
     """Health check endpoint"""
-    models_loaded = gb_model is not None and xgb_model is not None and scaler is not None
-    return jsonify({
-        'status': 'healthy' if models_loaded else 'models not loaded',
-        'models_loaded': models_loaded
-    })
+    return jsonify(health_status())
 
 
-@app.route('/models')
-def get_models():
-    """Get model information"""
-    return jsonify({
-        'models': MODEL_INFO,
+@app.route('/health/live')
+def health_live():
+    """Liveness probe"""
+    return jsonify(liveness())
+
+
+@app.route('/health/ready')
+def health_ready():
+    """Readiness probe"""
+    payload, status = readiness()
+    return jsonify(payload), status
+
+
+def models_info():
+    """Model information payload (metrics of the active version)"""
+    version = model_registry.current
+    return {
+        'models': version.model_info if version else MODEL_INFO,
+        'model_version': version.name if version else None,
         'features': [
             'Cohesion (kPa)',
             'Friction Angle (degrees)',
             'Unit Weight (kN/m³)',
             'Ru (Pore Pressure Ratio)'
         ],
-        'feature_ranges': {
-            'cohesion': {'min': 0, 'max': 100, 'unit': 'kPa'},
-            'friction_angle': {'min': 0, 'max': 45, 'unit': 'degrees'},
-            'unit_weight': {'min': 15, 'max': 25, 'unit': 'kN/m³'},
-            'ru': {'min': 0, 'max': 1, 'unit': 'ratio'}
+        'feature_ranges': FEATURE_RANGES
+    }
+
+
+@app.route('/models')
+def get_models():
+    """Get model information"""
+    return jsonify(models_info())
+
+
+def resolve_model_key(model_choice):
+    """Normalise a requested model name to a model key"""
+    return model_choice if model_choice in ('xgboost', 'ensemble') else 'gradient_boosting'
+
+
+def resolve_version(data):
+    """
+    The model version a request runs on: the one pinned by its
+    "model_version" field, else the active version.
+
+    Resolve once per request so a hot swap cannot split a request across
+    two versions.
+    """
+    name = data.get('model_version') if isinstance(data, dict) else None
+    if name is None:
+        return model_registry.current
+    try:
+        return model_registry.get(str(name))
+    except KeyError:
+        raise ValueError(f'Unknown model version: {name}')
+
+
+def select_model(model_choice, version=None):
+    """
+    Return (model, display name, metrics) for a model key.
+
+    The model is the lookup grid in grid serving mode, else the compiled
+    TreeEnsemble when one is available, otherwise the loaded estimator
+    wrapped with its scaler. version defaults to the active version. A
+    model still loading in the background is waited for (up to LAZY_WAIT
+    seconds, then ModelUnavailable).
+    """
+    version = version or model_registry.current
+    key = resolve_model_key(model_choice)
+    model = version.model(key, LAZY_WAIT)
+    info = version.model_info[key]
+    return model, info['name'], info
+
+
+def predict_fos(model, features):
+    """Predict FoS for every row of an (N, 4) matrix of raw features"""
+    if isinstance(model, ScaledModel):
+        # Compiled trees and grids have the scaler folded in, so only the
+        # native path has a separate scaling stage
+        started = time.perf_counter()
+        scaled = model.scaler.transform(features)
+        observe_stage('scale', started)
+        started = time.perf_counter()
+        fos = model.estimator.predict(scaled)
+    else:
+        started = time.perf_counter()
+        fos = model.predict(features)
+    observe_stage('predict', started)
+    return np.asarray(fos, dtype=np.float64)
+
+
+def predict_ensemble(ensemble, features):
+    """
+    Evaluate every member and quantile model of an EnsembleModel in one pass.
+
+    Returns (mean FoS, (N, members) member predictions, (N, levels)
+    quantile predictions).
+    """
+    started = time.perf_counter()
+    values = ensemble.predict_all(features)
+    observe_stage('predict', started)
+    members = values[:, :len(ensemble.member_names)]
+    return members.mean(axis=1), members, values[:, len(ensemble.member_names):]
+
+
+def ensemble_interval(ensemble, fos, quantiles, rmse):
+    """
+    Per-row interval (lower, upper, level, method): from the outermost
+    quantile models, or +-1.96 RMSE when the version has none.
+    """
+    interval = interval_summary(ensemble)
+    if interval['method'] == 'quantile':
+        lower = np.minimum(quantiles[:, 0], quantiles[:, -1])
+        upper = np.maximum(quantiles[:, 0], quantiles[:, -1])
+        return lower, upper, interval['level'], interval['method']
+    return np.maximum(0, fos - 1.96 * rmse), fos + 1.96 * rmse, interval['level'], interval['method']
+
+
+def interval_summary(model):
+    """Level and method of the confidence intervals of a model's predictions"""
+    if isinstance(model, EnsembleModel) and len(model.quantile_levels) >= 2:
+        levels = model.quantile_levels
+        return {'level': f'{(levels[-1] - levels[0]) * 100:g}%', 'method': 'quantile'}
+    return {'level': '95%', 'method': 'rmse'}
+
+
+def build_ensemble_predictions(ensemble, features, model_metrics):
+    """Per-row prediction entries for an EnsembleModel"""
+    fos, members, quantiles = predict_ensemble(ensemble, features)
+    lower, upper, level, method = ensemble_interval(ensemble, fos, quantiles, model_metrics['test_rmse'])
+    spread = members.max(axis=1) - members.min(axis=1)
+    std = members.std(axis=1)
+    fos_values = np.round(fos, 4).tolist()
+    lower, upper = np.round(lower, 4).tolist(), np.round(upper, 4).tolist()
+    member_values = np.round(members, 4).tolist()
+    spread, std = np.round(spread, 4).tolist(), np.round(std, 4).tolist()
+    levels = classify_safety(fos).tolist()
+    return [
+        {
+            'fos': fos_values[i],
+            'confidence_interval': {'lower': lower[i], 'upper': upper[i], 'level': level, 'method': method},
+            'ensemble': {
+                'members': dict(zip(ensemble.member_names, member_values[i])),
+                'spread': spread[i],
+                'std': std[i]
+            },
+            'safety': SAFETY_LEVELS[levels[i]]
+        }
+        for i in range(len(fos_values))
+    ]
+
+
+def build_ensemble_entry(prediction, model_name, model_metrics):
+    """Prediction cache entry of one build_ensemble_predictions row"""
+    return {
+        'fos': prediction['fos'],
+        'payload': {
+            'success': True,
+            'prediction': {
+                'fos': prediction['fos'],
+                'confidence_interval': prediction['confidence_interval']
+            },
+            'ensemble': prediction['ensemble'],
+            'safety': prediction['safety'],
+            'model': model_summary(model_name, model_metrics)
+        }
+    }
+
+
+def model_summary(model_name, model_metrics):
+    """The "model" block of a response"""
+    summary = {
+        'name': model_name,
+        'r2_score': model_metrics['test_r2'],
+        'rmse': model_metrics['test_rmse'],
+        'mae': model_metrics['test_mae'],
+        'version': model_metrics['version']
+    }
+    if 'members' in model_metrics:
+        summary['members'] = model_metrics['members']
+    return summary
+
+
+def classify_safety(fos_values):
+    """Map FoS values to indices into SAFETY_LEVELS"""
+    return np.searchsorted(SAFETY_THRESHOLDS, fos_values, side='right')
+
+
+def build_prediction_payload(fos_prediction, model_name, model_metrics):
+    """Single prediction response body, without the echoed inputs"""
+    # Confidence interval (approximate using RMSE)
+    rmse = model_metrics['test_rmse']
+    confidence_lower = float(max(0, fos_prediction - 1.96 * rmse))
+    confidence_upper = float(fos_prediction + 1.96 * rmse)
+    
+    return {
+        'success': True,
+        'prediction': {
+            'fos': round(fos_prediction, 4),
+            'confidence_interval': {
+                'lower': round(confidence_lower, 4),
+                'upper': round(confidence_upper, 4),
+                'level': '95%'
+            }
+        },
+        'safety': SAFETY_LEVELS[classify_safety(fos_prediction)],
+        'model': model_summary(model_name, model_metrics)
+    }
+
+
+def compact_prediction(payload):
+    """Compact form (see wire_format) of a single or multi-layer prediction payload"""
+    prediction = payload['prediction']
+    interval = prediction['confidence_interval']
+    compact = {
+        'success': True,
+        'prediction_type': payload.get('prediction_type', 'single'),
+        'fos': prediction['fos'],
+        'ci_lower': interval['lower'],
+        'ci_upper': interval['upper'],
+        'safety_class': SAFETY_STATUSES.index(payload['safety']['status']),
+        'safety_levels': SAFETY_STATUSES,
+        'model': dict(payload['model'], interval={
+            'level': interval['level'],
+            'method': interval.get('method', 'rmse')
+        })
+    }
+    if 'layers' in payload:
+        compact['layer_fos'] = [layer['fos'] for layer in payload['layers']]
+    if 'ensemble' in payload:
+        compact['members'] = payload['ensemble']['members']
+    return compact
+
+
+# Optional micro-batching of concurrent single-row predictions (FOS_COALESCE=1)
+request_coalescer = None
+if os.environ.get('FOS_COALESCE', '0') == '1':
+    # Rows are grouped by model object, so pinned versions batch separately
+    request_coalescer = RequestCoalescer(
+        predict_fos,
+        max_batch=int(os.environ.get('FOS_COALESCE_MAX_BATCH', 64)),
+        max_wait=float(os.environ.get('FOS_COALESCE_WINDOW_MS', 2)) / 1000,
+        max_queue=int(os.environ.get('FOS_COALESCE_MAX_QUEUE', 1024)),
+        timeout=float(os.environ.get('FOS_COALESCE_TIMEOUT_MS', 1000)) / 1000
+    )
+
+
+def cache_namespace(model_key, version):
+    """Cache key prefix, so results of different model versions never mix"""
+    return f'{version.name}/{model_key}'
+
+
+def predict_cached(model_key, model, features, version=None):
+    """
+    Predict FoS for an (N, 4) matrix, reusing cached per-row results.
+
+    Rows not in the cache are predicted together in one call and stored
+    with their full single-prediction payload (for an EnsembleModel, the
+    same payload as a single /predict request, with the quantile interval
+    and member spread).
+    """
+    if not prediction_cache.enabled:
+        return predict_fos(model, features)
+
+    version = version or model_registry.current
+    keys = prediction_cache.make_keys(cache_namespace(model_key, version), features)
+    fos = np.empty(len(keys))
+    misses = []
+    for i, key in enumerate(keys):
+        entry = prediction_cache.get(key)
+        if entry is None:
+            misses.append(i)
+        else:
+            fos[i] = entry['fos']
+
+    if misses:
+        _, model_name, model_metrics = select_model(model_key, version)
+        if isinstance(model, EnsembleModel):
+            predictions = build_ensemble_predictions(model, features[misses], model_metrics)
+            for i, prediction in zip(misses, predictions):
+                # The cached FoS is rounded like a single request's, so both paths agree
+                entry = build_ensemble_entry(prediction, model_name, model_metrics)
+                fos[i] = entry['fos']
+                prediction_cache.put(keys[i], entry)
+            return fos
+        fos[misses] = predict_fos(model, features[misses])
+        for i in misses:
+            fos_prediction = float(fos[i])
+            prediction_cache.put(keys[i], {
+                'fos': fos_prediction,
+                'payload': build_prediction_payload(fos_prediction, model_name, model_metrics)
+            })
+    return fos
+
+
+def parse_batch_columns(data):
+    """
+    Normalise a batch request into per-feature value lists.
+
+    Accepts a JSON array of records, {"records": [...]} or
+    {"columns": {"cohesion": [...], ...}}. Returns (columns, n_rows, row_errors)
+    where row_errors maps row index -> list of {field, code, message}.
+    """
+    if isinstance(data, dict) and 'columns' in data:
+        raw_columns = data['columns']
+        if not isinstance(raw_columns, dict):
+            raise ValueError('"columns" must be an object of feature arrays')
+        lengths = {len(v) for v in raw_columns.values() if isinstance(v, list)}
+        if len(lengths) > 1:
+            raise ValueError('All columns must have the same length')
+        n_rows = lengths.pop() if lengths else 0
+        columns = {}
+        for field in FEATURE_NAMES:
+            values = raw_columns.get(field)
+            if values is None:
+                values = [None] * n_rows
+            elif not isinstance(values, list):
+                raise ValueError(f'Column "{field}" must be an array')
+            columns[field] = values
+        return columns, n_rows, {}
+
+    records = data.get('records') if isinstance(data, dict) else data
+    if not isinstance(records, list):
+        raise ValueError('Expected a JSON array of records, "records" or "columns"')
+
+    row_errors = {}
+    for idx, record in enumerate(records):
+        if not isinstance(record, dict):
+            row_errors[idx] = [{'field': None, 'code': 'invalid', 'message': 'Record must be a JSON object'}]
+    columns = {
+        field: [record.get(field) if isinstance(record, dict) else None for record in records]
+        for field in FEATURE_NAMES
+    }
+    return columns, len(records), row_errors
+
+
+def evaluate_profiles(profiles, model, model_key, version=None):
+    """
+    Score a ragged batch of layer profiles with a single predict call.
+
+    All layers of all profiles are packed into one (L, 4) matrix, validated
+    and predicted together; each profile's FoS is the unit-weight weighted
+    average of its layer FoS values. Profiles with any invalid layer are
+    not scored. Layers already in the prediction cache are not re-predicted.
+
+    Returns (layers, features, layer_fos, profile_fos, offsets, profile_errors)
+    where profile_errors maps profile index -> list of layer errors.
+    """
+    started = time.perf_counter()
+    lengths = np.array([len(layers) for layers in profiles], dtype=np.intp)
+    offsets = [0] + np.cumsum(lengths).tolist()
+    layers = [layer for profile_layers in profiles for layer in profile_layers]
+    for n_layers in lengths.tolist():
+        LAYER_COUNT.observe(n_layers)
+
+    columns, n_rows, row_errors = parse_batch_columns(layers)
+    features, valid, row_errors = INPUT_SCHEMA.validate(columns, n_rows, row_errors, defaults={})
+    for idx, layer in enumerate(layers):
+        if isinstance(layer, dict) and 'name' not in layer:
+            row_errors.setdefault(idx, []).insert(
+                0, {'field': 'name', 'code': 'missing', 'message': 'Missing required field: name'})
+            valid[idx] = False
+
+    # Profiles with an empty layer list or any invalid layer are rejected as a whole
+    profile_of_row = np.repeat(np.arange(len(profiles)), lengths)
+    rejected = (np.bincount(profile_of_row[~valid], minlength=len(profiles)) > 0) | (lengths == 0)
+    scored = ~rejected[profile_of_row]
+    observe_stage('validate', started)
+
+    layer_fos = np.full(n_rows, np.nan)
+    if scored.any():
+        layer_fos[scored] = predict_cached(model_key, model, features[scored], version)
+        PREDICTED_ROWS.inc(model_key, amount=int(scored.sum()))
+
+    # Weighted average by unit weight, per profile
+    unit_weight = features[:, FEATURE_NAMES.index('unit_weight')]
+    weighted_sum = np.bincount(profile_of_row[scored], weights=layer_fos[scored] * unit_weight[scored],
+                               minlength=len(profiles))
+    total_weight = np.bincount(profile_of_row[scored], weights=unit_weight[scored], minlength=len(profiles))
+    profile_fos = np.divide(weighted_sum, total_weight, out=np.full(len(profiles), np.nan),
+                            where=total_weight > 0)
+
+    profile_errors = {}
+    for p in np.flatnonzero(rejected).tolist():
+        if lengths[p] == 0:
+            profile_errors[p] = [{'layer': None, 'field': None, 'code': 'missing', 'message': 'No layers provided'}]
+            continue
+        profile_errors[p] = [
+            dict(error, layer=row - offsets[p])
+            for row in range(offsets[p], offsets[p + 1]) if row in row_errors
+            for error in row_errors[row]
+        ]
+
+    return layers, features, layer_fos, profile_fos, offsets, profile_errors
+
+
+def build_layer_predictions(layers, features, layer_fos, start, stop):
+    """Per-layer response entries for rows start..stop of a packed profile batch"""
+    fos = np.round(layer_fos[start:stop], 4).tolist()
+    props = features[start:stop].tolist()
+    return [
+        {
+            'name': layers[start + i]['name'],
+            'fos': fos[i],
+            'properties': dict(zip(FEATURE_NAMES, props[i]))
         }
-    })
+        for i in range(stop - start)
+    ]
+
+
+def _first_layer_error(errors):
+    """Pick the error the per-layer checks would have raised first"""
+    priority = {'missing': 0, 'invalid': 1, 'out_of_range': 2}
+    return min(errors, key=lambda e: (e['layer'], priority[e['code']]))
 
 
 def predict_multi_layer(data):
     """
     Handle multi-layer prediction by computing weighted average
+
+    With the ensemble, each layer's FoS is the members' mean, but the
+    interval of the overall FoS is the RMSE band: a weighted average of
+    the layers' quantiles is not a quantile of the weighted average.
     """
     try:
         layers = data['layers']
         model_choice = data.get('model', 'gradient_boosting')
         
-        if not layers or len(layers) == 0:
-            return jsonify({'error': 'No layers provided'}), 400
+        if not isinstance(layers, list):
+            return {'error': '"layers" must be an array'}, 400
+        if not layers:
+            return {'error': 'No layers provided'}, 400
         
         # Select model
-        if model_choice == 'xgboost':
-            model = xgb_model
-            model_name = 'XGBoost'
-            model_metrics = MODEL_INFO['xgboost']
-        else:
-            model = gb_model
-            model_name = 'Gradient Boosting'
-            model_metrics = MODEL_INFO['gradient_boosting']
+        request_context.model = resolve_model_key(model_choice)
+        version = resolve_version(data)
+        model, model_name, model_metrics = select_model(model_choice, version)
         
-        # Store individual layer predictions
-        layer_predictions = []
-        total_weight = 0
-        weighted_fos_sum = 0
+        # Validate and predict all layers as one matrix
+        layers, features, layer_fos, profile_fos, offsets, profile_errors = evaluate_profiles(
+            [layers], model, resolve_model_key(model_choice), version)
         
-        for idx, layer in enumerate(layers):
-            # Validate layer data
-            required_fields = ['name', 'cohesion', 'friction_angle', 'unit_weight', 'ru']
-            for field in required_fields:
-                if field not in layer:
-                    return jsonify({
-                        'error': f'Missing required field "{field}" in layer {idx + 1}'
-                    }), 400
-            
-            # Extract layer properties
-            cohesion = float(layer['cohesion'])
-            friction_angle = float(layer['friction_angle'])
-            unit_weight = float(layer['unit_weight'])
-            ru = float(layer['ru'])
-            
-            # Validate ranges
-            if not (0 <= cohesion <= 100):
-                return jsonify({'error': f'Layer {layer["name"]}: Cohesion must be between 0 and 100 kPa'}), 400
-            if not (0 <= friction_angle <= 45):
-                return jsonify({'error': f'Layer {layer["name"]}: Friction angle must be between 0 and 45 degrees'}), 400
-            if not (15 <= unit_weight <= 25):
-                return jsonify({'error': f'Layer {layer["name"]}: Unit weight must be between 15 and 25 kN/m³'}), 400
-            if not (0 <= ru <= 1):
-                return jsonify({'error': f'Layer {layer["name"]}: Ru must be between 0 and 1'}), 400
-            
-            # Prepare features and predict
-            features = np.array([[cohesion, friction_angle, unit_weight, ru]])
-            features_scaled = scaler.transform(features)
-            fos_prediction = float(model.predict(features_scaled)[0])
-            
-            # Store layer prediction
-            layer_predictions.append({
-                'name': layer['name'],
-                'fos': round(fos_prediction, 4),
-                'properties': {
-                    'cohesion': cohesion,
-                    'friction_angle': friction_angle,
-                    'unit_weight': unit_weight,
-                    'ru': ru
-                }
-            })
-            
-            # Calculate weighted average (using unit weight as weight factor)
-            total_weight += unit_weight
-            weighted_fos_sum += fos_prediction * unit_weight
+        if profile_errors:
+            error = _first_layer_error(profile_errors[0])
+            layer = layers[error['layer']]
+            if error['code'] == 'missing':
+                message = f'Missing required field "{error["field"]}" in layer {error["layer"] + 1}'
+            elif isinstance(layer, dict):
+                message = f'Layer {layer["name"]}: {error["message"]}'
+            else:
+                message = f'Layer {error["layer"] + 1}: {error["message"]}'
+            return {'error': message}, 400
+        
+        # Store individual layer predictions
+        layer_predictions = build_layer_predictions(layers, features, layer_fos, 0, len(layers))
         
-        # Calculate overall FoS (weighted average)
-        overall_fos = weighted_fos_sum / total_weight
+        # Overall FoS (weighted average by unit weight)
+        overall_fos = float(profile_fos[0])
         
         # Calculate confidence interval
         rmse = model_metrics['test_rmse']
@@ -176,24 +786,9 @@ def predict_multi_layer(data):
         confidence_upper = float(overall_fos + 1.96 * rmse)
         
         # Safety assessment
-        if overall_fos < 1.0:
-            safety_status = 'CRITICAL'
-            safety_message = 'Slope is unstable - immediate action required'
-            safety_color = 'red'
-        elif overall_fos < 1.3:
-            safety_status = 'WARNING'
-            safety_message = 'Slope stability is marginal - review required'
-            safety_color = 'orange'
-        elif overall_fos < 1.5:
-            safety_status = 'CAUTION'
-            safety_message = 'Slope is stable but monitor conditions'
-            safety_color = 'yellow'
-        else:
-            safety_status = 'SAFE'
-            safety_message = 'Slope is stable'
-            safety_color = 'green'
+        safety = SAFETY_LEVELS[classify_safety(overall_fos)]
         
-        return jsonify({
+        return {
             'success': True,
             'prediction_type': 'multi-layer',
             'prediction': {
@@ -206,36 +801,139 @@ def predict_multi_layer(data):
             },
             'layers': layer_predictions,
             'calculation_method': 'Weighted average by unit weight',
-            'safety': {
-                'status': safety_status,
-                'message': safety_message,
-                'color': safety_color
-            },
-            'model': {
-                'name': model_name,
-                'r2_score': model_metrics['test_r2'],
-                'rmse': model_metrics['test_rmse'],
-                'mae': model_metrics['test_mae']
-            }
-        })
+            'safety': safety,
+            'model': model_summary(model_name, model_metrics)
+        }, 200
     
     except ValueError as e:
-        return jsonify({
+        return {
             'error': 'Invalid input values',
             'message': str(e)
-        }), 400
+        }, 400
     
+    except ModelUnavailable as e:
+        return {
+            'error': 'Model unavailable',
+            'message': str(e)
+        }, 503
+
     except Exception as e:
-        return jsonify({
+        return {
             'error': 'Multi-layer prediction failed',
             'message': str(e)
-        }), 500
+        }, 500
 
 
-@app.route('/predict', methods=['POST'])
-def predict():
+def predict_profiles(data, output='json'):
     """
-    Make FoS prediction
+    Handle a batch of multi-layer profiles (e.g. all boreholes of a site).
+
+    Layers of every profile are packed into one ragged batch, so the whole
+    request costs one scaler pass and one model call. Any output other than
+    'json' returns the compact columnar form (see wire_format).
+    """
+    try:
+        profiles = data['profiles']
+        model_choice = data.get('model', 'gradient_boosting')
+
+        if not isinstance(profiles, list) or len(profiles) == 0:
+            return {'error': 'No profiles provided'}, 400
+        if not all(isinstance(p, dict) and isinstance(p.get('layers', []), list) for p in profiles):
+            return {'error': 'Each profile must be an object with a "layers" array'}, 400
+
+        profile_layers = [p.get('layers', []) for p in profiles]
+        n_layers = sum(len(layers) for layers in profile_layers)
+        if n_layers > MAX_BATCH_SIZE:
+            return {
+                'error': 'Batch too large',
+                'message': f'At most {MAX_BATCH_SIZE} layers are accepted per request'
+            }, 413
+
+        request_context.model = resolve_model_key(model_choice)
+        version = resolve_version(data)
+        model, model_name, model_metrics = select_model(model_choice, version)
+        layers, features, layer_fos, profile_fos, offsets, profile_errors = evaluate_profiles(
+            profile_layers, model, resolve_model_key(model_choice), version)
+
+        rmse = model_metrics['test_rmse']
+        fos = np.round(profile_fos, 4).tolist()
+        lower = np.round(np.maximum(0, profile_fos - 1.96 * rmse), 4).tolist()
+        upper = np.round(profile_fos + 1.96 * rmse, 4).tolist()
+        levels = classify_safety(np.nan_to_num(profile_fos)).tolist()
+
+        if output != 'json':
+            valid = np.ones(len(profiles), dtype=bool)
+            valid[list(profile_errors)] = False
+            return {
+                'success': True,
+                'prediction_type': 'multi-layer-batch',
+                'count': len(profiles),
+                'valid_count': len(profiles) - len(profile_errors),
+                'invalid_count': len(profile_errors),
+                'ids': [profile.get('id', p) for p, profile in enumerate(profiles)],
+                'valid': valid,
+                'fos': np.round(profile_fos, 4),
+                'ci_lower': np.round(np.maximum(0, profile_fos - 1.96 * rmse), 4),
+                'ci_upper': np.round(profile_fos + 1.96 * rmse, 4),
+                'safety_class': np.where(valid, levels, -1).astype(np.int8),
+                'layer_offsets': offsets,
+                'layer_fos': np.round(layer_fos, 4),
+                'errors': [{'index': p, 'errors': errors} for p, errors in sorted(profile_errors.items())],
+                'calculation_method': 'Weighted average by unit weight',
+                'safety_levels': SAFETY_STATUSES,
+                'model': dict(model_summary(model_name, model_metrics), interval={'level': '95%', 'method': 'rmse'})
+            }, 200
+
+        results = []
+        for p, profile in enumerate(profiles):
+            entry = {'index': p, 'id': profile.get('id', p)}
+            if p in profile_errors:
+                entry.update({'valid': False, 'errors': profile_errors[p]})
+            else:
+                entry.update({
+                    'valid': True,
+                    'prediction': {
+                        'fos': fos[p],
+                        'confidence_interval': {'lower': lower[p], 'upper': upper[p], 'level': '95%'}
+                    },
+                    'layers': build_layer_predictions(layers, features, layer_fos, offsets[p], offsets[p + 1]),
+                    'safety': SAFETY_LEVELS[levels[p]]
+                })
+            results.append(entry)
+
+        return {
+            'success': True,
+            'prediction_type': 'multi-layer-batch',
+            'count': len(profiles),
+            'valid_count': len(profiles) - len(profile_errors),
+            'invalid_count': len(profile_errors),
+            'profiles': results,
+            'calculation_method': 'Weighted average by unit weight',
+            'model': model_summary(model_name, model_metrics)
+        }, 200
+
+    except ValueError as e:
+        return {
+            'error': 'Invalid input values',
+            'message': str(e)
+        }, 400
+
+    except ModelUnavailable as e:
+        return {
+            'error': 'Model unavailable',
+            'message': str(e)
+        }, 503
+
+    except Exception as e:
+        return {
+            'error': 'Multi-layer prediction failed',
+            'message': str(e)
+        }, 500
+
+
+def handle_predict(data, output='json'):
+    """
+    Make FoS prediction, returning (payload, status)
     
     Supports both single layer and multi-layer predictions:
     
@@ -245,7 +943,7 @@ def predict():
         "friction_angle": float,
         "unit_weight": float,
         "ru": float (optional, default=0),
-        "model": "gradient_boosting" or "xgboost" (optional)
+        "model": "gradient_boosting", "xgboost" or "ensemble" (optional)
     }
     
     Multi-layer request:
@@ -268,131 +966,1221 @@ def predict():
         ],
         "model": "gradient_boosting" or "xgboost" (optional)
     }
+    
+    Multi-profile request (many boreholes scored in one model call):
+    {
+        "profiles": [
+            {"id": "BH-01", "layers": [...]},
+            {"id": "BH-02", "layers": [...]}
+        ],
+        "model": "gradient_boosting" or "xgboost" (optional)
+    }
+    
+    Any request may add "model_version": "<version>" to run on a specific
+    registry version instead of the active one. Any output other than
+    'json' returns the compact form (see wire_format).
     """
     try:
         # Check if models are loaded
-        if gb_model is None or xgb_model is None or scaler is None:
-            return jsonify({
+        if not models_loaded():
+            return {
                 'error': 'Models not loaded',
                 'message': 'Please ensure model files are in the models/ directory'
-            }), 500
+            }, 500
         
-        # Get request data
-        data = request.get_json()
+        if not isinstance(data, dict):
+            return {'error': 'Request body must be a JSON object'}, 400
         
         # Check if multi-layer request
+        if 'profiles' in data:
+            return predict_profiles(data, output)
         if 'layers' in data:
-            return predict_multi_layer(data)
+            payload, status = predict_multi_layer(data)
+            if output != 'json' and status == 200:
+                return compact_prediction(payload), status
+            return payload, status
         
         # Single layer prediction (original behavior)
-        # Validate required fields
-        required_fields = ['cohesion', 'friction_angle', 'unit_weight']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({
-                    'error': f'Missing required field: {field}'
-                }), 400
-        
-        # Extract features
-        cohesion = float(data['cohesion'])
-        friction_angle = float(data['friction_angle'])
-        unit_weight = float(data['unit_weight'])
-        ru = float(data.get('ru', 0.0))  # Default Ru = 0 if not provided
+        started = time.perf_counter()
+        # Validate against the input schema (Ru defaults to 0)
+        values, errors = INPUT_SCHEMA.validate_record(data)
+        if errors:
+            error = INPUT_SCHEMA.first_error(errors)
+            if error['code'] == 'invalid':
+                return {'error': 'Invalid input values', 'message': error['message'], 'errors': errors}, 400
+            return {'error': error['message'], 'errors': errors}, 400
+        cohesion, friction_angle, unit_weight, ru = values
         model_choice = data.get('model', 'gradient_boosting')
         
-        # Validate ranges
-        if not (0 <= cohesion <= 100):
-            return jsonify({'error': 'Cohesion must be between 0 and 100 kPa'}), 400
-        if not (0 <= friction_angle <= 45):
-            return jsonify({'error': 'Friction angle must be between 0 and 45 degrees'}), 400
-        if not (15 <= unit_weight <= 25):
-            return jsonify({'error': 'Unit weight must be between 15 and 25 kN/m³'}), 400
-        if not (0 <= ru <= 1):
-            return jsonify({'error': 'Ru must be between 0 and 1'}), 400
-        
         # Prepare features
-        features = np.array([[cohesion, friction_angle, unit_weight, ru]])
-        
-        # Scale features
-        features_scaled = scaler.transform(features)
+        features = np.array([values])
+        observe_stage('validate', started)
         
         # Select model
-        if model_choice == 'xgboost':
-            model = xgb_model
-            model_name = 'XGBoost'
-            model_metrics = MODEL_INFO['xgboost']
-        else:
-            model = gb_model
-            model_name = 'Gradient Boosting'
-            model_metrics = MODEL_INFO['gradient_boosting']
+        model_key = resolve_model_key(model_choice)
+        request_context.model = model_key
+        version = resolve_version(data)
+        model, model_name, model_metrics = select_model(model_key, version)
         
-        # Make prediction
-        fos_prediction = float(model.predict(features_scaled)[0])
-        
-        # Calculate confidence interval (approximate using RMSE)
-        rmse = model_metrics['test_rmse']
-        confidence_lower = float(max(0, fos_prediction - 1.96 * rmse))
-        confidence_upper = float(fos_prediction + 1.96 * rmse)
-        
-        # Safety assessment
-        if fos_prediction < 1.0:
-            safety_status = 'CRITICAL'
-            safety_message = 'Slope is unstable - immediate action required'
-            safety_color = 'red'
-        elif fos_prediction < 1.3:
-            safety_status = 'WARNING'
-            safety_message = 'Slope stability is marginal - review required'
-            safety_color = 'orange'
-        elif fos_prediction < 1.5:
-            safety_status = 'CAUTION'
-            safety_message = 'Slope is stable but monitor conditions'
-            safety_color = 'yellow'
-        else:
-            safety_status = 'SAFE'
-            safety_message = 'Slope is stable'
-            safety_color = 'green'
+        # Reuse the cached response for these inputs, or make a prediction
+        cache_key = prediction_cache.make_keys(cache_namespace(model_key, version), features)[0]
+        entry = prediction_cache.get(cache_key)
+        if entry is None and isinstance(model, EnsembleModel):
+            prediction = build_ensemble_predictions(model, features, model_metrics)[0]
+            PREDICTED_ROWS.inc(model_key)
+            entry = build_ensemble_entry(prediction, model_name, model_metrics)
+            prediction_cache.put(cache_key, entry)
+        elif entry is None:
+            if request_coalescer is not None:
+                fos_prediction = request_coalescer.submit(model, features[0])
+            else:
+                fos_prediction = float(predict_fos(model, features)[0])
+            PREDICTED_ROWS.inc(model_key)
+            entry = {
+                'fos': fos_prediction,
+                'payload': build_prediction_payload(fos_prediction, model_name, model_metrics)
+            }
+            prediction_cache.put(cache_key, entry)
         
         # Return prediction
-        return jsonify({
-            'success': True,
-            'prediction': {
-                'fos': round(fos_prediction, 4),
-                'confidence_interval': {
-                    'lower': round(confidence_lower, 4),
-                    'upper': round(confidence_upper, 4),
-                    'level': '95%'
-                }
-            },
-            'safety': {
-                'status': safety_status,
-                'message': safety_message,
-                'color': safety_color
-            },
-            'model': {
-                'name': model_name,
-                'r2_score': model_metrics['test_r2'],
-                'rmse': model_metrics['test_rmse'],
-                'mae': model_metrics['test_mae']
-            },
-            'inputs': {
-                'cohesion': cohesion,
-                'friction_angle': friction_angle,
-                'unit_weight': unit_weight,
-                'ru': ru
-            }
-        })
+        if output != 'json':
+            return compact_prediction(entry['payload']), 200
+        return dict(entry['payload'], inputs={
+            'cohesion': cohesion,
+            'friction_angle': friction_angle,
+            'unit_weight': unit_weight,
+            'ru': ru
+        }), 200
     
     except ValueError as e:
-        return jsonify({
+        return {
             'error': 'Invalid input values',
             'message': str(e)
-        }), 400
+        }, 400
+    
+    except (QueueFullError, TimeoutError) as e:
+        return {
+            'error': 'Server busy',
+            'message': str(e)
+        }, 503
     
+    except ModelUnavailable as e:
+        return {
+            'error': 'Model unavailable',
+            'message': str(e)
+        }, 503
+
     except Exception as e:
-        return jsonify({
+        return {
             'error': 'Prediction failed',
             'message': str(e)
-        }), 500
+        }, 500
+
+
+def compact_batch_columns(model, features, valid, model_metrics):
+    """
+    One model's output columns in the compact batch form: FoS and interval
+    bounds (NaN for invalid rows), safety class (-1 for invalid rows) and,
+    for an ensemble, the member predictions with their spread and std
+    """
+    n_rows = len(valid)
+    rows = np.flatnonzero(valid)
+    columns = {name: np.full(n_rows, np.nan) for name in ('fos', 'ci_lower', 'ci_upper')}
+    columns['safety_class'] = np.full(n_rows, -1, dtype=np.int8)
+    ensemble = isinstance(model, EnsembleModel)
+    if ensemble:
+        columns['members'] = {name: np.full(n_rows, np.nan) for name in model.member_names}
+        columns['spread'] = np.full(n_rows, np.nan)
+        columns['std'] = np.full(n_rows, np.nan)
+    if len(rows) == 0:
+        return columns
+
+    if ensemble:
+        fos, members, quantiles = predict_ensemble(model, features[rows])
+        lower, upper, _, _ = ensemble_interval(model, fos, quantiles, model_metrics['test_rmse'])
+        for j, name in enumerate(model.member_names):
+            columns['members'][name][rows] = np.round(members[:, j], 4)
+        columns['spread'][rows] = np.round(members.max(axis=1) - members.min(axis=1), 4)
+        columns['std'][rows] = np.round(members.std(axis=1), 4)
+    else:
+        fos, lower, upper = predict_with_interval(model, features[rows], model_metrics)
+    columns['fos'][rows] = np.round(fos, 4)
+    columns['ci_lower'][rows] = np.round(lower, 4)
+    columns['ci_upper'][rows] = np.round(upper, 4)
+    columns['safety_class'][rows] = classify_safety(fos)
+    return columns
+
+
+def handle_predict_batch(data, output='json'):
+    """
+    Score many records in one request, returning (payload, status)
+
+    Request body is either a JSON array of single-layer records, or
+    {
+        "records": [{"cohesion": float, "friction_angle": float,
+                     "unit_weight": float, "ru": float (optional)}, ...],
+        "model": "gradient_boosting" | "xgboost" | "both" | "ensemble" (optional)
+    }
+    or the columnar form
+    {
+        "columns": {"cohesion": [...], "friction_angle": [...],
+                    "unit_weight": [...], "ru": [...]},
+        "model": ...
+    }
+    Object forms may also pin "model_version".
+
+    Invalid rows do not fail the request; they are returned with their
+    per-field validation errors while all valid rows are scaled once and
+    predicted with a single call per model. Any output other than 'json'
+    returns the compact columnar form (see wire_format): one array per
+    output column and model, with the model metadata sent once.
+    """
+    try:
+        if not models_loaded():
+            return {
+                'error': 'Models not loaded',
+                'message': 'Please ensure model files are in the models/ directory'
+            }, 500
+
+        started = time.perf_counter()
+        columns, n_rows, row_errors = parse_batch_columns(data)
+
+        if n_rows == 0:
+            return {'error': 'No records provided'}, 400
+        if n_rows > MAX_BATCH_SIZE:
+            return {
+                'error': 'Batch too large',
+                'message': f'At most {MAX_BATCH_SIZE} records are accepted per request'
+            }, 413
+
+        model_choice = data.get('model', 'gradient_boosting') if isinstance(data, dict) else 'gradient_boosting'
+        model_keys = ['gradient_boosting', 'xgboost'] if model_choice == 'both' else [
+            resolve_model_key(model_choice)
+        ]
+        request_context.model = model_choice if model_choice == 'both' else model_keys[0]
+
+        features, valid, row_errors = INPUT_SCHEMA.validate(columns, n_rows, row_errors)
+        valid_rows = np.flatnonzero(valid)
+        observe_stage('validate', started)
+        version = resolve_version(data)
+
+        # One scaler pass and one predict call per model for all valid rows
+        model_results = {}
+        models_meta = {}
+        for key in model_keys:
+            model, model_name, model_metrics = select_model(key, version)
+            models_meta[key] = model_summary(model_name, model_metrics)
+            PREDICTED_ROWS.inc(key, amount=len(valid_rows))
+            if output != 'json':
+                models_meta[key]['interval'] = interval_summary(model)
+                model_results[key] = compact_batch_columns(model, features, valid, model_metrics)
+                continue
+            if isinstance(model, EnsembleModel):
+                model_results[key] = build_ensemble_predictions(model, features[valid_rows], model_metrics)
+                continue
+            fos = predict_fos(model, features[valid_rows]) if len(valid_rows) else np.empty(0)
+            rmse = model_metrics['test_rmse']
+            model_results[key] = (
+                np.round(fos, 4).tolist(),
+                np.round(np.maximum(0, fos - 1.96 * rmse), 4).tolist(),
+                np.round(fos + 1.96 * rmse, 4).tolist(),
+                classify_safety(fos).tolist()
+            )
+
+        if output != 'json':
+            return {
+                'success': True,
+                'prediction_type': 'batch',
+                'count': n_rows,
+                'valid_count': int(len(valid_rows)),
+                'invalid_count': int(n_rows - len(valid_rows)),
+                'models': models_meta,
+                'safety_levels': SAFETY_STATUSES,
+                'valid': valid,
+                'predictions': model_results,
+                'errors': [{'index': row, 'errors': errors} for row, errors in sorted(row_errors.items())]
+            }, 200
+
+        results = [None] * n_rows
+        for pos, row in enumerate(valid_rows.tolist()):
+            predictions = {}
+            for key, result in model_results.items():
+                if isinstance(result, list):
+                    predictions[key] = result[pos]
+                    continue
+                fos, lower, upper, level = result
+                predictions[key] = {
+                    'fos': fos[pos],
+                    'confidence_interval': {'lower': lower[pos], 'upper': upper[pos], 'level': '95%'},
+                    'safety': SAFETY_LEVELS[level[pos]]
+                }
+            results[row] = {'index': row, 'valid': True, 'predictions': predictions}
+        for row, errors in row_errors.items():
+            results[row] = {'index': row, 'valid': False, 'errors': errors}
+
+        return {
+            'success': True,
+            'prediction_type': 'batch',
+            'count': n_rows,
+            'valid_count': int(len(valid_rows)),
+            'invalid_count': int(n_rows - len(valid_rows)),
+            'models': models_meta,
+            'results': results
+        }, 200
+
+    except ValueError as e:
+        return {
+            'error': 'Invalid input values',
+            'message': str(e)
+        }, 400
+
+    except ModelUnavailable as e:
+        return {
+            'error': 'Model unavailable',
+            'message': str(e)
+        }, 503
+
+    except Exception as e:
+        return {
+            'error': 'Batch prediction failed',
+            'message': str(e)
+        }, 500
+
+
+def predict_with_interval(model, features, model_metrics):
+    """FoS with interval bounds: the quantile interval for an ensemble, else +-1.96 RMSE"""
+    if isinstance(model, EnsembleModel):
+        fos, _, quantiles = predict_ensemble(model, features)
+        lower, upper, _, _ = ensemble_interval(model, fos, quantiles, model_metrics['test_rmse'])
+        return fos, lower, upper
+    fos = predict_fos(model, features)
+    rmse = model_metrics['test_rmse']
+    return fos, np.maximum(0, fos - 1.96 * rmse), fos + 1.96 * rmse
+
+
+def score_file_chunk(chunk, reader, model, model_key, model_metrics, start):
+    """
+    Validate and score one chunk of an uploaded file.
+
+    Returns result records: one per row, or one per section (unit-weight
+    weighted average of its layers, as in /predict) when the file has a
+    section id column. start is the file row index of the chunk's first row.
+    """
+    started = time.perf_counter()
+    n_rows = len(next(iter(chunk.values())))
+    columns = {field: chunk.get(field) or [None] * n_rows for field in FEATURE_NAMES}
+    features, valid, row_errors = INPUT_SCHEMA.validate(columns, n_rows)
+    observe_stage('validate', started)
+
+    fos = np.full(n_rows, np.nan)
+    lower = np.full(n_rows, np.nan)
+    upper = np.full(n_rows, np.nan)
+    if valid.any():
+        fos[valid], lower[valid], upper[valid] = predict_with_interval(model, features[valid], model_metrics)
+        PREDICTED_ROWS.inc(model_key, amount=int(valid.sum()))
+    layers = chunk.get(reader.layer_column) if reader.layer_column else None
+
+    if reader.section_column is None:
+        fos_values, levels = np.round(fos, 4).tolist(), classify_safety(np.nan_to_num(fos)).tolist()
+        lower, upper = np.round(lower, 4).tolist(), np.round(upper, 4).tolist()
+        records = []
+        for i in range(n_rows):
+            record = {'index': start + i}
+            if layers is not None:
+                record['layer'] = layers[i]
+            if valid[i]:
+                record.update({'fos': fos_values[i], 'ci_lower': lower[i], 'ci_upper': upper[i],
+                               'safety': SAFETY_LEVELS[levels[i]]['status'], 'error': None})
+            else:
+                record.update({'fos': None, 'ci_lower': None, 'ci_upper': None, 'safety': None,
+                               'error': '; '.join(e['message'] for e in row_errors[i])})
+            records.append(record)
+        return records
+
+    # Sections are runs of consecutive rows with the same id
+    ids = chunk[reader.section_column]
+    new_section = np.ones(n_rows, dtype=bool)
+    new_section[1:] = [a != b for a, b in zip(ids[1:], ids[:-1])]
+    section_of_row = np.cumsum(new_section) - 1
+    starts = np.flatnonzero(new_section)
+    n_sections = len(starts)
+    invalid = np.bincount(section_of_row[~valid], minlength=n_sections) > 0
+
+    unit_weight = np.where(valid, features[:, FEATURE_NAMES.index('unit_weight')], 0.0)
+    total_weight = np.bincount(section_of_row, weights=unit_weight, minlength=n_sections)
+    weighted = {}
+    for name, values in (('fos', fos), ('ci_lower', lower), ('ci_upper', upper)):
+        sums = np.bincount(section_of_row, weights=np.where(valid, values, 0.0) * unit_weight, minlength=n_sections)
+        weighted[name] = np.round(np.divide(sums, total_weight, out=np.full(n_sections, np.nan),
+                                            where=~invalid & (total_weight > 0)), 4).tolist()
+    levels = classify_safety(np.nan_to_num(weighted['fos'])).tolist()
+    layer_fos = np.round(fos, 4).tolist()
+    bounds = starts.tolist() + [n_rows]
+
+    records = []
+    for k in range(n_sections):
+        first, stop = bounds[k], bounds[k + 1]
+        record = {'section_id': ids[first], 'layers': stop - first}
+        if ids[first] is None:
+            error = 'Missing section id'
+        elif invalid[k]:
+            row = next(row for row in range(first, stop) if not valid[row])
+            error = f'Layer {row - first + 1} (row {start + row}): ' + '; '.join(e['message'] for e in row_errors[row])
+        else:
+            error = None
+        if error is None:
+            record.update({'fos': weighted['fos'][k], 'ci_lower': weighted['ci_lower'][k],
+                           'ci_upper': weighted['ci_upper'][k], 'safety': SAFETY_LEVELS[levels[k]]['status'],
+                           'error': None,
+                           'layer_fos': [{'layer': layers[row] if layers is not None else row - first + 1,
+                                          'fos': layer_fos[row]} for row in range(first, stop)]})
+        else:
+            record.update({'fos': None, 'ci_lower': None, 'ci_upper': None, 'safety': None, 'error': error})
+        records.append(record)
+    return records
+
+
+def handle_predict_file(stream, options):
+    """
+    Score an uploaded CSV or Parquet file, returning (body, status, content type)
+
+    stream is a binary file object (seekable for Parquet). options holds
+    "format" ('csv' or 'parquet'), "output" ('csv' or 'ndjson'), "model" and
+    optionally "model_version". The file needs cohesion, friction_angle and
+    unit_weight columns; ru is optional (default 0). With a section_id (or
+    section, id) column, consecutive rows with the same id are the layers
+    of one section and one result per section is returned.
+
+    On success body is an iterator of result text chunks, produced one input
+    chunk at a time; otherwise it is an error payload.
+    """
+    try:
+        if not models_loaded():
+            return {
+                'error': 'Models not loaded',
+                'message': 'Please ensure model files are in the models/ directory'
+            }, 500, None
+
+        file_format = options.get('format') or 'csv'
+        if file_format not in bulk_scoring.FILE_FORMATS:
+            return {'error': f'format must be one of {", ".join(bulk_scoring.FILE_FORMATS)}'}, 400, None
+        open_reader = bulk_scoring.open_parquet if file_format == 'parquet' else bulk_scoring.open_csv
+        reader = open_reader(stream, FEATURE_NAMES, UPLOAD_CHUNK_ROWS)
+        missing = [field for field in FEATURE_NAMES if field not in reader.columns and field not in BATCH_DEFAULTS]
+        if missing:
+            raise ValueError(f'Missing required column(s): {", ".join(missing)}')
+
+        model_key = resolve_model_key(options.get('model', 'gradient_boosting'))
+        request_context.model = model_key
+        version = resolve_version(options)
+        model, _, model_metrics = select_model(model_key, version)
+
+        if reader.section_column is not None:
+            fields = ['section_id', 'layers', 'fos', 'ci_lower', 'ci_upper', 'safety', 'error']
+            chunks = bulk_scoring.align_sections(reader.chunks, reader.section_column)
+        else:
+            fields = ['index'] + (['layer'] if reader.layer_column else []) + \
+                ['fos', 'ci_lower', 'ci_upper', 'safety', 'error']
+            chunks = reader.chunks
+        writer = bulk_scoring.ResultWriter(options.get('output') or 'csv', fields)
+    except ValueError as e:
+        return {'error': 'Invalid upload', 'message': str(e)}, 400, None
+    except ModelUnavailable as e:
+        return {'error': 'Model unavailable', 'message': str(e)}, 503, None
+    except Exception as e:
+        return {'error': 'File scoring failed', 'message': str(e)}, 500, None
+
+    def generate():
+        yield writer.header()
+        start = 0
+        for chunk in chunks:
+            n_rows = len(next(iter(chunk.values())))
+            yield writer.write(score_file_chunk(chunk, reader, model, model_key, model_metrics, start))
+            start += n_rows
+
+    return generate(), 200, writer.content_type
+
+
+def handle_reliability(data):
+    """
+    Probability of failure by Monte Carlo sampling, returning (payload, status)
+
+    Single layer request:
+    {
+        "inputs": {
+            "cohesion": {"mean": 25, "cov": 0.3, "distribution": "lognormal"},
+            "friction_angle": {"mean": 32, "std": 3},
+            "unit_weight": {"mean": 20, "cov": 0.05},
+            "ru": 0.2
+        },
+        "correlations": [["cohesion", "friction_angle", -0.5]] (optional),
+        "samples": int (optional, default 100000),
+        "seed": int (optional),
+        "failure_threshold": float (optional, default 1.0),
+        "include_model_error": bool (optional, default true),
+        "model": "gradient_boosting" or "xgboost" (optional)
+    }
+
+    Multi-layer request: "layers": [{"name": ..., "cohesion": {...}, ...,
+    "correlations": [...] (optional)}] instead of "inputs"; each sample's
+    layer FoS values are averaged by the sampled unit weights.
+
+    A number is a fixed input; distributions are "normal" (default) or
+    "lognormal"; Ru defaults to 0. Samples outside the model's input
+    ranges are clipped to them and the clipped fraction is reported.
+    """
+    try:
+        if not models_loaded():
+            return {
+                'error': 'Models not loaded',
+                'message': 'Please ensure model files are in the models/ directory'
+            }, 500
+        if not isinstance(data, dict):
+            return {'error': 'Request body must be a JSON object'}, 400
+
+        started = time.perf_counter()
+        correlations = data.get('correlations')
+        if 'layers' in data:
+            layer_specs = data['layers']
+            if not isinstance(layer_specs, list) or not layer_specs:
+                return {'error': 'No layers provided'}, 400
+            if len(layer_specs) > RELIABILITY_MAX_LAYERS:
+                return {'error': f'At most {RELIABILITY_MAX_LAYERS} layers are accepted'}, 413
+            if not all(isinstance(layer, dict) for layer in layer_specs):
+                return {'error': 'Each layer must be an object'}, 400
+            names = [str(layer.get('name', f'Layer {i + 1}')) for i, layer in enumerate(layer_specs)]
+        elif isinstance(data.get('inputs'), dict):
+            layer_specs = [data['inputs']]
+            names = None
+        else:
+            return {'error': 'Provide "inputs" or "layers"'}, 400
+
+        layers = []
+        for i, spec in enumerate(layer_specs):
+            try:
+                layers.append(LayerModel(spec, FEATURE_NAMES, spec.get('correlations', correlations), BATCH_DEFAULTS))
+            except ValueError as e:
+                raise ValueError(f'Layer {names[i]}: {e}' if names else str(e))
+
+        n_samples = int(data.get('samples', RELIABILITY_DEFAULT_SAMPLES))
+        if not 1 <= n_samples <= RELIABILITY_MAX_SAMPLES:
+            return {'error': f'"samples" must be between 1 and {RELIABILITY_MAX_SAMPLES}'}, 400
+        failure_threshold = float(data.get('failure_threshold', 1.0))
+        seed = data.get('seed')
+        seed = int(np.random.SeedSequence().generate_state(1)[0]) if seed is None else int(seed)
+        observe_stage('validate', started)
+
+        model_choice = data.get('model', 'gradient_boosting')
+        model_key = resolve_model_key(model_choice)
+        request_context.model = model_key
+        version = resolve_version(data)
+        model, model_name, model_metrics = select_model(model_key, version)
+        model_error = model_metrics['test_rmse'] if data.get('include_model_error', True) else 0.0
+
+        fos, clipped, truncated = run_simulation(
+            lambda X: predict_fos(model, X), layers, n_samples, np.random.default_rng(seed),
+            INPUT_SCHEMA.lower, INPUT_SCHEMA.upper,
+            FEATURE_NAMES.index('unit_weight'), model_error, RELIABILITY_CHUNK_ROWS, RELIABILITY_TIME_BUDGET)
+        PREDICTED_ROWS.inc(model_key, amount=len(fos) * len(layers))
+
+        clipped_fraction = [
+            {name: round(int(count) / len(fos), 6) for name, count in zip(FEATURE_NAMES, row)}
+            for row in clipped.tolist()
+        ]
+        if names:
+            inputs = {'layers': [{'name': name, 'inputs': layer.describe()} for name, layer in zip(names, layers)]}
+            clipped_fraction = dict(zip(names, clipped_fraction))
+        else:
+            inputs = {'inputs': layers[0].describe()}
+            clipped_fraction = clipped_fraction[0]
+
+        return dict({
+            'success': True,
+            'prediction_type': 'reliability',
+            'reliability': summarise(fos, failure_threshold, SAFETY_THRESHOLDS, SAFETY_LEVELS),
+            'sampling': {
+                'method': 'Monte Carlo',
+                'requested_samples': n_samples,
+                'samples': int(len(fos)),
+                'truncated': truncated,
+                'time_budget_seconds': RELIABILITY_TIME_BUDGET,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+                'seed': seed,
+                'model_error_std': model_error,
+                'clipped_fraction': clipped_fraction
+            },
+            'model': model_summary(model_name, model_metrics)
+        }, **inputs), 200
+
+    except ValueError as e:
+        return {
+            'error': 'Invalid input values',
+            'message': str(e)
+        }, 400
+
+    except ModelUnavailable as e:
+        return {
+            'error': 'Model unavailable',
+            'message': str(e)
+        }, 503
+
+    except Exception as e:
+        return {
+            'error': 'Reliability analysis failed',
+            'message': str(e)
+        }, 500
+
+
+def parse_sweep_axis(axis):
+    """
+    Normalise one sweep axis to (parameter, values).
+
+    An axis is {"parameter": name, "min": float, "max": float, "steps": int}
+    (min and max default to the parameter's valid range) or
+    {"parameter": name, "values": [...]}.
+    """
+    if not isinstance(axis, dict):
+        raise ValueError('Each entry of "vary" must be an object')
+    parameter = axis.get('parameter')
+    if parameter not in FEATURE_NAMES:
+        raise ValueError(f'Unknown sweep parameter: {parameter}')
+    bounds = INPUT_SCHEMA.ranges[parameter]
+
+    if 'values' in axis:
+        if not isinstance(axis['values'], list) or not axis['values']:
+            raise ValueError(f'"values" of {parameter} must be a non-empty array')
+        values, missing, invalid = column_to_float(axis['values'])
+        if missing.any() or invalid.any():
+            raise ValueError(f'Invalid value for field: {parameter}')
+    else:
+        steps = int(axis.get('steps', SWEEP_DEFAULT_STEPS))
+        if steps < 2:
+            raise ValueError(f'"steps" of {parameter} must be at least 2')
+        if steps > SWEEP_MAX_POINTS:
+            raise ValueError(f'"steps" of {parameter} must be at most {SWEEP_MAX_POINTS}')
+        values = np.linspace(float(axis.get('min', bounds['min'])), float(axis.get('max', bounds['max'])), steps)
+
+    INPUT_SCHEMA.check_values(parameter, values)
+    return parameter, values
+
+
+def threshold_crossings(values, fos, thresholds):
+    """
+    Axis values where a 1-D FoS curve crosses each threshold, linearly
+    interpolated between neighbouring grid points.
+    """
+    crossings = []
+    for threshold in thresholds:
+        above = fos >= threshold
+        for i in np.flatnonzero(above[1:] != above[:-1]).tolist():
+            f0, f1 = fos[i], fos[i + 1]
+            x = values[i] + (threshold - f0) * (values[i + 1] - values[i]) / (f1 - f0)
+            crossings.append({
+                'fos': float(threshold),
+                'value': round(float(x), 4),
+                'direction': 'falling' if f1 < f0 else 'rising'
+            })
+    return crossings
+
+
+def handle_sweep(data, output='json'):
+    """
+    FoS over a 1-D or 2-D parameter grid, returning (payload, status)
+
+    {
+        "base": {"cohesion": float, "friction_angle": float,
+                 "unit_weight": float, "ru": float (optional, default=0)},
+        "vary": [
+            {"parameter": "ru", "min": 0, "max": 0.8, "steps": 41},
+            {"parameter": "cohesion", "values": [5, 10, 20, 40]} (optional)
+        ],
+        "model": "gradient_boosting" or "xgboost" (optional)
+    }
+
+    Varied parameters may be left out of "base". The whole grid is
+    predicted with one model call. "fos" and "safety_class" are NumPy
+    arrays (a curve, or a matrix with one row per value of the first axis)
+    and are encoded by iter_sweep_json. Any output other than 'json' keeps
+    the axis values as arrays and lists only the safety level names, for
+    the wire_format encoders.
+    """
+    try:
+        if not models_loaded():
+            return {
+                'error': 'Models not loaded',
+                'message': 'Please ensure model files are in the models/ directory'
+            }, 500
+        if not isinstance(data, dict):
+            return {'error': 'Request body must be a JSON object'}, 400
+
+        started = time.perf_counter()
+        vary = data.get('vary')
+        if isinstance(vary, dict):
+            vary = [vary]
+        if not isinstance(vary, list) or not 1 <= len(vary) <= 2:
+            return {'error': '"vary" must list one or two parameters'}, 400
+        axes = [parse_sweep_axis(axis) for axis in vary]
+        if np.prod([len(values) for _, values in axes]) > SWEEP_MAX_POINTS:
+            return {
+                'error': 'Sweep too large',
+                'message': f'At most {SWEEP_MAX_POINTS} grid points are accepted per request'
+            }, 413
+        parameters = [parameter for parameter, _ in axes]
+        if len(set(parameters)) != len(parameters):
+            return {'error': 'Each parameter can be varied only once'}, 400
+
+        base = data.get('base', {})
+        if not isinstance(base, dict):
+            return {'error': '"base" must be an object'}, 400
+        base_values, errors = INPUT_SCHEMA.validate_record(base)
+        errors = [error for error in errors if error['field'] not in parameters]
+        if errors:
+            raise ValueError(INPUT_SCHEMA.first_error(errors)['message'])
+        fixed = {field: value for field, value in zip(FEATURE_NAMES, base_values) if field not in parameters}
+
+        grids = np.meshgrid(*[values for _, values in axes], indexing='ij')
+        shape = grids[0].shape
+        features = np.empty((grids[0].size, len(FEATURE_NAMES)))
+        for col, field in enumerate(FEATURE_NAMES):
+            features[:, col] = grids[parameters.index(field)].ravel() if field in parameters else fixed[field]
+        observe_stage('validate', started)
+
+        model_choice = data.get('model', 'gradient_boosting')
+        model_key = resolve_model_key(model_choice)
+        request_context.model = model_key
+        version = resolve_version(data)
+        model, model_name, model_metrics = select_model(model_key, version)
+        fos = predict_fos(model, features)
+        PREDICTED_ROWS.inc(model_key, amount=len(fos))
+
+        payload = {
+            'success': True,
+            'prediction_type': 'sweep',
+            'dimensions': len(axes),
+            'points': int(len(fos)),
+            'base': fixed,
+            'axes': [
+                {'parameter': parameter, 'unit': FEATURE_RANGES[parameter]['unit'], 'values': values.tolist()}
+                for parameter, values in axes
+            ],
+            'fos': np.round(fos, 4).reshape(shape),
+            'fos_range': {'min': round(float(fos.min()), 4), 'max': round(float(fos.max()), 4)},
+            'safety_class': classify_safety(fos).reshape(shape),
+            'safety_levels': SAFETY_LEVELS,
+            'model': model_summary(model_name, model_metrics)
+        }
+        if len(axes) == 1:
+            payload['crossings'] = threshold_crossings(axes[0][1], fos, SAFETY_THRESHOLDS)
+        if output != 'json':
+            payload['axes'] = [dict(axis, values=values) for axis, (_, values) in zip(payload['axes'], axes)]
+            payload['safety_levels'] = SAFETY_STATUSES
+        return payload, 200
+
+    except ValueError as e:
+        return {
+            'error': 'Invalid input values',
+            'message': str(e)
+        }, 400
+
+    except ModelUnavailable as e:
+        return {
+            'error': 'Model unavailable',
+            'message': str(e)
+        }, 503
+
+    except Exception as e:
+        return {
+            'error': 'Sweep failed',
+            'message': str(e)
+        }, 500
+
+
+def iter_sweep_json(payload):
+    """
+    Encode a sweep payload as jsonify would (sorted keys, compact, trailing
+    newline), yielding the FoS and safety arrays a row or a chunk at a time.
+    """
+    separators = (',', ':')
+    yield '{'
+    for i, key in enumerate(sorted(payload)):
+        value = payload[key]
+        yield (',' if i else '') + json.dumps(key) + ':'
+        if key not in SWEEP_ARRAYS:
+            yield json.dumps(value, sort_keys=True, separators=separators)
+            continue
+        rows = value if value.ndim > 1 else np.array_split(value, max(1, len(value) // 4096))
+        yield '['
+        for j, row in enumerate(rows):
+            text = json.dumps(row.tolist(), separators=separators)
+            yield (',' if j else '') + (text if value.ndim > 1 else text[1:-1])
+        yield ']'
+    yield '}\n'
+
+
+def inverse_message(status, mode, parameter, target, result, lower, upper):
+    """Explain a result that is not an interior solution"""
+    unit = FEATURE_RANGES[parameter]['unit']
+    if status == NOT_REACHABLE and mode == 'minimum':
+        return (f'FoS {target:g} is not reached with {parameter} up to {upper:g} {unit} '
+                f'(highest FoS {result:.4f})')
+    if status == NOT_REACHABLE:
+        return f'FoS is already below {target:g} at {parameter} = {lower:g} {unit} (FoS {result:.4f})'
+    if status == MET_AT_BOUND and mode == 'minimum':
+        return f'FoS {target:g} is already met at {parameter} = {lower:g} {unit}'
+    if status == MET_AT_BOUND:
+        return f'FoS {target:g} is met over the whole range up to {parameter} = {upper:g} {unit}'
+    return None
+
+
+def handle_inverse(data):
+    """
+    Solve for the input value giving a target FoS, returning (payload, status)
+
+    Single section request:
+    {
+        "solve_for": "ru" | "cohesion" | "friction_angle" | "unit_weight",
+        "target_fos": float,
+        "cohesion": float, "friction_angle": float, "unit_weight": float,
+        "ru": float (optional, default=0),
+        "mode": "minimum" | "maximum" (optional),
+        "min": float, "max": float (optional search range),
+        "model": "gradient_boosting" or "xgboost" (optional)
+    }
+    The fixed inputs may also be nested under "inputs"; the solved input is
+    not needed.
+
+    Bulk request: "sections": [{"id": ..., "cohesion": ..., "target_fos":
+    float (optional override)}, ...] replaces the inputs. Invalid sections
+    are returned with their errors without failing the others.
+
+    "minimum" finds the smallest value meeting the target (default for
+    cohesion and friction angle), "maximum" the largest value up to which
+    it is still met (default for unit weight and Ru).
+    """
+    try:
+        if not models_loaded():
+            return {
+                'error': 'Models not loaded',
+                'message': 'Please ensure model files are in the models/ directory'
+            }, 500
+        if not isinstance(data, dict):
+            return {'error': 'Request body must be a JSON object'}, 400
+
+        started = time.perf_counter()
+        parameter = data.get('solve_for')
+        if parameter not in FEATURE_NAMES:
+            return {'error': f'"solve_for" must be one of {", ".join(FEATURE_NAMES)}'}, 400
+        column = FEATURE_NAMES.index(parameter)
+        mode = data.get('mode', INVERSE_MODES[parameter])
+        if mode not in INVERSE_SEARCH_MODES:
+            return {'error': f'"mode" must be one of {", ".join(INVERSE_SEARCH_MODES)}'}, 400
+        bounds = FEATURE_RANGES[parameter]
+        lower = float(data.get('min', bounds['min']))
+        upper = float(data.get('max', bounds['max']))
+        if not bounds['min'] <= lower < upper <= bounds['max']:
+            raise ValueError(f'Search range of {parameter} must lie within '
+                             f'{bounds["min"]}-{bounds["max"]} {bounds["unit"]} with min < max')
+
+        bulk = 'sections' in data
+        if bulk:
+            sections = data['sections']
+            if not isinstance(sections, list) or not sections:
+                return {'error': 'No sections provided'}, 400
+            if len(sections) > INVERSE_MAX_SECTIONS:
+                return {
+                    'error': 'Batch too large',
+                    'message': f'At most {INVERSE_MAX_SECTIONS} sections are accepted per request'
+                }, 413
+        else:
+            sections = [data.get('inputs', data)]
+
+        columns, n_rows, row_errors = parse_batch_columns({'records': sections})
+        columns[parameter] = [lower] * n_rows
+        targets, missing, invalid = column_to_float([
+            section.get('target_fos', data.get('target_fos')) if isinstance(section, dict) else None
+            for section in sections
+        ])
+        invalid |= ~missing & ~invalid & (targets <= 0)
+        for mask, code, message in ((missing, 'missing', 'Missing required field: target_fos'),
+                                    (invalid, 'invalid', 'Invalid value for field: target_fos')):
+            for row in np.flatnonzero(mask).tolist():
+                row_errors.setdefault(row, []).append({'field': 'target_fos', 'code': code, 'message': message})
+        features, valid, row_errors = INPUT_SCHEMA.validate(columns, n_rows, row_errors)
+        valid &= ~missing & ~invalid
+        valid_rows = np.flatnonzero(valid)
+        observe_stage('validate', started)
+        if not bulk and row_errors:
+            raise ValueError(row_errors[0][0]['message'])
+
+        model_choice = data.get('model', 'gradient_boosting')
+        model_key = resolve_model_key(model_choice)
+        request_context.model = model_key
+        version = resolve_version(data)
+        model, model_name, model_metrics = select_model(model_key, version)
+
+        solution = solve_inverse(lambda X: predict_fos(model, X), features[valid_rows], column,
+                                 targets[valid_rows], lower, upper, mode)
+        PREDICTED_ROWS.inc(model_key, amount=solution['rows_evaluated'])
+
+        results = [None] * n_rows
+        for pos, row in enumerate(valid_rows.tolist()):
+            status = solution['status'][pos]
+            target = float(targets[row])
+            value = solution['value'][pos]
+            bracket_low = solution['bracket_low'][pos]
+            results[row] = {
+                'index': row,
+                'valid': True,
+                'status': status,
+                'target_fos': target,
+                # Not rounded: a rounded value could fall past a tree split
+                'value': None if np.isnan(value) else float(value),
+                'fos': None if np.isnan(value) else round(float(solution['fos'][pos]), 4),
+                'bracket': None if np.isnan(bracket_low) else {
+                    'low': float(bracket_low),
+                    'high': float(solution['bracket_high'][pos])
+                },
+                'message': inverse_message(status, mode, parameter, target,
+                                           solution['fos_best'][pos], lower, upper)
+            }
+        for row, errors in row_errors.items():
+            results[row] = {'index': row, 'valid': False, 'errors': errors}
+        if bulk:
+            for row, section in enumerate(sections):
+                if isinstance(section, dict) and 'id' in section:
+                    results[row]['id'] = section['id']
+
+        payload = {
+            'success': True,
+            'prediction_type': 'inverse',
+            'solve_for': parameter,
+            'unit': bounds['unit'],
+            'mode': mode,
+            'search_range': {'min': lower, 'max': upper},
+            'solver': {
+                'model_calls': solution['model_calls'],
+                'rows_evaluated': solution['rows_evaluated']
+            },
+            'model': model_summary(model_name, model_metrics)
+        }
+        if bulk:
+            payload.update({
+                'count': n_rows,
+                'valid_count': int(len(valid_rows)),
+                'invalid_count': int(n_rows - len(valid_rows)),
+                'results': results
+            })
+        else:
+            result = results[0]
+            del result['index'], result['valid']
+            payload['result'] = result
+        return payload, 200
+
+    except ValueError as e:
+        return {
+            'error': 'Invalid input values',
+            'message': str(e)
+        }, 400
+
+    except ModelUnavailable as e:
+        return {
+            'error': 'Model unavailable',
+            'message': str(e)
+        }, 503
+
+    except Exception as e:
+        return {
+            'error': 'Inverse solve failed',
+            'message': str(e)
+        }, 500
+
+
+def model_versions():
+    """Registry state: active, available, loaded and rollback versions"""
+    return dict(model_registry.stats(), registry=str(MODEL_REGISTRY_DIR))
+
+
+def _admin_denied(token):
+    """(payload, status) rejecting an admin request, or None if the token is valid"""
+    if not ADMIN_TOKEN:
+        return {'error': 'Admin endpoints disabled', 'message': 'Set FOS_ADMIN_TOKEN to enable them'}, 403
+    if not hmac.compare_digest(str(token or ''), ADMIN_TOKEN):
+        return {'error': 'Invalid admin token'}, 401
+    return None
+
+
+def handle_model_reload(data, token):
+    """
+    Load a model version (default: the newest) and swap it in.
+
+    The version is loaded and warmed up before the swap, so requests keep
+    being served by the old version meanwhile. The choice is pinned in the
+    registry's ACTIVE file for the watchers of other worker processes.
+    """
+    denied = _admin_denied(token)
+    if denied:
+        return denied
+    name = data.get('version') if isinstance(data, dict) else None
+    try:
+        version = model_registry.activate(None if name is None else str(name))
+    except KeyError:
+        return {'error': f'Unknown model version: {name}'}, 404
+    except Exception as e:
+        return {'error': 'Model reload failed', 'message': str(e)}, 500
+    return {'success': True, 'active': version.describe(), 'history': list(model_registry.history)}, 200
+
+
+def handle_model_rollback(data, token):
+    """Swap back to the previously active model version"""
+    denied = _admin_denied(token)
+    if denied:
+        return denied
+    try:
+        version = model_registry.rollback()
+    except KeyError:
+        return {'error': 'No previous version to roll back to'}, 409
+    except Exception as e:
+        return {'error': 'Model rollback failed', 'message': str(e)}, 500
+    return {'success': True, 'active': version.describe(), 'history': list(model_registry.history)}, 200
+
+
+def json_route(handler, *args):
+    """Run a (payload, status) handler on the request body, timing parse and serialize"""
+    started = time.perf_counter()
+    data = request.get_json(silent=True)
+    observe_stage('parse', started)
+    payload, status = handler(data, *args)
+    started = time.perf_counter()
+    response = jsonify(payload)
+    observe_stage('serialize', started)
+    return response, status
+
+
+def encoded_response(payload, output):
+    """Response with a compact payload encoded in a wire_format output format"""
+    started = time.perf_counter()
+    body, content_type, headers = wire_format.encode(payload, output)
+    observe_stage('serialize', started)
+    response = Response(body, content_type=content_type, headers=headers)
+    response.vary.add('Accept')
+    return response
+
+
+def negotiated_route(handler):
+    """
+    json_route for the prediction endpoints: the Accept header selects the
+    verbose JSON response or a compact wire_format encoding. Errors are
+    always JSON.
+    """
+    output = wire_format.negotiate(request.headers.get('Accept'))
+    if output == 'json':
+        response, status = json_route(handler)
+        response.vary.add('Accept')
+        return response, status
+    started = time.perf_counter()
+    data = request.get_json(silent=True)
+    observe_stage('parse', started)
+    payload, status = handler(data, output)
+    if status != 200:
+        return jsonify(payload), status
+    return encoded_response(payload, output)
+
+
+@app.before_request
+def start_request_metrics():
+    request_context.endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    request_context.model = ''
+    request_context.started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = getattr(request_context, 'endpoint', 'unmatched')
+    status = str(response.status_code)
+    REQUESTS.inc(endpoint, request.method, status)
+    if response.status_code >= 400:
+        REQUEST_ERRORS.inc(endpoint, status)
+    started = getattr(request_context, 'started', None)
+    if started is not None:
+        REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint, request_context.model)
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """gzip large and streamed responses for clients that accept it"""
+    if COMPRESS_LEVEL <= 0 or 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    if not wire_format.accepts_gzip(request.headers.get('Accept-Encoding')):
+        return response
+    if response.is_streamed:
+        response.response = wire_format.gzip_chunks(response.response, COMPRESS_LEVEL)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < COMPRESS_MIN_BYTES:
+            return response
+        started = time.perf_counter()
+        response.set_data(wire_format.gzip_body(body, COMPRESS_LEVEL))
+        observe_stage('compress', started)
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
+
+@metrics.collector
+def service_metrics():
+    """Cache, coalescer and model-version values read at scrape time"""
+    cache = prediction_cache.stats()
+    samples = [
+        ('fos_cache_hits_total', 'counter', 'Prediction cache hits', [({}, cache['hits'])]),
+        ('fos_cache_misses_total', 'counter', 'Prediction cache misses', [({}, cache['misses'])]),
+        ('fos_cache_evictions_total', 'counter', 'Prediction cache LRU evictions', [({}, cache['evictions'])]),
+        ('fos_cache_entries', 'gauge', 'Prediction cache entries', [({}, cache['size'])])
+    ]
+    version = model_registry.current
+    samples.append(('fos_model_version_info', 'gauge', 'Active model version',
+                    [({'version': version.name, 'engine': version.engine}, 1)] if version else []))
+    samples.append(('fos_model_swaps_total', 'counter', 'Model version swaps', [({}, model_registry.swaps)]))
+    if request_coalescer is not None:
+        coalescer = request_coalescer.stats()
+        samples += [
+            ('fos_coalescer_queue_depth', 'gauge', 'Rows waiting in the coalescer', [({}, coalescer['queue_depth'])]),
+            ('fos_coalescer_batches_total', 'counter', 'Coalesced batches', [({}, coalescer['batches'])]),
+            ('fos_coalescer_rows_total', 'counter', 'Rows predicted by the coalescer', [({}, coalescer['rows'])]),
+            ('fos_coalescer_rejected_total', 'counter', 'Rows rejected with a full queue', [({}, coalescer['rejected'])])
+        ]
+    return samples
+
+
+@app.route('/metrics')
+def get_metrics():
+    """Prometheus metrics"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics disabled'}), 404
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/models/versions')
+def get_model_versions():
+    """List model versions"""
+    return jsonify(model_versions())
+
+
+@app.route('/admin/models/reload', methods=['POST'])
+def reload_models():
+    """Hot-reload a model version (requires X-Admin-Token)"""
+    return json_route(handle_model_reload, request.headers.get('X-Admin-Token'))
+
+
+@app.route('/admin/models/rollback', methods=['POST'])
+def rollback_models():
+    """Roll back to the previous model version (requires X-Admin-Token)"""
+    return json_route(handle_model_rollback, request.headers.get('X-Admin-Token'))
+
+
+@app.route('/predict', methods=['POST'])
+def predict():
+    """Make FoS prediction (see handle_predict for the request formats)"""
+    return negotiated_route(handle_predict)
+
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Score many records in one request (see handle_predict_batch)"""
+    return negotiated_route(handle_predict_batch)
+
+
+@app.route('/predict/file', methods=['POST'])
+def predict_file():
+    """
+    Score an uploaded CSV or Parquet file (see handle_predict_file).
+
+    Send the file as the multipart field "file", or as the raw body with a
+    text/csv or application/vnd.apache.parquet content type. Options come
+    from the query string or form fields.
+    """
+    options = request.values.to_dict()
+    upload = request.files.get('file')
+    if upload is not None:
+        stream = upload.stream
+        options.setdefault('format', bulk_scoring.detect_format(upload.filename, upload.content_type))
+    else:
+        stream = request.stream
+        options.setdefault('format', bulk_scoring.detect_format(content_type=request.content_type))
+        if options['format'] == 'parquet':
+            # Parquet readers seek to the footer first, so spool the body to disk
+            spooled = tempfile.SpooledTemporaryFile(max_size=UPLOAD_CHUNK_ROWS * 64)
+            shutil.copyfileobj(stream, spooled)
+            spooled.seek(0)
+            stream = spooled
+
+    body, status, content_type = handle_predict_file(stream, options)
+    if status != 200:
+        return jsonify(body), status
+    return Response(stream_with_context(body), content_type=content_type)
+
+
+@app.route('/reliability', methods=['POST'])
+def reliability():
+    """Monte Carlo probability of failure (see handle_reliability)"""
+    return json_route(handle_reliability)
+
+
+@app.route('/inverse', methods=['POST'])
+def inverse():
+    """Input value required for a target FoS (see handle_inverse)"""
+    return json_route(handle_inverse)
+
+
+@app.route('/sweep', methods=['POST'])
+def sweep():
+    """FoS over a parameter grid (see handle_sweep), streamed when large"""
+    output = wire_format.negotiate(request.headers.get('Accept'))
+    started = time.perf_counter()
+    data = request.get_json(silent=True)
+    observe_stage('parse', started)
+    payload, status = handle_sweep(data, output)
+    if status != 200:
+        return jsonify(payload), status
+    if output != 'json':
+        return encoded_response(payload, output)
+    if payload['points'] > SWEEP_STREAM_POINTS:
+        return Response(stream_with_context(iter_sweep_json(payload)), content_type='application/json')
+    started = time.perf_counter()
+    body = ''.join(iter_sweep_json(payload))
+    observe_stage('serialize', started)
+    return Response(body, content_type='application/json')
+
+
+def warm_up_requests():
+    """
+    Send a single and a batch prediction per loaded model through the Flask
+    test client, so the first real requests do not pay the one-time costs
+    of routing, JSON handling and the handlers' code paths. Metrics and the
+    prediction cache are left as they were before.
+    """
+    version = model_registry.current
+    rows = [dict(zip(FEATURE_NAMES, row)) for row in WARMUP_FEATURES.tolist()]
+    recording = metrics.enabled
+    metrics.enabled = False
+    try:
+        client = app.test_client()
+        for key in ('gradient_boosting', 'xgboost', 'ensemble'):
+            if key in version.models and key not in version.pending:
+                client.post('/predict', json=dict(rows[-1], model=key))
+                client.post('/predict/batch', json={'records': rows, 'model': key})
+    finally:
+        metrics.enabled = recording
+        prediction_cache.reset()
+
+
+if models_loaded() and WARMUP_ROWS > 0:
+    started = time.perf_counter()
+    warm_up_requests()
+    STARTUP['warmup_requests_seconds'] = round(time.perf_counter() - started, 3)
+STARTUP['ready_seconds'] = round(time.perf_counter() - STARTUP_STARTED, 3)
+print(f"✓ Ready in {STARTUP['ready_seconds']:.2f}s")
 
 
 if __name__ == '__main__':
@@ -403,9 +2191,16 @@ if __name__ == '__main__':
     print("API will be available at: http://localhost:5000")
     print("\nEndpoints:")
     print("  GET  /         - API information")
-    print("  GET  /health   - Health check")
+    print("  GET  /health   - Health check (/health/live, /health/ready for probes)")
     print("  GET  /models   - Model information")
     print("  POST /predict  - Make prediction")
+    print("  POST /predict/batch - Batch prediction")
+    print("  POST /predict/file - CSV/Parquet file scoring")
+    print("  POST /reliability - Probability of failure")
+    print("  POST /sweep    - Parameter sweep")
+    print("  POST /inverse  - Inverse design")
+    print("\nDevelopment server only - for production use:")
+    print("  gunicorn -c gunicorn.conf.py")
     print("\n" + "="*60 + "\n")
     
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+"""
+ASGI front end for the FoS Prediction API.
+
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+
+Serves the same endpoints and JSON as the Flask app (both call the handlers
+in app.py), but connections are handled on an event loop. JSON decoding,
+the prediction itself and JSON encoding run in a bounded executor so large
+batch requests never block the loop, and requests beyond the executor's
+queue limit are rejected immediately with 429 instead of piling up.
+The Accept header selects the response format of /predict, /predict/batch
+and /sweep (see wire_format), and large responses are gzip-compressed.
+
+Environment variables:
+    FOS_ASGI_EXECUTOR      'thread' (default) or 'process'
+    FOS_ASGI_WORKERS       Executor workers (default: CPU count)
+    FOS_ASGI_MAX_PENDING   Requests admitted to the executor at once,
+                           running or queued (default: 8 x workers)
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+import app as fos
+import bulk_scoring
+import wire_format
+
+EXECUTOR_KIND = os.environ.get('FOS_ASGI_EXECUTOR', 'thread').lower()
+EXECUTOR_WORKERS = int(os.environ.get('FOS_ASGI_WORKERS', os.cpu_count() or 1))
+MAX_PENDING = int(os.environ.get('FOS_ASGI_MAX_PENDING', EXECUTOR_WORKERS * 8))
+
+
+def _encode(payload):
+    """Serialize like Flask's jsonify (sorted keys, compact, trailing newline)"""
+    return (json.dumps(payload, sort_keys=True, separators=(',', ':')) + '\n').encode()
+
+
+def run_json_handler(handler, body, endpoint, encode=None, output='json'):
+    """
+    Decode a request body, run a handler from app.py and encode its result.
+
+    Runs inside the executor. Takes and returns bytes so that a process pool
+    only has to pickle the raw request and response. encode, a generator of
+    JSON text chunks, replaces _encode for successful responses; an output
+    other than 'json' is passed to the handler and its successful response
+    is encoded by wire_format instead. Returns (body, status, model label,
+    media type, headers).
+    """
+    fos.request_context.endpoint = endpoint
+    fos.request_context.model = ''
+    started = time.perf_counter()
+    try:
+        data = json.loads(body) if body else None
+    except ValueError:
+        data = None
+    fos.observe_stage('parse', started)
+    payload, status = handler(data) if output == 'json' else handler(data, output)
+    started = time.perf_counter()
+    media_type, headers = 'application/json', {}
+    if output != 'json' and status == 200:
+        encoded, media_type, headers = wire_format.encode(payload, output)
+    elif encode is not None and status == 200:
+        encoded = ''.join(encode(payload)).encode()
+    else:
+        encoded = _encode(payload)
+    fos.observe_stage('serialize', started)
+    return encoded, status, fos.request_context.model, media_type, headers
+
+
+class AdmissionControl:
+    """Bounded executor plus an in-flight counter checked on the event loop"""
+
+    def __init__(self, kind, workers, max_pending):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"FOS_ASGI_EXECUTOR must be 'thread' or 'process', got {kind!r}")
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor = None
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def start(self):
+        if self.kind == 'process':
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='fos-asgi')
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+
+    def admit(self):
+        """Count a request in, or return False (and count a rejection) if the server is saturated"""
+        # Only the event loop thread touches the counters, so no lock is needed
+        if self.in_flight >= self.max_pending:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self):
+        """Count an admitted request out (on the event loop thread)"""
+        self.in_flight -= 1
+
+    async def run(self, handler, body, endpoint, encode=None, output='json'):
+        """Run a handler in the executor, or return None if the server is saturated"""
+        if not self.admit():
+            return None
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, run_json_handler, handler, body, endpoint, encode, output)
+        finally:
+            self.release()
+
+    def stats(self):
+        """Executor counters for /health"""
+        return {
+            'executor': self.kind,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'in_flight': self.in_flight,
+            'admitted': self.admitted,
+            'rejected': self.rejected
+        }
+
+
+admission = AdmissionControl(EXECUTOR_KIND, EXECUTOR_WORKERS, MAX_PENDING)
+
+
+def json_response(payload, status=200):
+    return Response(_encode(payload), status_code=status, media_type='application/json')
+
+
+async def home(request):
+    """API home endpoint"""
+    return json_response(fos.api_info())
+
+
+async def health(request):
+    """Health check endpoint"""
+    return json_response(dict(fos.health_status(), asgi=admission.stats()))
+
+
+async def health_live(request):
+    """Liveness probe"""
+    return json_response(fos.liveness())
+
+
+async def health_ready(request):
+    """Readiness probe"""
+    payload, status = fos.readiness()
+    return json_response(payload, status)
+
+
+async def get_models(request):
+    """Get model information"""
+    return json_response(fos.models_info())
+
+
+async def get_model_versions(request):
+    """List model versions"""
+    return json_response(fos.model_versions())
+
+
+async def _admin(request, handler):
+    # Model loading can take seconds; keep it off the loop but outside the
+    # prediction executor so admission control never rejects it
+    try:
+        data = json.loads(await request.body() or b'null')
+    except ValueError:
+        data = None
+    payload, status = await run_in_threadpool(handler, data, request.headers.get('X-Admin-Token'))
+    return json_response(payload, status)
+
+
+async def reload_models(request):
+    """Hot-reload a model version (requires X-Admin-Token)"""
+    return await _admin(request, fos.handle_model_reload)
+
+
+async def rollback_models(request):
+    """Roll back to the previous model version (requires X-Admin-Token)"""
+    return await _admin(request, fos.handle_model_rollback)
+
+
+async def get_metrics(request):
+    """Prometheus metrics (with a process executor, stage timings stay in the pool processes)"""
+    if not fos.metrics.enabled:
+        return json_response({'error': 'Metrics disabled'}, 404)
+    return Response(fos.metrics.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def busy_response():
+    return Response(
+        _encode({
+            'error': 'Server busy',
+            'message': f'{admission.max_pending} requests already in progress, retry shortly'
+        }),
+        status_code=429,
+        media_type='application/json',
+        headers={'Retry-After': '1'}
+    )
+
+
+async def _offload(request, handler, encode=None, negotiate=False):
+    # negotiate: the handler takes an output format chosen by the Accept header
+    output = wire_format.negotiate(request.headers.get('accept')) if negotiate else 'json'
+    result = await admission.run(handler, await request.body(), request.url.path, encode, output)
+    if result is None:
+        return busy_response()
+    body, status, model, media_type, headers = result
+    request.scope['fos.model'] = model
+    if negotiate:
+        headers = dict(headers, Vary='Accept')
+    return Response(body, status_code=status, media_type=media_type, headers=headers)
+
+
+async def predict(request):
+    """Make FoS prediction (see app.handle_predict for the request formats)"""
+    return await _offload(request, fos.handle_predict, negotiate=True)
+
+
+async def predict_batch(request):
+    """Score many records in one request (see app.handle_predict_batch)"""
+    return await _offload(request, fos.handle_predict_batch, negotiate=True)
+
+
+async def predict_file(request):
+    """
+    Score a CSV or Parquet request body (see app.handle_predict_file).
+
+    The body is spooled to a temporary file (to disk beyond a few MB) and
+    scored chunk by chunk while the result streams back. The request counts
+    against admission control from before the upload is read until the
+    last result chunk is sent, so a saturated server answers 429 at once.
+    The spool writes and the scoring run in the thread pool, never on the
+    event loop. Multipart uploads are served by the Flask app only.
+    """
+    if not admission.admit():
+        return busy_response()
+    options = dict(request.query_params)
+    options.setdefault('format', bulk_scoring.detect_format(content_type=request.headers.get('content-type')))
+    spooled = tempfile.SpooledTemporaryFile(max_size=fos.UPLOAD_CHUNK_ROWS * 64)
+    try:
+        async for block in request.stream():
+            await run_in_threadpool(spooled.write, block)
+        await run_in_threadpool(spooled.seek, 0)
+        body, status, content_type = await run_in_threadpool(fos.handle_predict_file, spooled, options)
+    except BaseException:
+        spooled.close()
+        admission.release()
+        raise
+    if status != 200:
+        spooled.close()
+        admission.release()
+        return json_response(body, status)
+
+    async def generate():
+        # An async generator, so that release() runs on the event loop when
+        # the stream ends or the client disconnects
+        try:
+            async for chunk in iterate_in_threadpool(body):
+                yield chunk
+        finally:
+            spooled.close()
+            admission.release()
+
+    return StreamingResponse(generate(), media_type=content_type)
+
+
+async def reliability(request):
+    """Monte Carlo probability of failure (see app.handle_reliability)"""
+    return await _offload(request, fos.handle_reliability)
+
+
+async def sweep(request):
+    """FoS over a parameter grid (see app.handle_sweep), encoded in the executor"""
+    return await _offload(request, fos.handle_sweep, fos.iter_sweep_json, negotiate=True)
+
+
+async def inverse(request):
+    """Input value required for a target FoS (see app.handle_inverse)"""
+    return await _offload(request, fos.handle_inverse)
+
+
+class MetricsMiddleware:
+    """Counts requests and records their latency, like the Flask request hooks"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            endpoint = route.path if route is not None else 'unmatched'
+            fos.REQUESTS.inc(endpoint, scope['method'], str(status[0]))
+            if status[0] >= 400:
+                fos.REQUEST_ERRORS.inc(endpoint, str(status[0]))
+            fos.REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint, scope.get('fos.model', ''))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    admission.start()
+    print(f"✓ ASGI executor: {admission.workers} {admission.kind} worker(s), "
+          f"max {admission.max_pending} pending requests")
+    try:
+        yield
+    finally:
+        admission.shutdown()
+
+
+app = Starlette(
+    routes=[
+        Route('/', home),
+        Route('/health', health),
+        Route('/health/live', health_live),
+        Route('/health/ready', health_ready),
+        Route('/models', get_models),
+        Route('/models/versions', get_model_versions),
+        Route('/metrics', get_metrics),
+        Route('/admin/models/reload', reload_models, methods=['POST']),
+        Route('/admin/models/rollback', rollback_models, methods=['POST']),
+        Route('/predict', predict, methods=['POST']),
+        Route('/predict/batch', predict_batch, methods=['POST']),
+        Route('/predict/file', predict_file, methods=['POST']),
+        Route('/reliability', reliability, methods=['POST']),
+        Route('/sweep', sweep, methods=['POST']),
+        Route('/inverse', inverse, methods=['POST'])
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'],
+                   expose_headers=list(wire_format.HEADERS)),
+        Middleware(MetricsMiddleware)
+    ] + ([
+        Middleware(GZipMiddleware, minimum_size=fos.COMPRESS_MIN_BYTES, compresslevel=fos.COMPRESS_LEVEL)
+    ] if fos.COMPRESS_LEVEL > 0 else []),
+    lifespan=lifespan
+)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Chunked readers and writers for bulk file scoring.
+
+Uploaded CSV or Parquet files are read a chunk of rows at a time, so memory
+use depends on the chunk size and not on the file size. The rows of a
+multi-layer section (same section id on consecutive rows) are never split
+across chunks. Results are written as CSV or NDJSON text, one chunk at a
+time, for streaming responses.
+
+Run this file directly to score a file without writing any JSON:
+    python bulk_scoring.py sections.csv -o results.csv
+    python bulk_scoring.py sections.parquet -o results.ndjson --url http://localhost:5000
+"""
+
+import csv
+import io
+import itertools
+import json
+
+# Recognised id columns (after normalise_column), in order of preference
+SECTION_COLUMNS = ('section_id', 'section', 'id')
+LAYER_COLUMNS = ('layer', 'layer_id', 'layer_name', 'name')
+
+FILE_FORMATS = ('csv', 'parquet')
+OUTPUT_FORMATS = ('csv', 'ndjson')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+
+def normalise_column(name):
+    """'Friction Angle' -> 'friction_angle'"""
+    return str(name).strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def detect_format(filename=None, content_type=None):
+    """File format from an extension or a content type (default CSV)"""
+    if filename and str(filename).lower().endswith(('.parquet', '.pq')):
+        return 'parquet'
+    if content_type and 'parquet' in content_type:
+        return 'parquet'
+    return 'csv'
+
+
+class UploadReader:
+    """The recognised columns of an uploaded file and an iterator of row chunks"""
+
+    def __init__(self, columns, chunks):
+        """
+        Parameters:
+        -----------
+        columns : list of str
+            Normalised names of the recognised columns in the file
+        chunks : iterator of dict
+            Column name -> list of values (None for empty cells)
+        """
+        self.columns = columns
+        self.chunks = chunks
+        self.section_column = next((name for name in SECTION_COLUMNS if name in columns), None)
+        self.layer_column = next((name for name in LAYER_COLUMNS if name in columns), None)
+
+
+def _select_columns(names, wanted):
+    """Map each wanted normalised name to the first matching source column"""
+    positions = {}
+    for position, name in enumerate(names):
+        key = normalise_column(name)
+        if key in wanted and key not in positions:
+            positions[key] = position
+    return positions
+
+
+def open_csv(stream, wanted, chunk_rows):
+    """
+    Read a binary CSV stream lazily. The header is read immediately, so a
+    missing column is reported before any row is scored.
+    """
+    reader = csv.reader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    header = next(reader, None)
+    if header is None:
+        raise ValueError('The file is empty')
+    wanted = set(wanted) | set(SECTION_COLUMNS) | set(LAYER_COLUMNS)
+    positions = _select_columns(header, wanted)
+
+    def chunks():
+        while True:
+            rows = list(itertools.islice(reader, chunk_rows))
+            if not rows:
+                return
+            yield {
+                name: [row[i] if i < len(row) and row[i].strip() else None for row in rows]
+                for name, i in positions.items()
+            }
+
+    return UploadReader(list(positions), chunks())
+
+
+def open_parquet(file, wanted, chunk_rows):
+    """Read a seekable Parquet file one record batch at a time (requires pyarrow)"""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError('Parquet files need pyarrow (pip install pyarrow); upload a CSV instead')
+    parquet = pq.ParquetFile(file)
+    names = parquet.schema_arrow.names
+    wanted = set(wanted) | set(SECTION_COLUMNS) | set(LAYER_COLUMNS)
+    positions = _select_columns(names, wanted)
+    sources = {name: names[i] for name, i in positions.items()}
+
+    def chunks():
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=list(sources.values())):
+            yield {name: batch.column(source).to_pylist() for name, source in sources.items()}
+
+    return UploadReader(list(positions), chunks())
+
+
+def align_sections(chunks, section_column):
+    """
+    Re-chunk so that the rows of a section are never split.
+
+    The trailing rows of each chunk that share the last section id are held
+    back and prepended to the next chunk. Sections must be on consecutive
+    rows; an id that appears again later starts a new section.
+    """
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = {name: carry[name] + values for name, values in chunk.items()}
+        ids = chunk[section_column]
+        cut = len(ids)
+        while cut > 0 and ids[cut - 1] == ids[-1]:
+            cut -= 1
+        carry = {name: values[cut:] for name, values in chunk.items()}
+        if cut:
+            yield {name: values[:cut] for name, values in chunk.items()}
+    if carry is not None and carry[section_column]:
+        yield carry
+
+
+class ResultWriter:
+    """Formats result records as CSV or NDJSON text"""
+
+    def __init__(self, output_format, fields):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f'output must be one of {", ".join(OUTPUT_FORMATS)}')
+        self.output_format = output_format
+        self.fields = fields
+        self.content_type = CONTENT_TYPES[output_format]
+
+    def header(self):
+        if self.output_format != 'csv':
+            return ''
+        return self.write([dict(zip(self.fields, self.fields))])
+
+    def write(self, records):
+        if self.output_format == 'ndjson':
+            return ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, self.fields, extrasaction='ignore', lineterminator='\n')
+        writer.writerows(records)
+        return buffer.getvalue()
+
+
+def _post_file(url, path, params, output):
+    """Stream a file to /predict/file and the scored rows into output"""
+    import http.client
+    import os
+    from urllib.parse import urlencode, urlsplit
+
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    connection = connection_class(parts.netloc)
+    file_format = detect_format(path)
+    with open(path, 'rb') as f:
+        connection.request('POST', f'{parts.path.rstrip("/")}/predict/file?{urlencode(params)}', body=f, headers={
+            'Content-Type': 'application/vnd.apache.parquet' if file_format == 'parquet' else 'text/csv',
+            'Content-Length': str(os.path.getsize(path))
+        })
+    response = connection.getresponse()
+    if response.status != 200:
+        raise SystemExit(f"Server returned {response.status}: {response.read().decode(errors='replace')}")
+    while True:
+        block = response.read(1 << 16)
+        if not block:
+            break
+        output.write(block)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    parser = argparse.ArgumentParser(description='Score a CSV or Parquet file of slope sections')
+    parser.add_argument('input', help='CSV or Parquet file with cohesion, friction_angle, unit_weight '
+                                      'and optional ru, section_id and layer columns')
+    parser.add_argument('-o', '--output', help='Result file (default: stdout); .ndjson selects NDJSON')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, help='Result format (default: from --output)')
+    parser.add_argument('--model', default='gradient_boosting',
+                        choices=['gradient_boosting', 'xgboost', 'ensemble'])
+    parser.add_argument('--model-version', help='Pin a model version')
+    parser.add_argument('--url', help='Score on a running API server instead of in-process')
+    args = parser.parse_args()
+
+    output_format = args.format or ('ndjson' if (args.output or '').endswith(('.ndjson', '.jsonl')) else 'csv')
+    params = {'model': args.model, 'output': output_format}
+    if args.model_version:
+        params['model_version'] = args.model_version
+
+    started = time.perf_counter()
+    out = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        if args.url:
+            _post_file(args.url, args.input, params, out)
+        else:
+            from app import handle_predict_file
+            with open(args.input, 'rb') as f:
+                body, status, _ = handle_predict_file(f, dict(params, format=detect_format(args.input)))
+                if status != 200:
+                    raise SystemExit(f"{body['error']}: {body.get('message', '')}")
+                for text in body:
+                    out.write(text.encode())
+    finally:
+        if args.output:
+            out.close()
+    print(f"✓ Scored {args.input} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
@@ -0,0 +1,53 @@
+"""
+Production server configuration for the FoS Prediction API.
+
+    gunicorn -c gunicorn.conf.py
+
+The app (and every model) is loaded once in the master process before the
+workers are forked, so the model memory is shared copy-on-write instead of
+being unpickled again in each worker. Each worker is limited to a fixed
+number of BLAS/OpenMP/XGBoost threads so that N workers do not
+oversubscribe the cores.
+
+Environment variables:
+    FOS_BIND                 Address to listen on (default 0.0.0.0:5000)
+    FOS_CPU_COUNT            Cores available to the server (default: all)
+    FOS_WORKERS              Worker processes (default: FOS_CPU_COUNT)
+    FOS_THREADS_PER_WORKER   Numerical threads per worker (default: cores / workers)
+    FOS_REQUEST_THREADS      Request-handling threads per worker (default 4)
+"""
+
+import gc
+import multiprocessing
+import os
+
+cpu_count = int(os.environ.get('FOS_CPU_COUNT', multiprocessing.cpu_count()))
+worker_count = int(os.environ.get('FOS_WORKERS', cpu_count))
+threads_per_worker = int(os.environ.get('FOS_THREADS_PER_WORKER', max(1, cpu_count // worker_count)))
+
+# Thread pools are sized when numpy/xgboost are first imported, which
+# happens when the app is preloaded below, so set the limits first
+for variable in ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'NUMEXPR_NUM_THREADS'):
+    os.environ.setdefault(variable, str(threads_per_worker))
+
+# Native XGBoost thread pool, applied to every model version the app loads
+os.environ.setdefault('FOS_NATIVE_THREADS', str(threads_per_worker))
+
+wsgi_app = 'app:app'
+bind = os.environ.get('FOS_BIND', '0.0.0.0:5000')
+workers = worker_count
+worker_class = 'gthread'
+threads = int(os.environ.get('FOS_REQUEST_THREADS', 4))
+preload_app = True
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+accesslog = '-'
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded, just before forking"""
+    # Move the loaded objects out of the collector's generations so that
+    # garbage collection in the workers does not touch (and copy) their pages
+    gc.freeze()
+    server.log.info(f"Forking {worker_count} workers with {threads_per_worker} numerical thread(s) each")
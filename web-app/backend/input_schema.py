@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Declarative input schema shared by every prediction endpoint.
+
+The schema is built once from the feature ranges published by /models. The
+bounds are compiled into arrays and every error entry
+({field, code, message}) is created up front, so:
+
+- validate() converts and range-checks a whole batch with a few NumPy
+  operations, and builds errors only for the rows that fail;
+- validate_record() is the equivalent scalar path for a single record,
+  which is cheaper than array set-up for one row.
+
+Both give the same values, error codes, messages and error order.
+Single predictions, layer profiles, batches, uploaded files, sweeps and
+inverse requests all use the same schema, so every path accepts and
+rejects exactly the same inputs.
+"""
+
+import math
+
+import numpy as np
+
+# Error codes, in the order a single request reports them
+ERROR_CODES = ('missing', 'invalid', 'out_of_range')
+
+
+def column_to_float(values):
+    """
+    Convert a list of JSON values to a float64 array.
+
+    Returns the array and masks of entries that are missing (None) and
+    that cannot be converted to a finite float.
+    """
+    missing = np.fromiter((value is None for value in values), dtype=bool, count=len(values))
+    try:
+        column = np.asarray(values, dtype=float)
+        if column.ndim != 1:
+            raise ValueError('nested values')
+        invalid = ~np.isfinite(column) & ~missing
+    except (TypeError, ValueError):
+        column = np.full(len(values), np.nan)
+        invalid = np.zeros(len(values), dtype=bool)
+        for i, value in enumerate(values):
+            if value is None:
+                continue
+            try:
+                column[i] = float(value)
+            except (TypeError, ValueError):
+                invalid[i] = True
+        invalid |= ~np.isfinite(column) & ~missing
+    return column, missing, invalid
+
+
+class InputSchema:
+    """Bounds, defaults and error messages of the model inputs, compiled once"""
+
+    def __init__(self, fields, ranges, defaults=None, range_messages=None):
+        """
+        Parameters:
+        -----------
+        fields : list of str
+            Feature names in model column order
+        ranges : dict
+            Field -> {'min', 'max', 'unit'} (the ranges /models publishes)
+        defaults : dict, optional
+            Field -> value used when the field is missing; other fields are
+            required
+        range_messages : dict, optional
+            Field -> out-of-range message (default: generated from the range)
+        """
+        self.fields = list(fields)
+        self.ranges = {field: dict(ranges[field]) for field in self.fields}
+        self.defaults = dict(defaults or {})
+        self.lower = np.array([self.ranges[field]['min'] for field in self.fields], dtype=np.float64)
+        self.upper = np.array([self.ranges[field]['max'] for field in self.fields], dtype=np.float64)
+
+        range_messages = range_messages or {}
+        self.range_messages = {
+            field: range_messages.get(field) or (
+                f"{field.replace('_', ' ').capitalize()} must be between "
+                f"{self.ranges[field]['min']} and {self.ranges[field]['max']} {self.ranges[field].get('unit', '')}"
+            ).strip()
+            for field in self.fields
+        }
+        # Shared error entries, indexed [column][ERROR_CODES index]
+        self.errors = [
+            [
+                {'field': field, 'code': 'missing', 'message': f'Missing required field: {field}'},
+                {'field': field, 'code': 'invalid', 'message': f'Invalid value for field: {field}'},
+                {'field': field, 'code': 'out_of_range', 'message': self.range_messages[field]}
+            ]
+            for field in self.fields
+        ]
+        self._bounds = list(zip(self.fields, self.lower.tolist(), self.upper.tolist(), self.errors))
+
+    def validate(self, columns, n_rows, row_errors=None, defaults=None):
+        """
+        Convert and range-check a batch.
+
+        Parameters:
+        -----------
+        columns : dict
+            Field -> list of n_rows JSON values (None = missing)
+        n_rows : int
+        row_errors : dict, optional
+            Row index -> errors already found; those rows are rejected and
+            not checked again
+        defaults : dict, optional
+            Overrides the schema defaults ({} makes every field required)
+
+        Returns:
+        --------
+        features : numpy.ndarray
+            (n_rows, fields) matrix, NaN where a value is missing or invalid
+        valid : numpy.ndarray
+            Boolean mask of the rows that passed
+        row_errors : dict
+            Row index -> list of {field, code, message}, in field order
+        """
+        defaults = self.defaults if defaults is None else defaults
+        row_errors = dict(row_errors or {})
+        features = np.empty((n_rows, len(self.fields)))
+        missing = np.empty((n_rows, len(self.fields)), dtype=bool)
+        invalid = np.empty((n_rows, len(self.fields)), dtype=bool)
+        for col, field in enumerate(self.fields):
+            features[:, col], missing[:, col], invalid[:, col] = column_to_float(columns[field])
+            if field in defaults:
+                features[missing[:, col], col] = defaults[field]
+                missing[:, col] = False
+
+        with np.errstate(invalid='ignore'):
+            in_range = (features >= self.lower) & (features <= self.upper)
+        out_of_range = ~in_range & ~missing & ~invalid
+        failed = missing | invalid | out_of_range
+
+        rejected = np.zeros(n_rows, dtype=bool)
+        rejected[list(row_errors)] = True
+        failed &= ~rejected[:, None]
+        valid = ~rejected & ~failed.any(axis=1)
+
+        # Only failing rows cost Python work; nonzero is row-major, so each
+        # row's errors come out in field order
+        if failed.any():
+            rows, cols = np.nonzero(failed)
+            codes = np.where(missing[rows, cols], 0, np.where(invalid[rows, cols], 1, 2))
+            for row, col, code in zip(rows.tolist(), cols.tolist(), codes.tolist()):
+                row_errors.setdefault(row, []).append(self.errors[col][code])
+        return features, valid, row_errors
+
+    def validate_record(self, record, defaults=None):
+        """
+        Scalar path of validate for one record (a dict).
+
+        Returns (features, errors): the feature values as a list (NaN where
+        missing or invalid) and the record's errors.
+        """
+        defaults = self.defaults if defaults is None else defaults
+        features, errors = [], []
+        for field, lower, upper, field_errors in self._bounds:
+            value = record.get(field)
+            if value is None:
+                value = defaults.get(field)
+                if value is None:
+                    features.append(math.nan)
+                    errors.append(field_errors[0])
+                    continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                value = math.nan
+            if not math.isfinite(value):
+                errors.append(field_errors[1])
+            elif not lower <= value <= upper:
+                errors.append(field_errors[2])
+            features.append(value)
+        return features, errors
+
+    def check_values(self, field, values):
+        """Raise ValueError unless every value (array) of one field is within its range"""
+        col = self.fields.index(field)
+        if not np.all((values >= self.lower[col]) & (values <= self.upper[col])):
+            raise ValueError(self.range_messages[field])
+
+    @staticmethod
+    def first_error(errors):
+        """The error a single request reports: missing before invalid before out of range, then field order"""
+        return min(errors, key=lambda error: ERROR_CODES.index(error['code']))
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Inverse design: solve for the input value that gives a target FoS.
+
+All other inputs are held fixed. Tree ensembles (and the lookup grids built
+from them) are piecewise constant, so FoS generally never equals the
+target exactly; the solver instead locates where the condition
+"FoS >= target" switches along the solved input:
+
+    minimum  the smallest value meeting the target
+             (e.g. the cohesion that remediation must reach)
+    maximum  the largest value up to which the target is still met
+             (e.g. the allowable Ru)
+
+The search is a batched bracketing search. A coarse scan of the whole range
+finds the first switch for every problem, even when FoS is not monotonic,
+and each refinement pass evaluates many points inside every open bracket.
+One pass is a single model call for all problems, so the number of model
+calls does not grow with the number of problems.
+"""
+
+import numpy as np
+
+MODES = ('minimum', 'maximum')
+
+# Result status codes
+SOLVED = 'solved'
+MET_AT_BOUND = 'met_at_bound'
+NOT_REACHABLE = 'not_reachable'
+
+
+def solve_inverse(predict_fn, features, column, targets, lower, upper, mode='minimum',
+                  scan_points=65, refine_points=32, tolerance=None, max_iterations=12):
+    """
+    Solve many inverse problems together.
+
+    Parameters:
+    -----------
+    predict_fn : callable
+        Maps an (N, 4) matrix of raw features to N FoS values
+    features : numpy.ndarray
+        (n, 4) fixed inputs, one row per problem (the solved column is ignored)
+    column : int
+        Column of the solved input
+    targets : numpy.ndarray
+        (n,) target FoS per problem
+    lower, upper : float
+        Search range of the solved input
+    mode : str
+        'minimum' or 'maximum' (see module docstring)
+    scan_points : int
+        Points of the initial scan of the whole range
+    refine_points : int
+        Points evaluated inside each bracket per refinement pass
+    tolerance : float, optional
+        Bracket width at which a problem is solved (default: range / 10^4)
+    max_iterations : int
+        Refinement passes at most
+
+    Returns:
+    --------
+    result : dict of numpy.ndarray
+        status, value, fos (at value), bracket_low, bracket_high and
+        fos_best (closest FoS seen when the target is not reachable),
+        plus the model call and evaluated row counts
+    """
+    if mode not in MODES:
+        raise ValueError(f'mode must be one of {", ".join(MODES)}')
+    n = len(features)
+    targets = np.broadcast_to(np.asarray(targets, dtype=np.float64), (n,))
+    tolerance = (upper - lower) / 1e4 if tolerance is None else float(tolerance)
+    minimum = mode == 'minimum'
+    calls = 0
+    rows_evaluated = 0
+
+    def evaluate(rows, xs):
+        nonlocal calls, rows_evaluated
+        X = np.repeat(features[rows], xs.shape[1], axis=0)
+        X[:, column] = xs.ravel()
+        calls += 1
+        rows_evaluated += len(X)
+        return np.asarray(predict_fn(X), dtype=np.float64).reshape(xs.shape)
+
+    def switched(fos, rows):
+        # The condition whose first occurrence along the axis is searched for
+        if minimum:
+            return fos >= targets[rows, None]
+        return fos < targets[rows, None]
+
+    status = np.full(n, SOLVED, dtype=object)
+    value = np.full(n, np.nan)
+    fos_at = np.full(n, np.nan)
+    fos_best = np.full(n, np.nan)
+    a = np.full(n, np.nan)
+    b = np.full(n, np.nan)
+    if n == 0:
+        return _result(status, value, fos_at, a, b, fos_best, calls, rows_evaluated)
+
+    everyone = np.arange(n)
+    xs = np.broadcast_to(np.linspace(lower, upper, scan_points), (n, scan_points))
+    fos = evaluate(everyone, xs)
+    hit = switched(fos, everyone)
+    any_hit = hit.any(axis=1)
+    first = hit.argmax(axis=1)
+
+    # Already switched at the lower bound, or never switched over the range
+    at_lower = any_hit & (first == 0)
+    never = ~any_hit
+    if minimum:
+        status[at_lower] = MET_AT_BOUND
+        value[at_lower] = lower
+        fos_at[at_lower] = fos[at_lower, 0]
+        status[never] = NOT_REACHABLE
+        fos_best[never] = fos[never].max(axis=1)
+    else:
+        status[at_lower] = NOT_REACHABLE
+        fos_best[at_lower] = fos[at_lower, 0]
+        status[never] = MET_AT_BOUND
+        value[never] = upper
+        fos_at[never] = fos[never, -1]
+
+    # Invariant for open brackets: not switched at a, switched at b
+    open_rows = np.flatnonzero(any_hit & (first > 0))
+    fa = np.full(n, np.nan)
+    fb = np.full(n, np.nan)
+    a[open_rows] = xs[open_rows, first[open_rows] - 1]
+    b[open_rows] = xs[open_rows, first[open_rows]]
+    fa[open_rows] = fos[open_rows, first[open_rows] - 1]
+    fb[open_rows] = fos[open_rows, first[open_rows]]
+
+    steps = np.arange(1, refine_points + 1) / (refine_points + 1)
+    for _ in range(max_iterations):
+        rows = open_rows[b[open_rows] - a[open_rows] > tolerance]
+        if len(rows) == 0:
+            break
+        xs = a[rows, None] + (b[rows] - a[rows])[:, None] * steps
+        fos = evaluate(rows, xs)
+        hit = switched(fos, rows)
+        any_hit = hit.any(axis=1)
+        first = hit.argmax(axis=1)
+
+        # Switch inside the bracket: it becomes [previous point, first hit]
+        moved = np.flatnonzero(any_hit)
+        inner = moved[first[moved] > 0]
+        b[rows[moved]] = xs[moved, first[moved]]
+        fb[rows[moved]] = fos[moved, first[moved]]
+        a[rows[inner]] = xs[inner, first[inner] - 1]
+        fa[rows[inner]] = fos[inner, first[inner] - 1]
+        # No switch inside: it lies between the last point and b
+        missed = np.flatnonzero(~any_hit)
+        a[rows[missed]] = xs[missed, -1]
+        fa[rows[missed]] = fos[missed, -1]
+
+    if minimum:
+        value[open_rows] = b[open_rows]
+        fos_at[open_rows] = fb[open_rows]
+    else:
+        value[open_rows] = a[open_rows]
+        fos_at[open_rows] = fa[open_rows]
+    return _result(status, value, fos_at, a, b, fos_best, calls, rows_evaluated)
+
+
+def _result(status, value, fos, bracket_low, bracket_high, fos_best, calls, rows_evaluated):
+    return {
+        'status': status,
+        'value': value,
+        'fos': fos,
+        'bracket_low': bracket_low,
+        'bracket_high': bracket_high,
+        'fos_best': fos_best,
+        'model_calls': calls,
+        'rows_evaluated': rows_evaluated
+    }
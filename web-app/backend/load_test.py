@@ -0,0 +1,441 @@
+#!/usr/bin/env python3
+"""
+Load-testing and latency benchmark for the FoS Prediction API.
+
+Replays a seeded, reproducible mix of single-layer, multi-layer (1-50
+layers), invalid, /models and /health requests at fixed concurrency levels
+and reports throughput, latency percentiles, CPU and RSS per level. Results
+are written as JSON so runs can be compared across commits.
+
+In-process (Flask test client, no network; measures this process):
+    python load_test.py --concurrency 1 4 16 --duration 10 --output bench.json
+
+Against a running server (gunicorn/uvicorn); pass its PID to sample CPU/RSS:
+    python load_test.py --url http://127.0.0.1:5000 --pid 12345
+
+Compare with an earlier run and fail on a regression:
+    python load_test.py --compare bench_main.json --max-regression 0.10
+"""
+
+import http.client
+import json
+import os
+import platform
+import subprocess
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+
+DEFAULT_MIX = {'single': 0.6, 'multi': 0.2, 'invalid': 0.1, 'models': 0.05, 'health': 0.05}
+
+FEATURE_BOUNDS = {
+    'cohesion': (0, 100),
+    'friction_angle': (0, 45),
+    'unit_weight': (15, 25),
+    'ru': (0, 1)
+}
+
+
+def _random_layer(rng, name=None):
+    layer = {field: round(float(rng.uniform(lo, hi)), 3) for field, (lo, hi) in FEATURE_BOUNDS.items()}
+    if name is not None:
+        layer['name'] = name
+    return layer
+
+
+def _invalid_body(rng):
+    """One of the validation failures the API has to reject with 400"""
+    body = dict(_random_layer(rng), model='gradient_boosting')
+    case = rng.integers(5)
+    if case == 0:
+        del body['unit_weight']
+    elif case == 1:
+        body['cohesion'] = 250.0
+    elif case == 2:
+        body['friction_angle'] = 'steep'
+    elif case == 3:
+        body['ru'] = -0.5
+    else:
+        body = {'layers': [_random_layer(rng, 'Laterite'), {'name': 'Clay', 'cohesion': 10}]}
+    return body
+
+
+def build_requests(mix, n, seed=42):
+    """
+    Pre-generate a reproducible request pool.
+
+    Returns a list of (kind, method, path, body bytes or None).
+    """
+    rng = np.random.default_rng(seed)
+    kinds = list(mix)
+    weights = np.array([mix[k] for k in kinds], dtype=np.float64)
+    chosen = rng.choice(len(kinds), size=n, p=weights / weights.sum())
+
+    pool = []
+    for index in chosen:
+        kind = kinds[index]
+        model = 'xgboost' if rng.random() < 0.5 else 'gradient_boosting'
+        if kind == 'single':
+            pool.append((kind, 'POST', '/predict', dict(_random_layer(rng), model=model)))
+        elif kind == 'multi':
+            layers = [_random_layer(rng, f'Layer {i + 1}') for i in range(int(rng.integers(1, 51)))]
+            pool.append((kind, 'POST', '/predict', {'layers': layers, 'model': model}))
+        elif kind == 'invalid':
+            pool.append((kind, 'POST', '/predict', _invalid_body(rng)))
+        elif kind in ('models', 'health'):
+            pool.append((kind, 'GET', f'/{kind}', None))
+        else:
+            raise ValueError(f'Unknown request kind: {kind}')
+    return [(kind, method, path, json.dumps(body).encode() if body is not None else None)
+            for kind, method, path, body in pool]
+
+
+class InProcessClient:
+    """Sends requests through the Flask test client"""
+
+    def __init__(self, flask_app):
+        self.client = flask_app.test_client()
+
+    def send(self, method, path, body):
+        response = self.client.open(path, method=method, data=body, content_type='application/json')
+        response.get_data()
+        return response.status_code
+
+
+class HTTPClient:
+    """Keep-alive HTTP connection to a running server (one per worker thread)"""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.conn = None
+
+    def send(self, method, path, body):
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                headers = {'Content-Type': 'application/json'} if body is not None else {}
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                response.read()
+                return response.status
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+
+def _proc_stat(pid):
+    """Fields of /proc/<pid>/stat after the command name (state is index 0)"""
+    with open(f'/proc/{pid}/stat') as f:
+        return f.read().rsplit(')', 1)[1].split()
+
+
+class ProcessSampler:
+    """
+    CPU time and peak RSS of a process and its children (e.g. a gunicorn
+    master and its workers), read from /proc; None where unavailable. RSS
+    is summed over the processes, so pages shared copy-on-write are counted
+    once per process.
+    """
+
+    def __init__(self, pid, interval=0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def pids(self):
+        pids = [self.pid]
+        try:
+            for entry in os.listdir('/proc'):
+                if entry.isdigit() and int(entry) != self.pid:
+                    try:
+                        if int(_proc_stat(entry)[1]) == self.pid:
+                            pids.append(int(entry))
+                    except (OSError, ValueError, IndexError):
+                        continue
+        except OSError:
+            pass
+        return pids
+
+    def cpu_seconds(self):
+        try:
+            ticks = 0
+            for pid in self.pids():
+                fields = _proc_stat(pid)
+                ticks += int(fields[11]) + int(fields[12])
+            return ticks / os.sysconf('SC_CLK_TCK')
+        except (OSError, ValueError, IndexError):
+            if self.pid == os.getpid():
+                times = os.times()
+                return times.user + times.system
+            return None
+
+    def rss_bytes(self):
+        total = None
+        for pid in self.pids():
+            try:
+                with open(f'/proc/{pid}/status') as f:
+                    for line in f:
+                        if line.startswith('VmRSS:'):
+                            total = (total or 0) + int(line.split()[1]) * 1024
+            except OSError:
+                continue
+        return total
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = self.rss_bytes()
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss or 0, rss)
+
+    def __enter__(self):
+        self.peak_rss = self.rss_bytes()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def latency_summary(latencies):
+    """Latency percentiles in milliseconds"""
+    if len(latencies) == 0:
+        return None
+    ms = np.asarray(latencies) * 1000
+    p50, p95, p99, p999 = np.percentile(ms, [50, 95, 99, 99.9])
+    return {
+        'mean': round(float(ms.mean()), 3),
+        'p50': round(float(p50), 3),
+        'p95': round(float(p95), 3),
+        'p99': round(float(p99), 3),
+        'p99_9': round(float(p999), 3),
+        'max': round(float(ms.max()), 3)
+    }
+
+
+def run_level(make_client, pool, concurrency, duration=None, total_requests=None, sampler=None, warmup=0.0):
+    """
+    Drive the API with a fixed number of concurrent clients.
+
+    Parameters:
+    -----------
+    make_client : callable
+        Returns a new client with send(method, path, body) -> status
+    pool : list
+        Requests from build_requests(), replayed round-robin
+    concurrency : int
+        Worker threads, each with its own client and a single request in flight
+    duration : float, optional
+        Seconds to run (ignored when total_requests is given)
+    total_requests : int, optional
+        Stop after this many requests in total
+    sampler : ProcessSampler, optional
+        Process whose CPU and RSS are reported
+    warmup : float
+        Seconds of untimed requests before measuring
+    """
+    clients = [make_client() for _ in range(concurrency)]
+    if warmup > 0:
+        stop_at = time.perf_counter() + warmup
+        for i, (_, method, path, body) in enumerate(pool):
+            if time.perf_counter() >= stop_at:
+                break
+            clients[i % concurrency].send(method, path, body)
+
+    results = [[] for _ in range(concurrency)]
+    counter = iter(range(total_requests)) if total_requests else None
+    counter_lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+    deadline = [None]
+
+    def worker(w):
+        client, out = clients[w], results[w]
+        position = w * (len(pool) // concurrency)
+        start_barrier.wait()
+        while True:
+            if counter is not None:
+                with counter_lock:
+                    if next(counter, None) is None:
+                        return
+            elif time.perf_counter() >= deadline[0]:
+                return
+            kind, method, path, body = pool[position % len(pool)]
+            position += 1
+            started = time.perf_counter()
+            try:
+                status = client.send(method, path, body)
+            except Exception:
+                status = 0
+            out.append((kind, status, time.perf_counter() - started))
+
+    threads = [threading.Thread(target=worker, args=(w,), daemon=True) for w in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    cpu_start = sampler.cpu_seconds() if sampler else None
+    wall_start = time.perf_counter()
+    deadline[0] = wall_start + (duration or 0)
+    if sampler:
+        sampler.__enter__()
+    start_barrier.wait()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+    if sampler:
+        sampler.__exit__()
+    cpu_end = sampler.cpu_seconds() if sampler else None
+
+    records = [record for out in results for record in out]
+    kinds = np.array([r[0] for r in records])
+    statuses = np.array([r[1] for r in records], dtype=np.int64)
+    latencies = np.array([r[2] for r in records])
+
+    # Invalid requests are expected to fail with 4xx; anything else that is
+    # not 2xx, and every 5xx or transport failure, counts as an error
+    expected_4xx = kinds == 'invalid'
+    errors = (statuses == 0) | (statuses >= 500) | ((statuses >= 400) & ~expected_4xx) | (expected_4xx & (statuses < 400))
+
+    level = {
+        'concurrency': concurrency,
+        'requests': int(len(records)),
+        'duration_seconds': round(wall, 3),
+        'throughput_rps': round(len(records) / wall, 1) if wall else 0.0,
+        'errors': int(errors.sum()),
+        'status_counts': {str(code): int(count) for code, count in zip(*np.unique(statuses, return_counts=True))},
+        'latency_ms': latency_summary(latencies),
+        'by_kind': {
+            str(kind): dict(requests=int((kinds == kind).sum()), **latency_summary(latencies[kinds == kind]))
+            for kind in np.unique(kinds)
+        },
+        'cpu_percent': None,
+        'peak_rss_mb': None
+    }
+    if cpu_start is not None and cpu_end is not None:
+        level['cpu_percent'] = round((cpu_end - cpu_start) / wall * 100, 1)
+    if sampler and sampler.peak_rss is not None:
+        level['peak_rss_mb'] = round(sampler.peak_rss / 2 ** 20, 1)
+    return level
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare_results(current, baseline, max_regression):
+    """Print per-level deltas; return False if any level regressed beyond max_regression"""
+    previous = {level['concurrency']: level for level in baseline['levels']}
+    ok = True
+    print(f"\nCompared with {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')}):")
+    for level in current['levels']:
+        old = previous.get(level['concurrency'])
+        if old is None or not old.get('latency_ms') or not level.get('latency_ms'):
+            continue
+        rps_change = level['throughput_rps'] / old['throughput_rps'] - 1 if old['throughput_rps'] else 0.0
+        p99_change = level['latency_ms']['p99'] / old['latency_ms']['p99'] - 1 if old['latency_ms']['p99'] else 0.0
+        regressed = rps_change < -max_regression or p99_change > max_regression
+        ok &= not regressed
+        print(f"  {'✗' if regressed else '✓'} c={level['concurrency']:<4} "
+              f"throughput {old['throughput_rps']:>9.1f} -> {level['throughput_rps']:>9.1f} rps ({rps_change:+.1%}), "
+              f"p99 {old['latency_ms']['p99']:>8.2f} -> {level['latency_ms']['p99']:>8.2f} ms ({p99_change:+.1%})")
+    return ok
+
+
+def parse_mix(text):
+    """'single=0.6,multi=0.2,...' -> dict"""
+    mix = {}
+    for part in text.split(','):
+        kind, _, weight = part.partition('=')
+        mix[kind.strip()] = float(weight)
+    return mix
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Load-test the FoS Prediction API')
+    parser.add_argument('--url', help='Base URL of a running server (default: in-process Flask test client)')
+    parser.add_argument('--pid', type=int, help='PID of the server to sample CPU/RSS from (with --url)')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16, 64],
+                        help='Concurrency levels to run')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds per concurrency level')
+    parser.add_argument('--requests', type=int, help='Requests per level (overrides --duration)')
+    parser.add_argument('--warmup', type=float, default=1.0, help='Untimed warm-up seconds per level')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='Request mix, e.g. single=0.6,multi=0.2,invalid=0.1,models=0.05,health=0.05')
+    parser.add_argument('--pool-size', type=int, default=5000, help='Distinct requests generated')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the request pool')
+    parser.add_argument('--output', type=Path, help='Write results as JSON')
+    parser.add_argument('--compare', type=Path, help='Earlier results JSON to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.10,
+                        help='Allowed fractional throughput drop / p99 increase with --compare')
+    args = parser.parse_args()
+
+    if args.url:
+        make_client = lambda: HTTPClient(args.url)
+        sampler = ProcessSampler(args.pid) if args.pid else None
+        target = args.url
+    else:
+        from app import app as flask_app
+        make_client = lambda: InProcessClient(flask_app)
+        sampler = ProcessSampler(os.getpid())
+        target = 'in-process'
+
+    pool = build_requests(args.mix, args.pool_size, args.seed)
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'target': target,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'mix': args.mix,
+            'pool_size': args.pool_size,
+            'seed': args.seed,
+            'duration_seconds': None if args.requests else args.duration,
+            'requests_per_level': args.requests
+        },
+        'levels': []
+    }
+
+    print(f"Load test against {target} (commit {results['meta']['commit']})")
+    print(f"{'conc':>5} {'reqs':>8} {'rps':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'p99.9':>8} "
+          f"{'errors':>7} {'cpu%':>6} {'rss MB':>7}")
+    for concurrency in args.concurrency:
+        level = run_level(make_client, pool, concurrency, args.duration, args.requests, sampler, args.warmup)
+        results['levels'].append(level)
+        lat = level['latency_ms'] or {}
+        print(f"{concurrency:>5} {level['requests']:>8} {level['throughput_rps']:>9.1f} "
+              f"{lat.get('p50', 0):>8.2f} {lat.get('p95', 0):>8.2f} {lat.get('p99', 0):>8.2f} "
+              f"{lat.get('p99_9', 0):>8.2f} {level['errors']:>7} "
+              f"{level['cpu_percent'] if level['cpu_percent'] is not None else '-':>6} "
+              f"{level['peak_rss_mb'] if level['peak_rss_mb'] is not None else '-':>7}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n✓ Saved results to {args.output}")
+
+    ok = True
+    if args.compare:
+        with open(args.compare) as f:
+            ok = compare_results(results, json.load(f), args.max_regression)
+    failed = any(level['errors'] for level in results['levels'])
+    raise SystemExit(0 if ok and not failed else 1)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Precomputed FoS lookup grids for O(1) serving.
+
+The input space served by /predict is a small 4-D box (cohesion, friction
+angle, unit weight, Ru). A build step evaluates each trained model on a
+dense regular grid over that box and stores the result as a float32 .npy
+array plus a grid_meta.json manifest recording the axes and the measured
+interpolation error against the real model. At serving time the arrays are
+memory-mapped, so every worker process shares one page-cached copy, and
+predictions are multilinear interpolations that need neither sklearn nor
+xgboost.
+
+Build the grids from the models in models/:
+    python lookup_grid.py --points 101 91 41 51
+"""
+
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+GRID_META_FILE = 'grid_meta.json'
+GRID_FORMAT_VERSION = 1
+
+
+class LookupGrid:
+    """Memory-mapped regular 4-D grid evaluated by multilinear interpolation"""
+
+    def __init__(self, values, axes):
+        """
+        Parameters:
+        -----------
+        values : numpy.ndarray
+            Grid of FoS values, one axis per feature (may be a memmap)
+        axes : list of (min, max, points)
+            Regular axis definition for each feature, in column order
+        """
+        self.values = values
+        self.flat = values.reshape(-1)
+        self.lower = np.array([a[0] for a in axes], dtype=np.float64)
+        self.upper = np.array([a[1] for a in axes], dtype=np.float64)
+        self.points = np.array([a[2] for a in axes], dtype=np.intp)
+        self.step = (self.upper - self.lower) / (self.points - 1)
+        self.strides = np.array([int(np.prod(self.points[d + 1:])) for d in range(len(axes))], dtype=np.intp)
+
+        # Flat offsets and bit patterns of the 2^D cell corners
+        n_dims = len(axes)
+        self.corner_bits = (np.arange(2 ** n_dims)[:, None] >> np.arange(n_dims)[::-1]) & 1
+        self.corner_offsets = self.corner_bits @ self.strides
+
+    @classmethod
+    def load(cls, grid_dir, model_key):
+        """Memory-map the grid for a model from a directory built by build_grids()"""
+        grid_dir = Path(grid_dir)
+        with open(grid_dir / GRID_META_FILE) as f:
+            meta = json.load(f)
+        if meta.get('format_version') != GRID_FORMAT_VERSION:
+            raise ValueError(f"Unsupported grid format version: {meta.get('format_version')}")
+        axes = [(a['min'], a['max'], a['points']) for a in (meta['axes'][name] for name in meta['features'])]
+        values = np.load(grid_dir / meta['models'][model_key]['file'], mmap_mode='r')
+        grid = cls(values, axes)
+        grid.meta = meta['models'][model_key]
+        return grid
+
+    def predict(self, X):
+        """Interpolate FoS for an (N, 4) matrix of raw features; inputs are clamped to the grid box"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        position = (np.clip(X, self.lower, self.upper) - self.lower) / self.step
+        cell = np.minimum(position.astype(np.intp), self.points - 2)
+        frac = position - cell
+
+        # weights[n, c] = prod_d (frac if corner bit set else 1 - frac)
+        weights = np.where(self.corner_bits[None, :, :], frac[:, None, :], 1.0 - frac[:, None, :]).prod(axis=2)
+        corners = self.flat[(cell @ self.strides)[:, None] + self.corner_offsets[None, :]]
+        return (corners * weights).sum(axis=1)
+
+
+def build_grid(predict_fn, axes, output_path, chunk_rows=250000):
+    """
+    Evaluate predict_fn over a regular grid and write it as a float32 .npy.
+
+    Parameters:
+    -----------
+    predict_fn : callable
+        Maps an (N, 4) matrix of raw features to N FoS values
+    axes : list of (min, max, points)
+        Axis definition per feature, in column order
+    output_path : Path
+        Destination .npy file (written through a memory map)
+    chunk_rows : int
+        Approximate number of grid points evaluated per predict call
+    """
+    coords = [np.linspace(lo, hi, n) for lo, hi, n in axes]
+    shape = tuple(n for _, _, n in axes)
+    grid = np.lib.format.open_memmap(output_path, mode='w+', dtype=np.float32, shape=shape)
+
+    # Evaluate whole slabs along the first axis per predict call
+    inner = np.stack(np.meshgrid(*coords[1:], indexing='ij'), axis=-1).reshape(-1, len(axes) - 1)
+    slabs = max(1, chunk_rows // len(inner))
+    for start in range(0, shape[0], slabs):
+        first = coords[0][start:start + slabs]
+        rows = np.column_stack([np.repeat(first, len(inner)), np.tile(inner, (len(first), 1))])
+        grid[start:start + len(first)] = predict_fn(rows).reshape((len(first),) + shape[1:])
+
+    grid.flush()
+    return grid
+
+
+def measure_error(grid, predict_fn, lower, upper, n_samples=100000, seed=42):
+    """Compare interpolated values with the real model on uniform random inputs"""
+    rng = np.random.default_rng(seed)
+    X = rng.uniform(lower, upper, size=(n_samples, len(lower)))
+    error = np.abs(grid.predict(X) - predict_fn(X))
+    return {
+        'check_samples': int(n_samples),
+        'max_abs_error': float(error.max()),
+        'p99_abs_error': float(np.percentile(error, 99)),
+        'mean_abs_error': float(error.mean())
+    }
+
+
+def build_grids(models, feature_names, feature_ranges, points, grid_dir, check_samples=100000):
+    """
+    Build one grid per model and write grid_meta.json.
+
+    Parameters:
+    -----------
+    models : dict
+        Model key -> callable mapping raw (N, 4) features to FoS
+    feature_names : list of str
+        Feature column order
+    feature_ranges : dict
+        Feature name -> {'min', 'max'} (the ranges published by /models)
+    points : list of int
+        Grid points per feature
+    grid_dir : Path
+        Output directory
+
+    Returns:
+    --------
+    meta : dict
+        The manifest written to grid_meta.json
+    """
+    grid_dir = Path(grid_dir)
+    grid_dir.mkdir(parents=True, exist_ok=True)
+    axes = [(float(feature_ranges[name]['min']), float(feature_ranges[name]['max']), int(n))
+            for name, n in zip(feature_names, points)]
+    lower = np.array([a[0] for a in axes])
+    upper = np.array([a[1] for a in axes])
+
+    meta = {
+        'format_version': GRID_FORMAT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'features': list(feature_names),
+        'axes': {name: {'min': lo, 'max': hi, 'points': n} for name, (lo, hi, n) in zip(feature_names, axes)},
+        'models': {}
+    }
+    for key, predict_fn in models.items():
+        start = time.perf_counter()
+        values = build_grid(predict_fn, axes, grid_dir / f'{key}.npy')
+        build_seconds = time.perf_counter() - start
+        errors = measure_error(LookupGrid(values, axes), predict_fn, lower, upper, check_samples)
+        meta['models'][key] = dict(file=f'{key}.npy', build_seconds=round(build_seconds, 2), **errors)
+
+    with open(grid_dir / GRID_META_FILE, 'w') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    # The build always evaluates the real models, whatever mode the server uses
+    os.environ['FOS_SERVING_MODE'] = 'model'
+    from app import FEATURE_NAMES, FEATURE_RANGES, GRID_DIR, MODEL_DIR, model_registry, select_model, predict_fos
+
+    parser = argparse.ArgumentParser(description='Build FoS lookup grids from the trained models')
+    parser.add_argument('--points', type=int, nargs=4, default=[101, 91, 41, 51],
+                        metavar=('COHESION', 'FRICTION', 'UNIT_WEIGHT', 'RU'),
+                        help='Grid points per feature')
+    parser.add_argument('--output', type=Path, default=None,
+                        help='Output directory (default: the grid/ directory of the active model version)')
+    parser.add_argument('--check-samples', type=int, default=100000,
+                        help='Random inputs used to measure interpolation error')
+    parser.add_argument('--max-p99-error', type=float, default=0.05,
+                        help='Fail if the 99th percentile absolute error exceeds this')
+    args = parser.parse_args()
+    version = model_registry.current
+    if args.output is None:
+        args.output = GRID_DIR if version.path == MODEL_DIR else version.path / 'grid'
+
+    models = {}
+    for key in ('gradient_boosting', 'xgboost'):
+        model = select_model(key)[0]
+        models[key] = lambda X, model=model: predict_fos(model, X)
+
+    cells = int(np.prod(args.points))
+    print(f"Building {len(models)} grids of {cells:,} points ({cells * 4 / 1e6:.1f} MB each)...")
+    meta = build_grids(models, FEATURE_NAMES, FEATURE_RANGES, args.points, args.output, args.check_samples)
+
+    failed = False
+    for key, info in meta['models'].items():
+        ok = info['p99_abs_error'] <= args.max_p99_error
+        failed |= not ok
+        print(f"  {'✓' if ok else '✗'} {key}: built in {info['build_seconds']}s, "
+              f"error max {info['max_abs_error']:.4f} / p99 {info['p99_abs_error']:.4f} / "
+              f"mean {info['mean_abs_error']:.4f}")
+    print(f"\n✓ Saved grids to {args.output}")
+    raise SystemExit(1 if failed else 0)
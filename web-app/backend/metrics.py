@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Prometheus-style metrics with lock-free recording.
+
+Every thread records into its own shard (a dict of plain lists reached
+through threading.local), so counters and histograms are updated without
+locks or atomics. A scrape walks all shards and sums them; shards of
+threads that have exited are folded into a retired shard so that
+thread-per-request servers do not accumulate them. Values are per process:
+each gunicorn worker exposes its own counts.
+"""
+
+import threading
+from bisect import bisect_left
+
+# Request latency buckets in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Per-stage buckets in seconds (stages are much shorter than requests)
+STAGE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.25, 1.0)
+
+LAYER_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 500, 1000)
+
+
+class MetricsRegistry:
+    """Holds metric definitions and the per-thread shards they record into"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.metrics = []
+        self.collectors = []
+        self._local = threading.local()
+        self._shards = []
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def shard(self):
+        """This thread's shard; created (and registered under the lock) on first use"""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((threading.current_thread(), shard))
+            return shard
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(self, name, documentation, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(self, name, documentation, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, fn):
+        """
+        Register a callable evaluated at scrape time. It returns a list of
+        (name, type, documentation, [(labels dict, value), ...]).
+        """
+        self.collectors.append(fn)
+        return fn
+
+    def _snapshot(self):
+        """Sum all shards; fold the shards of finished threads into the retired totals"""
+        totals = {}
+        with self._lock:
+            live = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    live.append((thread, shard))
+                else:
+                    _merge(self._retired, shard)
+            self._shards = live
+            _merge(totals, self._retired)
+            shards = [shard for _, shard in live]
+        for shard in shards:
+            # Copy first: the owning thread may add keys while we read
+            _merge(totals, dict(shard))
+        return totals
+
+    def render(self):
+        """Metrics in the Prometheus text exposition format"""
+        totals = self._snapshot()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render(totals))
+        for collect in self.collectors:
+            for name, kind, documentation, samples in collect():
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _merge(into, shard):
+    for key, values in shard.items():
+        current = into.get(key)
+        if current is None:
+            into[key] = list(values)
+        else:
+            for i, value in enumerate(values):
+                current[i] += value
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def inc(self, *labels, amount=1):
+        if not self.registry.enabled:
+            return
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        values = shard.get(key)
+        if values is None:
+            values = shard[key] = [0]
+        values[0] += amount
+
+    def render(self, totals):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        for (name, labels), values in sorted(totals.items(), key=lambda item: item[0]):
+            if name == self.name:
+                yield f'{name}{_format_labels(dict(zip(self.labelnames, labels)))} {_format_value(values[0])}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, registry, name, documentation, labelnames, buckets):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(float(b) for b in buckets)
+
+    def observe(self, value, *labels):
+        if not self.registry.enabled:
+            return
+        shard = self.registry.shard()
+        key = (self.name, labels)
+        values = shard.get(key)
+        if values is None:
+            # One slot per bucket, one for +Inf, then the sum
+            values = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def render(self, totals):
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        for (name, labels), values in sorted(totals.items(), key=lambda item: item[0]):
+            if name != self.name:
+                continue
+            label_dict = dict(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+                cumulative += count
+                yield f'{name}_bucket{_format_labels(dict(label_dict, le=_format_value(bound)))} {cumulative}'
+            yield f'{name}_sum{_format_labels(label_dict)} {_format_value(values[-1])}'
+            yield f'{name}_count{_format_labels(label_dict)} {cumulative}'
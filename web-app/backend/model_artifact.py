@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Pickle-free, memory-mapped model artifacts.
+
+Next to the pickles, FoSModelTrainer.save_models_and_results writes an
+artifact/ directory holding every tree model of the version already
+compiled for tree_engine (packed nodes and bitvector tables, with the
+scaler folded into the thresholds) as flat .npy arrays, together with the
+tables of all of them stacked for the 'ensemble' model (the largest and
+slowest to build), the scaler's mean and scale, and a manifest.json with a
+format version and the SHA-256 of every source pickle. The server
+memory-maps the arrays, so loading a version opens a few files instead of
+unpickling and compiling: it needs neither joblib, sklearn nor xgboost,
+and every worker process shares one page-cached copy of the trees.
+
+Write the artifact for a directory of pickles (and check it against them):
+    python model_artifact.py models/
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from tree_engine import StackedEnsemble, TreeEnsemble, export_model
+
+ARTIFACT_DIR = 'artifact'
+MANIFEST_FILE = 'manifest.json'
+ARTIFACT_FORMAT_VERSION = 2
+
+
+class ArrayScaler:
+    """StandardScaler.transform from the saved mean and scale (either may be None)"""
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X):
+        # Same operations, in the same order, as StandardScaler.transform
+        X = np.array(X, dtype=np.float64)
+        if self.mean_ is not None:
+            X -= self.mean_
+        if self.scale_ is not None:
+            X /= self.scale_
+        return X
+
+
+class ModelArtifact:
+    """The compiled models, quantile models and scaler of one artifact directory"""
+
+    def __init__(self, path, manifest, models, quantiles, scaler, stacked=None):
+        """
+        Parameters:
+        -----------
+        path : Path
+            Artifact directory
+        manifest : dict
+            The parsed manifest.json
+        models : dict
+            Model key -> TreeEnsemble on memory-mapped arrays
+        quantiles : dict
+            Quantile level (e.g. 0.05) -> TreeEnsemble
+        scaler : ArrayScaler
+        stacked : StackedEnsemble, optional
+            The models followed by the quantile models (ascending level)
+        """
+        self.path = Path(path)
+        self.manifest = manifest
+        self.models = models
+        self.quantiles = quantiles
+        self.scaler = scaler
+        self.stacked = stacked
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map an artifact directory written by write_artifact()"""
+        path = Path(path)
+        with open(path / MANIFEST_FILE) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported model artifact format version: {manifest.get('format_version')}")
+
+        def open_arrays(files):
+            return {name: np.load(path / file, mmap_mode='r') for name, file in files.items()}
+
+        models = {key: TreeEnsemble.from_arrays(open_arrays(entry['files']), entry['params'])
+                  for key, entry in manifest['models'].items()}
+        quantiles = {float(level): TreeEnsemble.from_arrays(open_arrays(entry['files']), entry['params'])
+                     for level, entry in manifest['quantiles'].items()}
+        scaler = open_arrays({name: file for name, file in manifest['scaler'].items() if file is not None})
+        stacked = None
+        if manifest.get('stacked'):
+            members = list(models.values()) + [quantiles[level] for level in sorted(quantiles)]
+            stacked = StackedEnsemble(members, compiled=open_arrays(manifest['stacked']['files']))
+        scaler = ArrayScaler(scaler.get('mean'), scaler.get('scale'))
+        return cls(path, manifest, models, quantiles, scaler, stacked)
+
+    def stale_sources(self, source_dir):
+        """
+        Source pickles in source_dir whose content differs from when the
+        artifact was written, i.e. that were replaced without rewriting it
+        (a retrained model's pickle can have the same size). Missing
+        pickles are not stale: a version may ship the artifact only.
+        """
+        stale = []
+        for name, recorded in self.manifest.get('sources', {}).items():
+            source = Path(source_dir) / name
+            if not source.exists():
+                continue
+            # The size is checked first, so only same-size pickles are hashed
+            if source.stat().st_size != recorded['size'] or file_digest(source) != recorded['sha256']:
+                stale.append(name)
+        return stale
+
+
+def file_digest(path, block_size=1 << 20):
+    """SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _save_array(path, array):
+    # Write under a temporary name and rename, so a server that has the old
+    # file memory-mapped keeps reading the old inode instead of faulting
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp, path)
+
+
+def _save_arrays(artifact_dir, prefix, arrays):
+    files = {}
+    for name, array in arrays.items():
+        files[name] = f'{prefix}.{name}.npy'
+        _save_array(artifact_dir / files[name], array)
+    return files
+
+
+def _save_ensemble(artifact_dir, prefix, ensemble):
+    arrays, params = ensemble.to_arrays()
+    files = _save_arrays(artifact_dir, prefix, arrays)
+    return {'params': params, 'n_trees': ensemble.n_trees, 'n_nodes': ensemble.n_nodes, 'files': files}
+
+
+def write_artifact(artifact_dir, models, scaler, quantiles=None, sources=()):
+    """
+    Compile fitted tree models and write them as a memory-mappable artifact.
+
+    Parameters:
+    -----------
+    artifact_dir : Path
+        Output directory (created if needed); manifest.json is written last
+    models : dict
+        Model key (e.g. 'gradient_boosting') -> fitted GradientBoostingRegressor
+        or XGBRegressor, trained on scaler-transformed features
+    scaler : object
+        The fitted StandardScaler (or None)
+    quantiles : dict, optional
+        Quantile level -> fitted quantile GradientBoostingRegressor
+    sources : sequence of Path
+        The pickles of the same models; their sizes and SHA-256 digests are
+        recorded so that a loader can detect pickles replaced later
+        (ModelArtifact.stale_sources)
+
+    Returns:
+    --------
+    manifest : dict
+        The manifest written to manifest.json
+    """
+    artifact_dir = Path(artifact_dir)
+    artifact_dir.mkdir(parents=True, exist_ok=True)
+    mean = getattr(scaler, 'mean_', None)
+    scale = getattr(scaler, 'scale_', None)
+
+    manifest = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'scaler': {'mean': None, 'scale': None},
+        'models': {},
+        'quantiles': {},
+        'stacked': None,
+        'sources': {
+            Path(source).name: {'size': Path(source).stat().st_size, 'sha256': file_digest(source)}
+            for source in sources
+        }
+    }
+    for name, values in (('mean', mean), ('scale', scale)):
+        if values is not None:
+            manifest['scaler'][name] = f'scaler.{name}.npy'
+            _save_array(artifact_dir / manifest['scaler'][name], np.asarray(values, dtype=np.float64))
+    ensembles = []
+    for key, model in models.items():
+        ensembles.append(export_model(model, scaler))
+        manifest['models'][key] = dict(_save_ensemble(artifact_dir, key, ensembles[-1]), type=type(model).__name__)
+    for level, model in sorted((quantiles or {}).items()):
+        ensembles.append(export_model(model, scaler))
+        entry = _save_ensemble(artifact_dir, f'quantile_q{round(level * 100):02d}', ensembles[-1])
+        manifest['quantiles'][f'{level:g}'] = dict(entry, type=type(model).__name__)
+
+    # Only the tables: the stacked nodes are rebuilt from the members
+    stacked = StackedEnsemble(ensembles) if len(ensembles) > 1 else None
+    if stacked is not None and stacked.tables is not None:
+        arrays, _ = stacked.to_arrays()
+        compiled = {name: arrays[name] for name in StackedEnsemble.COMPILED_ARRAYS}
+        manifest['stacked'] = {'n_trees': stacked.n_trees, 'files': _save_arrays(artifact_dir, 'stacked', compiled)}
+
+    tmp = artifact_dir / f'.{MANIFEST_FILE}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, artifact_dir / MANIFEST_FILE)
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    import joblib
+
+    from model_registry import MODEL_FILES, QUANTILE_PREFIX, SCALER_FILE
+
+    parser = argparse.ArgumentParser(description='Write the memory-mapped artifact for a model directory')
+    parser.add_argument('model_dir', nargs='?', default=str(Path(__file__).parent / 'models'),
+                        help='Directory with scaler.pkl and best_model_*.pkl (default: models/)')
+    parser.add_argument('--rows', type=int, default=10000, help='Rows in the parity check')
+    parser.add_argument('--tolerance', type=float, default=1e-9, help='Maximum allowed absolute difference')
+    args = parser.parse_args()
+
+    model_dir = Path(args.model_dir)
+    scaler = joblib.load(model_dir / SCALER_FILE)
+    models = {key: joblib.load(model_dir / file) for key, file in MODEL_FILES.items() if (model_dir / file).exists()}
+    quantile_files = sorted(model_dir.glob(f'{QUANTILE_PREFIX}*.pkl'))
+    quantiles = {int(file.stem[len(QUANTILE_PREFIX):]) / 100: joblib.load(file) for file in quantile_files}
+    sources = [model_dir / SCALER_FILE] + [model_dir / MODEL_FILES[key] for key in models] + quantile_files
+
+    manifest = write_artifact(model_dir / ARTIFACT_DIR, models, scaler, quantiles, sources)
+    print(f"✓ Wrote {model_dir / ARTIFACT_DIR} ({len(manifest['models'])} models, "
+          f"{len(manifest['quantiles'])} quantile models)")
+
+    started = time.perf_counter()
+    artifact = ModelArtifact.load(model_dir / ARTIFACT_DIR)
+    print(f"✓ Loaded in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    # Rows spread over ±3 standard deviations of the training features
+    rng = np.random.default_rng(42)
+    X = scaler.mean_ + scaler.scale_ * rng.uniform(-3, 3, (args.rows, len(scaler.mean_)))
+    failed = False
+    checks = [(key, artifact.models[key], models[key]) for key in models]
+    checks += [(f'quantile {level:g}', artifact.quantiles[level], quantiles[level]) for level in sorted(quantiles)]
+    stacked = artifact.stacked.predict(X) if artifact.stacked is not None else None
+    for j, (label, ensemble, model) in enumerate(checks):
+        fos = ensemble.predict(X)
+        diff = float(np.max(np.abs(fos - model.predict(scaler.transform(X)))))
+        if stacked is not None and not np.array_equal(stacked[:, j], fos):
+            diff = float('inf')
+        failed |= diff > args.tolerance
+        print(f"  {'✓' if diff <= args.tolerance else '✗'} {label}: max |artifact - model| = {diff:.2e}")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,640 @@
+#!/usr/bin/env python3
+"""
+Versioned model registry with zero-downtime hot reload.
+
+Each model version is a directory written by
+FoSModelTrainer.save_models_and_results (best_model_*.pkl, scaler.pkl and
+results_summary.json, and the pickle-free artifact/ directory described in
+model_artifact.py) under the registry root:
+
+    models/versions/2026-10-01/
+    models/versions/2026-10-17/
+
+A version is loaded, compiled and warmed up off the request path and then
+swapped in with a single reference assignment, so in-flight requests finish
+on the version they started with. The active version is the newest
+directory unless an ACTIVE file in the root pins another one; reload and
+rollback rewrite that file, and a background watcher in every process
+follows it, so all workers converge on the same version. When the root has
+no versions, the flat models/ directory is served as version 'default'.
+
+Loading records how long each step took (ModelVersion.load_times). Models
+named in lazy_models are loaded in a background thread after the version
+is returned; ModelVersion.model waits for them, so a less-used model does
+not delay the first request to the others. With the compiled engine a
+version's models are memory-mapped from its artifact/ directory when it has
+one, falling back to the pickles for anything the artifact lacks.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from lookup_grid import LookupGrid
+from model_artifact import ARTIFACT_DIR, MANIFEST_FILE, ModelArtifact
+from tree_engine import StackedEnsemble, TreeEnsemble, export_model
+
+MODEL_FILES = {
+    'gradient_boosting': 'best_model_gradient_boosting.pkl',
+    'xgboost': 'best_model_xgboost.pkl'
+}
+SCALER_FILE = 'scaler.pkl'
+
+# Quantile regressors written by FoSModelTrainer.train_uncertainty_models,
+# e.g. quantile_model_q05.pkl for the 5% quantile
+QUANTILE_PREFIX = 'quantile_model_q'
+
+# Optional extra ensemble members, e.g. model_random_forest.pkl
+MEMBER_PREFIX = 'model_'
+SUMMARY_FILE = 'results_summary.json'
+ACTIVE_FILE = 'ACTIVE'
+DEFAULT_VERSION = 'default'
+
+# Model names used as keys in results_summary.json
+SUMMARY_NAMES = {'gradient_boosting': 'Gradient Boosting', 'xgboost': 'XGBoost'}
+
+
+class ModelUnavailable(RuntimeError):
+    """A model is still loading in the background, or failed to load"""
+
+
+def _load_pickle(path):
+    # joblib (and the libraries the pickle needs) are imported on first use,
+    # so grid serving mode never imports them
+    import joblib
+    return joblib.load(path)
+
+
+class ScaledModel:
+    """A native estimator and its scaler, called on raw features"""
+
+    def __init__(self, estimator, scaler):
+        self.estimator = estimator
+        self.scaler = scaler
+
+    def predict(self, X):
+        return np.asarray(self.estimator.predict(self.scaler.transform(X)), dtype=np.float64)
+
+
+class EnsembleModel:
+    """
+    Point models and quantile models of one version evaluated together.
+
+    Compiled members are stacked into a single tree pass; the remaining
+    native members share one scaling of the input. predict returns the
+    ensemble mean, so an EnsembleModel can be used like any single model.
+    """
+
+    def __init__(self, members, quantiles=None, stacked=None):
+        """
+        Parameters:
+        -----------
+        members : dict
+            Member name -> predictor; their mean is the ensemble prediction
+        quantiles : dict, optional
+            Quantile level (e.g. 0.05) -> predictor of that quantile
+        stacked : StackedEnsemble, optional
+            A prebuilt stack (e.g. ModelArtifact.stacked), used when its
+            members are exactly the compiled predictors
+        """
+        quantiles = quantiles or {}
+        self.member_names = list(members)
+        self.quantile_levels = sorted(quantiles)
+        predictors = list(members.values()) + [quantiles[level] for level in self.quantile_levels]
+        self.compiled = [i for i, p in enumerate(predictors) if isinstance(p, TreeEnsemble)]
+        compiled = [predictors[i] for i in self.compiled]
+        if stacked is not None and len(stacked.members) == len(compiled) \
+                and all(a is b for a, b in zip(stacked.members, compiled)):
+            self.stacked = stacked
+        else:
+            self.stacked = StackedEnsemble(compiled) if compiled else None
+        self.others = [(i, p) for i, p in enumerate(predictors) if not isinstance(p, TreeEnsemble)]
+        self.n_outputs = len(predictors)
+
+    def predict_all(self, X):
+        """(N, members + quantiles) predictions, in member then quantile-level order"""
+        X = np.asarray(X, dtype=np.float64)
+        out = np.empty((len(X), self.n_outputs))
+        if self.stacked is not None:
+            out[:, self.compiled] = self.stacked.predict(X)
+        scaled = {}
+        for i, predictor in self.others:
+            if isinstance(predictor, ScaledModel):
+                key = id(predictor.scaler)
+                if key not in scaled:
+                    scaled[key] = predictor.scaler.transform(X)
+                out[:, i] = predictor.estimator.predict(scaled[key])
+            else:
+                out[:, i] = predictor.predict(X)
+        return out
+
+    def predict(self, X):
+        return self.predict_all(X)[:, :len(self.member_names)].mean(axis=1)
+
+
+class ModelVersion:
+    """Everything needed to serve one model version"""
+
+    def __init__(self, name, path, models, estimators, scaler, model_info, engine):
+        """
+        Parameters:
+        -----------
+        name : str
+            Version name (the directory name)
+        path : Path
+            Version directory
+        models : dict
+            Model key -> predictor with predict(raw (N, 4) features),
+            including the 'ensemble' EnsembleModel
+        estimators : dict
+            Model key -> unpickled estimator (empty in grid serving mode)
+        scaler : object or None
+            The fitted scaler (None in grid serving mode)
+        model_info : dict
+            Model key -> display name, metrics and description
+        engine : str
+            'grid', 'compiled' or 'native'
+        """
+        self.name = name
+        self.path = Path(path)
+        self.models = models
+        self.estimators = estimators
+        self.scaler = scaler
+        self.model_info = model_info
+        self.engine = engine
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+        self.load_times = {}
+        self.load_errors = {}
+        self.pending = {}
+        # The memory-mapped ModelArtifact the models came from, if any
+        self.artifact = None
+        self._background_load = None
+
+    def describe(self):
+        return {'version': self.name, 'path': str(self.path), 'engine': self.engine,
+                'artifact': self.artifact is not None, 'loaded_at': self.loaded_at}
+
+    def model(self, key, timeout=None):
+        """
+        The predictor for a model key. A model still loading in the
+        background is waited for, up to timeout seconds; raises
+        ModelUnavailable when it is not ready in time or failed to load.
+        """
+        event = self.pending.get(key)
+        if event is not None and not event.wait(timeout):
+            raise ModelUnavailable(f'Model {key} ({self.name}) is still loading, retry shortly')
+        try:
+            return self.models[key]
+        except KeyError:
+            raise ModelUnavailable(f'Model {key} ({self.name}) failed to load: {self.load_errors.get(key)}')
+
+    def loading(self):
+        """Model keys still loading in the background"""
+        return [key for key, event in self.pending.items() if not event.is_set()]
+
+    def load_in_background(self, keys, load):
+        """Load the given model keys with load(key) in a daemon thread, in order"""
+        self.pending = {key: threading.Event() for key in keys}
+        self._background_load = load
+        threading.Thread(target=self._run_background_load, name=f'fos-load-{self.name}', daemon=True).start()
+
+    def _run_background_load(self):
+        started = time.perf_counter()
+        for key, event in list(self.pending.items()):
+            if key not in self.models and not event.is_set():
+                try:
+                    self.models[key] = self._background_load(key)
+                except Exception as e:
+                    self.load_errors[key] = str(e)
+                    print(f"Error loading {key} ({self.name}) in the background: {e}")
+            event.set()
+        print(f"✓ Background load of {', '.join(self.pending)} ({self.name}) "
+              f"finished in {time.perf_counter() - started:.2f}s")
+
+    def resume_after_fork(self):
+        """Restart an unfinished background load in a forked child (threads do not survive fork)"""
+        unfinished = self.loading()
+        if not unfinished:
+            return
+        for key in unfinished:
+            self.pending[key] = threading.Event()
+        threading.Thread(target=self._run_background_load, name=f'fos-load-{self.name}', daemon=True).start()
+
+
+def read_model_info(path, default_info, version):
+    """
+    Model metadata for a version: test metrics from results_summary.json
+    when present, otherwise the defaults.
+    """
+    info = {key: dict(value, version=version) for key, value in default_info.items()}
+    info['ensemble'] = {'name': 'Ensemble', 'version': version}
+    summary_path = Path(path) / SUMMARY_FILE
+    if not summary_path.exists():
+        return info
+
+    with open(summary_path) as f:
+        summary = json.load(f)
+    for key, summary_name in SUMMARY_NAMES.items():
+        test = (summary.get('test_results') or {}).get(summary_name)
+        if not test:
+            continue
+        entry = info[key]
+        entry.update({
+            'test_r2': round(float(test['r2']), 4),
+            'test_rmse': round(float(test['rmse']), 4),
+            'test_mae': round(float(test['mae']), 4)
+        })
+        train = (summary.get('training_results') or {}).get(summary_name)
+        if train:
+            entry['training_r2'] = round(float(train['r2']), 4)
+            entry['overfitting_gap'] = f"{(entry['training_r2'] - entry['test_r2']) * 100:.2f}%"
+
+    ensemble = (summary.get('ensemble') or {}).get('test')
+    if ensemble:
+        info['ensemble'].update({
+            'test_r2': round(float(ensemble['r2']), 4),
+            'test_rmse': round(float(ensemble['rmse']), 4),
+            'test_mae': round(float(ensemble['mae']), 4),
+            'metrics_source': 'test set'
+        })
+    quantiles = summary.get('quantile_models')
+    if quantiles:
+        info['ensemble']['interval_test_coverage'] = round(float(quantiles['test_coverage']), 4)
+    return info
+
+
+def build_ensemble(version_name, path, models, estimators, scaler, model_info, extra_members=(),
+                   inference_engine='compiled', artifact=None):
+    """
+    Build the 'ensemble' model of a version and its metadata entry.
+
+    Members are the served models plus any extra_members saved by the
+    trainer as model_<name>.pkl; quantile models are the
+    quantile_model_q*.pkl files, or the artifact's quantile models when it
+    has any (none in grid serving mode). Without ensemble test metrics in
+    results_summary.json, the members' average metrics are reported instead.
+    """
+    members = dict(models)
+    quantiles = {}
+    if scaler is not None:
+        for name in extra_members:
+            estimator = _load_pickle(path / f'{MEMBER_PREFIX}{name}.pkl')
+            estimators[name] = estimator
+            members[name] = _wrap(estimator, scaler, inference_engine, f'{name} ({version_name})')
+        if artifact is not None and artifact.quantiles:
+            quantiles.update(artifact.quantiles)
+        for file in ([] if quantiles else sorted(path.glob(f'{QUANTILE_PREFIX}*.pkl'))):
+            level = int(file.stem[len(QUANTILE_PREFIX):]) / 100
+            estimator = _load_pickle(file)
+            estimators[f'quantile_{level:g}'] = estimator
+            quantiles[level] = _wrap(estimator, scaler, inference_engine, f'{file.stem} ({version_name})')
+
+    info = model_info['ensemble']
+    info.update({
+        'members': list(members),
+        'quantile_levels': sorted(quantiles),
+        'description': 'Mean of the member models; interval from the quantile models'
+    })
+    if 'test_rmse' not in info:
+        # No ensemble metrics in the summary: report the members' average
+        served = [model_info[key] for key in models]
+        for metric in ('test_r2', 'test_rmse', 'test_mae'):
+            info[metric] = round(sum(entry[metric] for entry in served) / len(served), 4)
+        info['metrics_source'] = 'member average'
+    return EnsembleModel(members, quantiles, artifact.stacked if artifact is not None else None)
+
+
+def _wrap(estimator, scaler, inference_engine, label):
+    """Compiled TreeEnsemble when possible, else the estimator with its scaler"""
+    if inference_engine == 'compiled':
+        try:
+            return export_model(estimator, scaler)
+        except Exception as e:
+            print(f"Compiled engine unavailable for {label}, using native predict: {e}")
+    return ScaledModel(estimator, scaler)
+
+
+def load_version(name, path, default_info, serving_mode='model', inference_engine='compiled',
+                 grid_dir=None, warmup_features=None, n_jobs=None, ensemble_members=(), lazy_models=(),
+                 use_artifact=True):
+    """
+    Load, compile and warm up one model version.
+
+    Parameters:
+    -----------
+    name : str
+        Version name
+    path : Path
+        Version directory
+    default_info : dict
+        Model metadata used where results_summary.json has no metrics
+    serving_mode : str
+        'model' or 'grid' (lookup grids from grid_dir, no unpickling)
+    inference_engine : str
+        'compiled' or 'native'
+    grid_dir : Path, optional
+        Lookup grid directory (default: <path>/grid)
+    warmup_features : numpy.ndarray, optional
+        Raw feature rows predicted by every model before the version is
+        returned; a non-finite result fails the load
+    n_jobs : int, optional
+        Native XGBoost thread count
+    ensemble_members : sequence of str
+        Extra models (model_<name>.pkl) averaged into the 'ensemble' model
+    lazy_models : sequence of str
+        Model keys loaded (and warmed up) in a background thread after the
+        version is returned; the 'ensemble' is lazy when any member is
+    use_artifact : bool
+        Memory-map the compiled models from <path>/artifact when it exists
+        (compiled engine only); models missing from it are unpickled
+
+    Returns:
+    --------
+    version : ModelVersion
+    """
+    path = Path(path)
+    unknown = set(lazy_models) - set(MODEL_FILES) - {'ensemble'}
+    if unknown:
+        raise ValueError(f'Unknown lazy model(s): {", ".join(sorted(unknown))}')
+    lazy = [key for key in MODEL_FILES if key in lazy_models]
+    if lazy or 'ensemble' in lazy_models:
+        lazy.append('ensemble')
+
+    version = ModelVersion(name, path, {}, {}, None, read_model_info(path, default_info, name),
+                           'grid' if serving_mode == 'grid' else 'compiled')
+    artifact = None
+    if serving_mode == 'grid':
+        grid_dir = Path(grid_dir) if grid_dir is not None else path / 'grid'
+    else:
+        started = time.perf_counter()
+        if use_artifact and inference_engine == 'compiled' and (path / ARTIFACT_DIR / MANIFEST_FILE).exists():
+            try:
+                artifact = ModelArtifact.load(path / ARTIFACT_DIR)
+                stale = artifact.stale_sources(path)
+                if stale:
+                    raise ValueError(f"older than {', '.join(stale)}")
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Model artifact of {name} not used ({e}); loading the pickles "
+                      f"(rewrite it with: python model_artifact.py {path})")
+                artifact = None
+            else:
+                version.scaler = artifact.scaler
+                version.load_times['artifact'] = round(time.perf_counter() - started, 3)
+        if artifact is None:
+            version.scaler = _load_pickle(path / SCALER_FILE)
+            version.load_times['scaler'] = round(time.perf_counter() - started, 3)
+    version.artifact = artifact
+
+    def load(key):
+        started = time.perf_counter()
+        if key == 'ensemble':
+            missing = [member for member in MODEL_FILES if member not in version.models]
+            if missing:
+                raise ModelUnavailable(f'Ensemble member(s) not loaded: {", ".join(missing)}')
+            model = build_ensemble(name, path, {member: version.models[member] for member in MODEL_FILES},
+                                   version.estimators, version.scaler, version.model_info,
+                                   ensemble_members, inference_engine, artifact)
+        elif serving_mode == 'grid':
+            model = LookupGrid.load(grid_dir, key)
+        elif artifact is not None and key in artifact.models:
+            model = artifact.models[key]
+        else:
+            estimator = _load_pickle(path / MODEL_FILES[key])
+            if key == 'xgboost' and n_jobs is not None and hasattr(estimator, 'set_params'):
+                estimator.set_params(n_jobs=int(n_jobs))
+            version.estimators[key] = estimator
+            model = _wrap(estimator, version.scaler, inference_engine, f'{key} ({name})')
+            if isinstance(model, ScaledModel):
+                version.engine = 'native'
+
+        if warmup_features is not None:
+            predict = model.predict_all if isinstance(model, EnsembleModel) else model.predict
+            fos = np.asarray(predict(warmup_features), dtype=np.float64)
+            if not np.all(np.isfinite(fos)):
+                raise ValueError(f'Warm-up prediction of {key} ({name}) is not finite')
+        version.load_times[key] = round(time.perf_counter() - started, 3)
+        return model
+
+    for key in list(MODEL_FILES) + ['ensemble']:
+        if key not in lazy:
+            version.models[key] = load(key)
+    if lazy:
+        version.load_in_background(lazy, load)
+    return version
+
+
+class ModelRegistry:
+    """Loads model versions, tracks the active one and swaps versions atomically"""
+
+    def __init__(self, root, loader, fallback_dir=None, keep=3, poll_interval=0.0):
+        """
+        Parameters:
+        -----------
+        root : Path
+            Directory holding one subdirectory per version
+        loader : callable
+            loader(name, path) -> ModelVersion
+        fallback_dir : Path, optional
+            Flat model directory served as version 'default' when root
+            holds no versions
+        keep : int
+            Loaded versions kept in memory (active, rollback targets and
+            pinned versions)
+        poll_interval : float
+            Seconds between checks for a new or re-pinned version
+            (0 disables the watcher)
+        """
+        self.root = Path(root)
+        self.loader = loader
+        self.fallback_dir = Path(fallback_dir) if fallback_dir is not None else None
+        self.keep = max(1, int(keep))
+        self.poll_interval = float(poll_interval)
+
+        self.current = None
+        self.history = []
+        self._loaded = {}
+        self._lock = threading.RLock()
+        self._failed = {}
+        self._watcher = None
+        self.swaps = 0
+        self.last_error = None
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def available(self):
+        """Version name -> directory, oldest first"""
+        versions = {}
+        if self.root.is_dir():
+            for path in sorted(self.root.iterdir()):
+                # The trainer writes results_summary.json last, so its
+                # presence marks a complete version
+                if path.is_dir() and (path / SUMMARY_FILE).exists():
+                    versions[path.name] = path
+        if not versions and self.fallback_dir is not None:
+            versions[DEFAULT_VERSION] = self.fallback_dir
+        return versions
+
+    def _read_active_file(self):
+        try:
+            with open(self.root / ACTIVE_FILE) as f:
+                state = json.load(f)
+            return state.get('version'), list(state.get('history', []))
+        except (OSError, ValueError):
+            return None, []
+
+    def _write_active_file(self):
+        if not self.root.is_dir():
+            return
+        tmp = self.root / f'.{ACTIVE_FILE}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'version': self.current.name, 'history': self.history}, f, indent=2)
+        os.replace(tmp, self.root / ACTIVE_FILE)
+
+    def desired_version(self):
+        """The version that should be active: the pinned one if set, else the newest"""
+        versions = self.available()
+        pinned, _ = self._read_active_file()
+        if pinned in versions:
+            return pinned
+        return next(reversed(versions), None)
+
+    def get(self, name=None):
+        """Return a loaded version, loading it if needed (None = the active version)"""
+        if name is None:
+            return self.current
+        version = self._loaded.get(name)
+        if version is not None:
+            return version
+        with self._lock:
+            version = self._loaded.get(name)
+            if version is None:
+                version = self._load(name)
+            return version
+
+    def _load(self, name):
+        versions = self.available()
+        if name not in versions:
+            raise KeyError(name)
+        version = self.loader(name, versions[name])
+        self._loaded[name] = version
+
+        # Drop the oldest loaded versions that are neither active nor rollback targets
+        # history[-0:] would be the whole history, so keep=1 protects none of it
+        rollback = self.history[-(self.keep - 1):] if self.keep > 1 else []
+        protected = {self.current.name if self.current else None, name} | set(rollback)
+        for old in list(self._loaded):
+            if len(self._loaded) <= self.keep:
+                break
+            if old not in protected:
+                del self._loaded[old]
+        return version
+
+    def activate(self, name=None, persist=True, record_history=True):
+        """
+        Load (if needed) and atomically switch to a version.
+
+        Parameters:
+        -----------
+        name : str, optional
+            Version to activate (default: the newest available)
+        persist : bool
+            Pin the choice in the ACTIVE file so other workers follow it
+        record_history : bool
+            Remember the previous version as a rollback target
+        """
+        with self._lock:
+            if name is None:
+                name = next(reversed(self.available()), None)
+                if name is None:
+                    raise KeyError('No model versions available')
+            version = self.get(name)
+            previous = self.current
+            if previous is not version:
+                if previous is not None and record_history:
+                    self.history.append(previous.name)
+                # The swap itself: requests read self.current exactly once
+                self.current = version
+                self.swaps += 1
+            if persist:
+                self._write_active_file()
+            return version
+
+    def rollback(self):
+        """Switch back to the previously active version"""
+        with self._lock:
+            if not self.history:
+                raise KeyError('No previous version to roll back to')
+            name = self.history.pop()
+            try:
+                return self.activate(name, record_history=False)
+            except Exception:
+                self.history.append(name)
+                raise
+
+    def sync(self):
+        """Activate the desired version if it differs from the active one"""
+        with self._lock:
+            name = self.desired_version()
+            if name is None or (self.current is not None and self.current.name == name):
+                return False
+            path = self.available()[name]
+            marker = (path / SUMMARY_FILE).stat().st_mtime_ns if (path / SUMMARY_FILE).exists() else None
+            if name in self._failed and self._failed[name] == marker:
+                return False
+            try:
+                self.activate(name, persist=False)
+            except Exception as e:
+                self._failed[name] = marker
+                self.last_error = f'{name}: {e}'
+                print(f"Error loading model version {name}: {e}")
+                return False
+            _, history = self._read_active_file()
+            if history:
+                self.history = history
+            print(f"✓ Model version {name} active")
+            return True
+
+    def start(self):
+        """Load the desired version and start the watcher if polling is enabled"""
+        self.sync()
+        self._start_watcher()
+
+    def _start_watcher(self):
+        if self.poll_interval <= 0:
+            return
+        self._watcher = threading.Thread(target=self._watch, name='fos-model-watcher', daemon=True)
+        self._watcher.start()
+
+    def _after_fork(self):
+        # Threads do not survive fork; the lock may have been held by one
+        self._lock = threading.RLock()
+        for version in self._loaded.values():
+            version.resume_after_fork()
+        if self._watcher is not None:
+            self._start_watcher()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            try:
+                self.sync()
+            except Exception as e:
+                self.last_error = str(e)
+
+    def stats(self):
+        """Registry state for /models/versions"""
+        return {
+            'active': self.current.describe() if self.current else None,
+            'available': list(self.available()),
+            'loaded': list(self._loaded),
+            'history': list(self.history),
+            'swaps': self.swaps,
+            'watch_interval_seconds': self.poll_interval,
+            'last_error': self.last_error
+        }
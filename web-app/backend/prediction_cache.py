@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+In-process LRU cache for prediction results.
+
+Dashboards and the web forms keep re-submitting the same material
+parameter sets, so results are cached per model and per input row. Keys are
+the model key plus the inputs rounded to a configurable number of decimals;
+entries expire after a TTL and the least recently used entry is evicted when
+the cache is full. The cache clears itself when the fingerprint of the model
+files changes.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class PredictionCache:
+    """Thread-safe bounded LRU cache with TTL and hit/miss/eviction counters"""
+
+    def __init__(self, maxsize=4096, ttl=300.0, precision=6, fingerprint=None, check_interval=5.0):
+        """
+        Parameters:
+        -----------
+        maxsize : int
+            Maximum number of entries; 0 disables the cache
+        ttl : float
+            Seconds an entry stays valid (0 = no expiry)
+        precision : int
+            Decimal places inputs are rounded to when building keys
+        fingerprint : callable, optional
+            Returns a value identifying the current model files; the cache
+            is cleared when it changes
+        check_interval : float
+            Minimum seconds between fingerprint checks
+        """
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl)
+        self.precision = int(precision)
+        self.fingerprint = fingerprint
+        self.check_interval = float(check_interval)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint_value = fingerprint() if fingerprint else None
+        self._next_check = time.monotonic() + self.check_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def make_keys(self, model_key, features):
+        """Cache keys for each row of an (N, 4) feature matrix"""
+        quantized = np.round(np.asarray(features, dtype=np.float64), self.precision) + 0.0
+        return [(model_key,) + tuple(row) for row in quantized.tolist()]
+
+    def _check_fingerprint(self, now):
+        """Clear the cache if the model files changed (called with the lock held)"""
+        if self.fingerprint is None or now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        value = self.fingerprint()
+        if value != self._fingerprint_value:
+            self._fingerprint_value = value
+            self._entries.clear()
+            self.invalidations += 1
+
+    def get(self, key):
+        """Return the cached value for key, or None"""
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            self._check_fingerprint(now)
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires, value = item
+            if self.ttl and expires < now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entries if full"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def reset(self):
+        """Drop all entries and zero the counters (e.g. after the start-up warm-up)"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def stats(self):
+        """Counters for /health"""
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'ttl_seconds': self.ttl,
+            'precision': self.precision,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations
+        }
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo probability of failure for single- and multi-layer slopes.
+
+Each uncertain input is described by a mean, a coefficient of variation
+(or standard deviation) and a normal or lognormal distribution. Inputs of a
+layer may be correlated through a Gaussian copula: correlated standard
+normals are drawn with a Cholesky factor and mapped to each marginal.
+Samples are drawn and scored in fixed-size chunks, so memory stays bounded
+by the chunk size, and sampling stops early when the time budget runs out.
+The model's test RMSE is added to every sampled FoS as normal noise, which
+replaces the fixed +-1.96 RMSE band of a point prediction.
+"""
+
+import time
+from statistics import NormalDist
+
+import numpy as np
+
+DISTRIBUTIONS = ('normal', 'lognormal')
+
+PERCENTILES = (1, 5, 10, 25, 50, 75, 90, 95, 99)
+
+
+def parse_input(name, spec):
+    """
+    Normalise one input specification.
+
+    A number is a fixed value; an object is
+    {"mean": float, "cov": float | "std": float, "distribution": "normal" | "lognormal"}.
+    Raises ValueError with a message naming the input.
+    """
+    if isinstance(spec, bool) or spec is None:
+        raise ValueError(f'{name}: expected a number or a distribution object')
+    if isinstance(spec, (int, float)):
+        return {'distribution': 'fixed', 'mean': float(spec), 'std': 0.0}
+    if not isinstance(spec, dict):
+        raise ValueError(f'{name}: expected a number or a distribution object')
+
+    try:
+        mean = float(spec['mean'])
+    except KeyError:
+        raise ValueError(f'{name}: "mean" is required')
+    except (TypeError, ValueError):
+        raise ValueError(f'{name}: "mean" must be a number')
+
+    distribution = spec.get('distribution', 'normal')
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f'{name}: distribution must be one of {", ".join(DISTRIBUTIONS)}')
+    try:
+        if 'std' in spec:
+            std = float(spec['std'])
+        else:
+            std = float(spec.get('cov', 0.0)) * abs(mean)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name}: "cov" and "std" must be numbers')
+    if not np.isfinite(mean) or not np.isfinite(std) or std < 0:
+        raise ValueError(f'{name}: mean must be finite and the standard deviation non-negative')
+    if distribution == 'lognormal' and mean <= 0:
+        raise ValueError(f'{name}: a lognormal input needs a positive mean')
+    if std == 0:
+        return {'distribution': 'fixed', 'mean': mean, 'std': 0.0}
+    return {'distribution': distribution, 'mean': mean, 'std': std}
+
+
+class LayerModel:
+    """Joint distribution of the four inputs of one layer"""
+
+    def __init__(self, inputs, feature_names, correlations=None, defaults=None):
+        """
+        Parameters:
+        -----------
+        inputs : dict
+            Feature name -> number or distribution object
+        feature_names : list of str
+            Column order of the sampled matrix
+        correlations : list of [name, name, rho], optional
+            Correlations between the underlying standard normals; each pair
+            at most once, and only between inputs that are distributions
+        defaults : dict, optional
+            Values used for features missing from inputs
+        """
+        defaults = defaults or {}
+        self.feature_names = list(feature_names)
+        self.specs = []
+        for name in self.feature_names:
+            if name in inputs:
+                self.specs.append(parse_input(name, inputs[name]))
+            elif name in defaults:
+                self.specs.append(parse_input(name, defaults[name]))
+            else:
+                raise ValueError(f'Missing required field: {name}')
+
+        self.random = [i for i, spec in enumerate(self.specs) if spec['distribution'] != 'fixed']
+        corr = np.eye(len(self.feature_names))
+        given = set()
+        for entry in correlations or []:
+            if not isinstance(entry, (list, tuple)) or len(entry) != 3:
+                raise ValueError('Each correlation must be [input, input, rho]')
+            a, b, rho = entry
+            if a not in self.feature_names or b not in self.feature_names or a == b:
+                raise ValueError(f'Invalid correlation pair: {a}, {b}')
+            rho = float(rho)
+            if not -1 < rho < 1:
+                raise ValueError(f'Correlation between {a} and {b} must be between -1 and 1')
+            i, j = self.feature_names.index(a), self.feature_names.index(b)
+            if (min(i, j), max(i, j)) in given:
+                raise ValueError(f'Correlation between {a} and {b} is given more than once')
+            given.add((min(i, j), max(i, j)))
+            # A constant cannot be correlated; only the rows of random inputs are used
+            fixed = [name for name, k in ((a, i), (b, j)) if self.specs[k]['distribution'] == 'fixed']
+            if fixed and rho != 0:
+                raise ValueError(f'Correlation between {a} and {b}: {fixed[0]} is fixed, not a distribution')
+            corr[i, j] = corr[j, i] = rho
+        try:
+            self.cholesky = np.linalg.cholesky(corr[np.ix_(self.random, self.random)])
+        except np.linalg.LinAlgError:
+            raise ValueError('Correlation matrix is not positive definite')
+
+        # Per-column transform z -> x: normal is loc + scale * z,
+        # lognormal is exp(loc + scale * z)
+        self.loc = np.array([spec['mean'] for spec in self.specs])
+        self.scale = np.zeros(len(self.specs))
+        self.lognormal = np.zeros(len(self.specs), dtype=bool)
+        for i, spec in enumerate(self.specs):
+            if spec['distribution'] == 'normal':
+                self.scale[i] = spec['std']
+            elif spec['distribution'] == 'lognormal':
+                sigma2 = np.log1p((spec['std'] / spec['mean']) ** 2)
+                self.loc[i] = np.log(spec['mean']) - sigma2 / 2
+                self.scale[i] = np.sqrt(sigma2)
+                self.lognormal[i] = True
+
+    def sample(self, rng, n, out):
+        """Fill out, an (n, 4) view, with n joint samples"""
+        out[:] = self.loc
+        if self.random:
+            z = rng.standard_normal((n, len(self.random))) @ self.cholesky.T
+            out[:, self.random] = self.loc[self.random] + self.scale[self.random] * z
+        if self.lognormal.any():
+            out[:, self.lognormal] = np.exp(out[:, self.lognormal])
+        return out
+
+    def describe(self):
+        return dict(zip(self.feature_names, self.specs))
+
+
+def run_simulation(predict_fn, layers, n_samples, rng, lower, upper, weight_column,
+                   model_rmse=0.0, chunk_rows=262144, time_budget=10.0):
+    """
+    Sample, score and summarise FoS for a (possibly multi-layer) profile.
+
+    Parameters:
+    -----------
+    predict_fn : callable
+        Maps an (N, 4) matrix of raw features to N FoS values
+    layers : list of LayerModel
+        One entry per layer; layers are sampled independently
+    n_samples : int
+        Requested number of Monte Carlo samples
+    rng : numpy.random.Generator
+    lower, upper : numpy.ndarray
+        Valid input range; samples are clipped to it and the clipped
+        fraction is reported per layer and input
+    weight_column : int
+        Column holding the unit weight, used to average layer FoS
+    model_rmse : float
+        Standard deviation of the normal model error added to each sample
+    chunk_rows : int
+        Feature rows scored per model call (bounds memory)
+    time_budget : float
+        Seconds after which sampling stops, even if fewer samples were drawn
+
+    Returns:
+    --------
+    fos : numpy.ndarray
+        Sampled FoS values (float32), one per completed sample
+    clipped : numpy.ndarray
+        (layers, 4) count of clipped values
+    truncated : bool
+        True when the time budget stopped sampling early
+    """
+    n_layers = len(layers)
+    chunk = max(1, chunk_rows // n_layers)
+    fos = np.empty(n_samples, dtype=np.float32)
+    clipped = np.zeros((n_layers, len(lower)), dtype=np.int64)
+    X = np.empty((chunk, n_layers, len(lower)))
+    deadline = time.perf_counter() + time_budget
+
+    done = 0
+    truncated = False
+    while done < n_samples:
+        n = min(chunk, n_samples - done)
+        block = X[:n]
+        for j, layer in enumerate(layers):
+            layer.sample(rng, n, block[:, j, :])
+        clipped += ((block < lower) | (block > upper)).sum(axis=0)
+        np.clip(block, lower, upper, out=block)
+
+        layer_fos = np.asarray(predict_fn(block.reshape(-1, len(lower))), dtype=np.float64).reshape(n, n_layers)
+        if n_layers == 1:
+            profile = layer_fos[:, 0]
+        else:
+            weights = block[:, :, weight_column]
+            profile = (layer_fos * weights).sum(axis=1) / weights.sum(axis=1)
+        if model_rmse > 0:
+            profile = profile + rng.normal(0.0, model_rmse, n)
+        fos[done:done + n] = profile
+        done += n
+
+        if done < n_samples and time.perf_counter() > deadline:
+            truncated = True
+            break
+    return fos[:done], clipped, truncated
+
+
+def summarise(fos, failure_threshold, safety_thresholds, safety_levels):
+    """Pf with its standard error, reliability indices, percentiles and safety-class probabilities"""
+    n = len(fos)
+    values = fos.astype(np.float64)
+    failures = int(np.count_nonzero(values < failure_threshold))
+    pf = failures / n
+    pf_se = float(np.sqrt(pf * (1 - pf) / n))
+    mean = float(values.mean())
+    std = float(values.std(ddof=1)) if n > 1 else 0.0
+
+    # Generalised index from Pf; infinite when no (or only) failures were sampled
+    if 0 < pf < 1:
+        beta = -NormalDist().inv_cdf(pf)
+    else:
+        beta = None
+
+    classes = np.bincount(np.searchsorted(safety_thresholds, values, side='right'), minlength=len(safety_levels))
+    return {
+        'samples': n,
+        'failure_threshold': failure_threshold,
+        'failures': failures,
+        'probability_of_failure': pf,
+        'pf_standard_error': round(pf_se, 8),
+        'pf_confidence_interval': {
+            'lower': round(max(0.0, pf - 1.96 * pf_se), 8),
+            'upper': round(min(1.0, pf + 1.96 * pf_se), 8),
+            'level': '95%'
+        },
+        'reliability_index': round(beta, 4) if beta is not None else None,
+        'reliability_index_fosm': round((mean - failure_threshold) / std, 4) if std > 0 else None,
+        'fos': {
+            'mean': round(mean, 4),
+            'std': round(std, 4),
+            'min': round(float(values.min()), 4),
+            'max': round(float(values.max()), 4),
+            'percentiles': {
+                f'p{p}': round(float(v), 4) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))
+            }
+        },
+        'safety_probabilities': {
+            level['status']: round(int(count) / n, 6) for level, count in zip(safety_levels, classes)
+        }
+    }
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Micro-batching coalescer for concurrent single-row predictions.
+
+Request threads submit one feature row each and block. A background thread
+collects rows until either max_batch rows are waiting or the oldest row has
+waited max_wait seconds, then runs one vectorized prediction per model and
+wakes each caller with its own result. Queue depth and caller wait time are
+bounded, and the achieved batch sizes are recorded for /health.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+class QueueFullError(Exception):
+    """Raised when the coalescer queue is at max_queue rows"""
+
+
+class _PendingRow:
+    __slots__ = ('model', 'row', 'enqueued', 'done', 'result', 'error')
+
+    def __init__(self, model, row):
+        self.model = model
+        self.row = row
+        self.enqueued = time.monotonic()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestCoalescer:
+    """Collects single-row predictions into batches run by one worker thread"""
+
+    def __init__(self, predict_fn, max_batch=64, max_wait=0.002, max_queue=1024, timeout=1.0):
+        """
+        Parameters:
+        -----------
+        predict_fn : callable
+            predict_fn(model, features) -> FoS array for an (N, 4) matrix,
+            called with the model instance given to submit()
+        max_batch : int
+            Rows per batch before it is dispatched immediately
+        max_wait : float
+            Seconds the oldest queued row may wait for more rows to arrive
+        max_queue : int
+            Maximum queued rows; submit() raises QueueFullError beyond this
+        timeout : float
+            Maximum seconds a caller waits for its result
+        """
+        self.predict_fn = predict_fn
+        self.max_batch = int(max_batch)
+        self.max_wait = float(max_wait)
+        self.max_queue = int(max_queue)
+        self.timeout = float(timeout)
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+
+        # Batch sizes are bucketed by powers of two up to max_batch
+        self.bucket_bounds = [2 ** i for i in range(int(np.ceil(np.log2(max(self.max_batch, 1)))) + 1)]
+        self.batch_size_counts = [0] * len(self.bucket_bounds)
+        self.batches = 0
+        self.rows = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_depth = 0
+
+    def _ensure_worker(self):
+        """Start the worker lazily, and again in a forked child (threads do not survive fork)"""
+        if self._thread is None or self._pid != os.getpid():
+            self._pending.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='fos-coalescer', daemon=True)
+            self._thread.start()
+
+    def submit(self, model, row):
+        """
+        Queue one feature row for a model instance and block until its FoS
+        is available. Rows are batched per instance, so the same model key
+        of two versions (e.g. a pinned one) never shares a batch.
+        """
+        item = _PendingRow(model, row)
+        with self._cond:
+            self._ensure_worker()
+            if len(self._pending) >= self.max_queue:
+                self.rejected += 1
+                raise QueueFullError(f'Prediction queue is full ({self.max_queue} rows)')
+            self._pending.append(item)
+            self.max_depth = max(self.max_depth, len(self._pending))
+            self._cond.notify()
+
+        if not item.done.wait(self.timeout):
+            with self._cond:
+                self.timeouts += 1
+            raise TimeoutError(f'Prediction not completed within {self.timeout * 1000:.0f} ms')
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                deadline = self._pending[0].enqueued + self.max_wait
+                while len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._pending.popleft() for _ in range(min(len(self._pending), self.max_batch))]
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        """Run one prediction per model instance for a collected batch and wake the callers"""
+        started = time.monotonic()
+        groups = {}
+        for item in batch:
+            # Keyed by identity: models need not be hashable or comparable
+            groups.setdefault(id(item.model), (item.model, []))[1].append(item)
+
+        for model, items in groups.values():
+            try:
+                fos = self.predict_fn(model, np.array([item.row for item in items], dtype=np.float64))
+                for item, value in zip(items, fos.tolist()):
+                    item.result = value
+            except Exception as e:
+                for item in items:
+                    item.error = e
+
+        self.batches += 1
+        self.rows += len(batch)
+        self.total_wait += sum(started - item.enqueued for item in batch)
+        bucket = min(int(np.searchsorted(self.bucket_bounds, len(batch))), len(self.bucket_bounds) - 1)
+        self.batch_size_counts[bucket] += 1
+        for item in batch:
+            item.done.set()
+
+    def stats(self):
+        """Batch-size distribution and queue counters for /health"""
+        return {
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait * 1000,
+            'max_queue': self.max_queue,
+            'queue_depth': len(self._pending),
+            'max_queue_depth': self.max_depth,
+            'batches': self.batches,
+            'rows': self.rows,
+            'mean_batch_size': round(self.rows / self.batches, 2) if self.batches else 0.0,
+            'mean_queue_wait_ms': round(self.total_wait / self.rows * 1000, 3) if self.rows else 0.0,
+            'batch_size_histogram': [
+                {'le': bound, 'count': count} for bound, count in zip(self.bucket_bounds, self.batch_size_counts)
+            ],
+            'rejected': self.rejected,
+            'timeouts': self.timeouts
+        }
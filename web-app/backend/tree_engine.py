@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+"""
+Pure-NumPy inference engine for the tree ensembles served by the API.
+
+GradientBoostingRegressor and XGBRegressor models are flattened into packed
+node arrays (feature, threshold, left child, leaf value) with the
+StandardScaler folded into the split thresholds, so raw (unscaled) inputs
+are evaluated directly. A batch of rows is evaluated against all trees at
+once, which avoids the fixed per-call overhead of the library predict()
+methods (input validation, DMatrix construction). to_arrays and
+from_arrays save and restore a compiled ensemble as flat arrays (see
+model_artifact.py).
+
+Run this file directly to check parity against the original models and to
+compare latency:
+    python tree_engine.py --rows 10000
+
+or, without the app or any saved model, against small models fitted on the
+spot (exits non-zero on a mismatch):
+    python tree_engine.py --self-check
+"""
+
+import json
+import numpy as np
+
+
+class TreeEnsemble:
+    """
+    Packed additive tree ensemble evaluated on raw feature rows.
+
+    Nodes of every tree are stored breadth-first so that the right child of
+    node i is always left[i] + 1. A row moves to the right child when
+    x[feature] > threshold. Leaves point to themselves with an infinite
+    threshold.
+
+    prediction = base_score + sum of the leaf values reached in every tree
+
+    With float32_sum the sum is accumulated in float32, tree by tree and
+    starting from base_score, which is how XGBoost computes its output.
+
+    When every tree has at most 64 leaves the nodes are also compiled into
+    per-feature bitvector tables (QuickScorer): each split that sends a row
+    right removes the leaves of its left subtree from a 64-bit mask, so the
+    exit leaf of a tree is the lowest bit left after AND-ing one table row
+    per feature. The table row is found with a single searchsorted over the
+    feature's sorted thresholds, which keeps the work for a batch to a few
+    contiguous (rows, trees) array operations.
+    """
+
+    # Rows evaluated per step; keeps the (rows, trees) temporaries in cache
+    CHUNK_ROWS = 256
+
+    def __init__(self, feature, threshold, left, value, roots, base_score, max_depth, n_features,
+                 float32_sum=False, compiled=None):
+        self.feature = np.ascontiguousarray(feature, dtype=np.intp)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.intp)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.intp)
+        self.base_score = float(base_score)
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.float32_sum = bool(float32_sum)
+        if compiled is None:
+            self._compile_bitvectors()
+        else:
+            self._set_bitvectors(**compiled)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    def _compile_bitvectors(self):
+        """Build the per-feature leaf-mask tables, or leave them unset if a tree is too large"""
+        self.cuts = None
+        self.tables = None
+        is_leaf = self.left == np.arange(self.n_nodes)
+        left = self.left.tolist()
+        node_tree = np.repeat(np.arange(self.n_trees), np.diff(np.append(self.roots, self.n_nodes)))
+
+        # Leaf slots (left-to-right order within a tree) and split masks
+        slot = np.zeros(self.n_nodes, dtype=np.intp)
+        masks = [0] * self.n_nodes
+        full = (1 << 64) - 1
+        for root in self.roots.tolist():
+            lo, hi = {}, {}
+            count = 0
+            stack = [(root, False)]
+            while stack:
+                node, expanded = stack.pop()
+                if is_leaf[node]:
+                    slot[node] = lo[node] = count
+                    count += 1
+                    hi[node] = count
+                    if count > 64:
+                        return
+                elif not expanded:
+                    stack.extend(((node, True), (left[node] + 1, False), (left[node], False)))
+                else:
+                    child = left[node]
+                    lo[node], hi[node] = lo[child], hi[child + 1]
+                    masks[node] = full ^ ((1 << hi[child]) - (1 << lo[child]))
+
+        masks = np.array(masks, dtype=np.uint64)
+        leaves = np.flatnonzero(is_leaf)
+        self.leaf_values = np.zeros(self.n_trees * 64)
+        self.leaf_values[node_tree[leaves] * 64 + slot[leaves]] = self.value[leaves]
+        # Offset that turns the float64 exponent of a single-bit mask into a leaf_values index
+        self.leaf_offset = np.arange(self.n_trees, dtype=np.intp) * 64 - 1023
+
+        self.cuts, self.tables = [], []
+        for f in range(self.n_features):
+            splits = np.flatnonzero(~is_leaf & (self.feature == f))
+            cuts = np.unique(self.threshold[splits])
+            table = np.full((len(cuts) + 1, self.n_trees), full, dtype=np.uint64)
+            # Row k of the table holds the masks of every split with threshold < cuts[k]
+            np.bitwise_and.at(table, (np.searchsorted(cuts, self.threshold[splits]) + 1, node_tree[splits]),
+                              masks[splits])
+            self.cuts.append(cuts)
+            self.tables.append(np.bitwise_and.accumulate(table, axis=0))
+
+    # The to_arrays entries holding the compiled tables
+    COMPILED_ARRAYS = ('leaf_values', 'cuts', 'cut_offsets', 'tables')
+
+    def _set_bitvectors(self, leaf_values, cuts, cut_offsets, tables):
+        """Use the tables saved by to_arrays instead of compiling them"""
+        # Feature f owns cuts[cut_offsets[f]:cut_offsets[f + 1]] and one more table row than cuts
+        self.leaf_values = leaf_values
+        self.leaf_offset = np.arange(self.n_trees, dtype=np.intp) * 64 - 1023
+        self.cuts, self.tables = [], []
+        for f in range(self.n_features):
+            start, stop = int(cut_offsets[f]), int(cut_offsets[f + 1])
+            self.cuts.append(cuts[start:stop])
+            self.tables.append(tables[start + f:stop + f + 1])
+
+    def to_arrays(self):
+        """
+        The packed nodes and compiled tables as flat arrays, plus the scalar
+        parameters: everything from_arrays needs to rebuild the ensemble
+        without compiling it again
+        """
+        arrays = {'feature': self.feature, 'threshold': self.threshold, 'left': self.left,
+                  'value': self.value, 'roots': self.roots}
+        if self.tables is not None:
+            arrays.update(
+                leaf_values=self.leaf_values,
+                cuts=np.concatenate(self.cuts),
+                cut_offsets=np.cumsum([0] + [len(cuts) for cuts in self.cuts]).astype(np.intp),
+                tables=np.concatenate(self.tables)
+            )
+        params = {'base_score': self.base_score, 'max_depth': self.max_depth,
+                  'n_features': self.n_features, 'float32_sum': self.float32_sum}
+        return arrays, params
+
+    @classmethod
+    def from_arrays(cls, arrays, params):
+        """
+        Rebuild an ensemble from to_arrays output. Arrays of the right dtype
+        (e.g. read-only memory maps) are used in place, not copied.
+        """
+        compiled = None
+        if 'tables' in arrays:
+            compiled = {name: arrays[name] for name in cls.COMPILED_ARRAYS}
+        return cls(arrays['feature'], arrays['threshold'], arrays['left'], arrays['value'], arrays['roots'],
+                   compiled=compiled, **params)
+
+    def predict(self, X):
+        """
+        Predict an (N, n_features) matrix of raw inputs.
+
+        Inputs must be finite; missing-value branches of the original models
+        are not represented.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != self.n_features:
+            raise ValueError(f'Expected {self.n_features} features, got {X.shape[1]}')
+
+        evaluate = self._predict_bitvector if self.tables is not None else self._predict_traversal
+        if len(X) <= self.CHUNK_ROWS:
+            return evaluate(X)
+        out = None
+        for start in range(0, len(X), self.CHUNK_ROWS):
+            chunk = evaluate(X[start:start + self.CHUNK_ROWS])
+            if out is None:
+                out = np.empty((len(X),) + chunk.shape[1:])
+            out[start:start + self.CHUNK_ROWS] = chunk
+        return out
+
+    def _predict_bitvector(self, X):
+        mask = self.tables[0][np.searchsorted(self.cuts[0], X[:, 0])]
+        for f in range(1, self.n_features):
+            mask &= self.tables[f][np.searchsorted(self.cuts[f], X[:, f])]
+        # Isolate the lowest set bit; its float64 exponent is the leaf slot
+        lowest = ~mask
+        lowest += np.uint64(1)
+        lowest &= mask
+        leaf = lowest.astype(np.float64).view(np.intp)
+        leaf >>= 52
+        leaf += self.leaf_offset
+        return self._sum_leaves(np.take(self.leaf_values, leaf))
+
+    def _predict_traversal(self, X):
+        flat = np.ascontiguousarray(X).ravel()
+        row_offset = (np.arange(X.shape[0], dtype=np.intp) * self.n_features)[:, None]
+        node = np.broadcast_to(self.roots, (X.shape[0], self.n_trees))
+        for _ in range(self.max_depth):
+            go_right = flat[row_offset + self.feature[node]] > self.threshold[node]
+            node = self.left[node] + go_right
+        return self._sum_leaves(self.value[node])
+
+    def _sum_leaves(self, leaf_values):
+        """Add the (rows, trees) leaf values of each row to the base score"""
+        if not self.float32_sum:
+            return self.base_score + leaf_values.sum(axis=1)
+        acc = np.empty((leaf_values.shape[0], leaf_values.shape[1] + 1), dtype=np.float32)
+        acc[:, 0] = self.base_score
+        acc[:, 1:] = leaf_values
+        np.cumsum(acc, axis=1, out=acc)
+        return acc[:, -1].astype(np.float64)
+
+
+class StackedEnsemble(TreeEnsemble):
+    """
+    Several TreeEnsembles evaluated together.
+
+    The trees of all members are packed into one node array, so a batch
+    costs one pass over the feature tables (one searchsorted per feature)
+    however many members there are. predict returns an (N, members) matrix;
+    each column equals that member's own predict bit for bit. compiled takes
+    the tables of an earlier stack of the same members (see to_arrays).
+    """
+
+    def __init__(self, members, compiled=None):
+        members = list(members)
+        offsets = np.cumsum([0] + [member.n_nodes for member in members])
+        self.members = members
+        self.tree_bounds = np.cumsum([0] + [member.n_trees for member in members])
+        super().__init__(
+            feature=np.concatenate([member.feature for member in members]),
+            threshold=np.concatenate([member.threshold for member in members]),
+            left=np.concatenate([member.left + offset for member, offset in zip(members, offsets)]),
+            value=np.concatenate([member.value for member in members]),
+            roots=np.concatenate([member.roots + offset for member, offset in zip(members, offsets)]),
+            base_score=0.0,
+            max_depth=max(member.max_depth for member in members),
+            n_features=members[0].n_features,
+            compiled=compiled
+        )
+        # Keep the (rows, trees) temporaries the size a single member uses
+        self.CHUNK_ROWS = max(16, TreeEnsemble.CHUNK_ROWS * max(m.n_trees for m in members) // self.n_trees)
+
+    def _sum_leaves(self, leaf_values):
+        out = np.empty((leaf_values.shape[0], len(self.members)))
+        for j, member in enumerate(self.members):
+            start, stop = self.tree_bounds[j], self.tree_bounds[j + 1]
+            out[:, j] = member._sum_leaves(leaf_values[:, start:stop])
+        return out
+
+
+def _pack_trees(trees, base_score, n_features, float32_sum=False):
+    """
+    Pack trees into a TreeEnsemble.
+
+    Each tree is (feature, threshold, left, right, value) arrays in its own
+    node numbering, with -1 children for leaves and the rule "go right when
+    x > threshold". Nodes are renumbered breadth-first so siblings are
+    adjacent.
+    """
+    features, thresholds, lefts, values, roots = [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for feature, threshold, left, right, value in trees:
+        # Breadth-first order: children of a split are appended as a pair
+        order = [0]
+        depth = {0: 0}
+        new_left = {}
+        i = 0
+        while i < len(order):
+            node = order[i]
+            if left[node] != -1:
+                new_left[node] = len(order)
+                order.extend((left[node], right[node]))
+                depth[left[node]] = depth[right[node]] = depth[node] + 1
+            i += 1
+
+        order = np.asarray(order, dtype=np.intp)
+        is_leaf = left[order] == -1
+        position = np.arange(len(order))
+
+        roots.append(offset)
+        features.append(np.where(is_leaf, 0, feature[order]))
+        thresholds.append(np.where(is_leaf, np.inf, threshold[order]))
+        lefts.append(offset + np.array([new_left.get(n, p) for p, n in zip(position, order.tolist())]))
+        values.append(np.where(is_leaf, value[order], 0.0))
+        max_depth = max(max_depth, max(depth.values()))
+        offset += len(order)
+
+    return TreeEnsemble(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts),
+        value=np.concatenate(values),
+        roots=np.asarray(roots),
+        base_score=base_score,
+        max_depth=max_depth,
+        n_features=n_features,
+        float32_sum=float32_sum
+    )
+
+
+def _fold_scaler(feature, threshold, is_leaf, scaler, inclusive=False):
+    """
+    Map split thresholds from scaled space to raw feature units.
+
+    Both libraries compare float32((x - mean) / scale) against the split
+    value, going right when it is > t (sklearn) or >= t (XGBoost,
+    inclusive=True). That test is monotone in the raw value x, so the exact
+    raw boundary is found by bisection over float64 values. The returned t'
+    reproduces the original split bit-for-bit with the rule "right when x > t'".
+    """
+    splits = np.flatnonzero(~is_leaf)
+    raw = np.asarray(threshold, dtype=np.float64).copy()
+    if len(splits) == 0:
+        return raw
+
+    f = feature[splits]
+    t = raw[splits]
+    mean = np.zeros(len(splits)) if scaler is None or getattr(scaler, 'mean_', None) is None else scaler.mean_[f]
+    scale = np.ones(len(splits)) if scaler is None or getattr(scaler, 'scale_', None) is None else scaler.scale_[f]
+
+    def goes_right(x):
+        scaled = ((x - mean) / scale).astype(np.float32)
+        return scaled >= t if inclusive else scaled > t
+
+    # Bracket the boundary around the analytic estimate, widening if needed
+    estimate = t * scale + mean
+    delta = (np.abs(t) + 1.0) * scale * 2.0 ** -16
+    lo, hi = estimate - delta, estimate + delta
+    while True:
+        bad_lo, bad_hi = goes_right(lo), ~goes_right(hi)
+        if not (bad_lo.any() or bad_hi.any()):
+            break
+        delta *= 2
+        lo = np.where(bad_lo, estimate - delta, lo)
+        hi = np.where(bad_hi, estimate + delta, hi)
+
+    # Shrink to adjacent doubles: lo stays left of the boundary, hi right of it
+    for _ in range(200):
+        mid = lo + (hi - lo) / 2
+        active = (mid > lo) & (mid < hi)
+        if not active.any():
+            break
+        right = goes_right(mid)
+        hi = np.where(active & right, mid, hi)
+        lo = np.where(active & ~right, mid, lo)
+
+    raw[splits] = lo
+    return raw
+
+
+def export_gradient_boosting(model, scaler=None):
+    """Flatten a fitted sklearn GradientBoostingRegressor"""
+    n_features = model.n_features_in_
+    if isinstance(model.init_, str) and model.init_ == 'zero':
+        base_score = 0.0
+    elif type(model.init_).__name__ == 'DummyRegressor':
+        base_score = float(np.ravel(model.init_.predict(np.zeros((1, n_features))))[0])
+    else:
+        raise ValueError(f'Unsupported init estimator: {type(model.init_).__name__}')
+
+    trees = []
+    for estimator in model.estimators_[:, 0]:
+        tree = estimator.tree_
+        is_leaf = tree.children_left == -1
+        threshold = _fold_scaler(tree.feature, tree.threshold, is_leaf, scaler)
+        trees.append((
+            tree.feature,
+            threshold,
+            tree.children_left,
+            tree.children_right,
+            model.learning_rate * tree.value[:, 0, 0]
+        ))
+    return _pack_trees(trees, base_score, n_features)
+
+
+def _xgboost_base_score(booster):
+    """Read the global bias from the booster config ("1.2E0" or "[1.2E0]")"""
+    config = json.loads(booster.save_config())
+    base_score = config['learner']['learner_model_param']['base_score']
+    return float(base_score.strip('[]').split(',')[0])
+
+
+def export_xgboost(model, scaler=None):
+    """Flatten a fitted XGBRegressor (gbtree booster, regression objective)"""
+    booster = model.get_booster()
+    n_features = booster.num_features()
+    names = booster.feature_names or [f'f{i}' for i in range(n_features)]
+    feature_index = {name: i for i, name in enumerate(names)}
+
+    trees = []
+    for dump in booster.get_dump(dump_format='json'):
+        nodes = {}
+        stack = [json.loads(dump)]
+        while stack:
+            node = stack.pop()
+            nodes[node['nodeid']] = node
+            stack.extend(node.get('children', []))
+
+        size = max(nodes) + 1
+        feature = np.zeros(size, dtype=np.intp)
+        threshold = np.zeros(size)
+        left = np.full(size, -1, dtype=np.intp)
+        right = np.full(size, -1, dtype=np.intp)
+        value = np.zeros(size)
+        for node_id, node in nodes.items():
+            if 'leaf' in node:
+                value[node_id] = node['leaf']
+                continue
+            feature[node_id] = feature_index[node['split']]
+            threshold[node_id] = node['split_condition']
+            left[node_id] = node['yes']
+            right[node_id] = node['no']
+
+        # XGBoost goes left when x < t, i.e. right when x >= t
+        is_leaf = left == -1
+        threshold = _fold_scaler(feature, threshold.astype(np.float32), is_leaf, scaler, inclusive=True)
+        trees.append((feature, threshold, left, right, value))
+
+    return _pack_trees(trees, _xgboost_base_score(booster), n_features, float32_sum=True)
+
+
+def export_model(model, scaler=None):
+    """
+    Flatten a supported fitted model into a TreeEnsemble.
+
+    Dispatches on the class name so that neither sklearn nor xgboost has to
+    be imported here.
+    """
+    kind = type(model).__name__
+    if kind == 'GradientBoostingRegressor':
+        return export_gradient_boosting(model, scaler)
+    if kind == 'XGBRegressor':
+        return export_xgboost(model, scaler)
+    raise ValueError(f'Unsupported model type: {kind}')
+
+
+def check_parity(ensemble, model, scaler, X):
+    """Maximum absolute difference between the engine and model.predict"""
+    expected = np.asarray(model.predict(scaler.transform(X) if scaler is not None else X), dtype=np.float64)
+    return float(np.max(np.abs(ensemble.predict(X) - expected)))
+
+
+def self_check(rows=2000, tolerance=1e-9, seed=42):
+    """
+    Check the engine against sklearn and xgboost on small models fitted here.
+
+    GradientBoostingRegressor (squared error and quantile loss) and
+    XGBRegressor models, configured like the trainer's but smaller, are
+    fitted on scaled synthetic inputs and exported with the scaler folded
+    into the thresholds. Each is compared with model.predict on random rows
+    and on rows placed exactly on, and one ulp either side of, every split
+    threshold, through the bitvector tables, the node traversal, a
+    to_arrays/from_arrays round trip and a StackedEnsemble of all of them.
+    Needs neither the app nor any saved model.
+
+    Returns:
+    --------
+    results : list of (label, max absolute difference)
+        The difference is inf where an equality that must hold bit for bit
+        (traversal, round trip, stacked column) does not
+    """
+    import copy
+
+    import xgboost as xgb
+    from sklearn.ensemble import GradientBoostingRegressor
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(seed)
+    lower, upper = np.array([0.0, 0.0, 15.0, 0.0]), np.array([100.0, 45.0, 25.0, 1.0])
+    X_train = rng.uniform(lower, upper, (1000, 4))
+    y_train = (0.5 + X_train[:, 0] / 60 + np.tan(np.radians(X_train[:, 1])) * (1 - X_train[:, 3])
+               - (X_train[:, 2] - 20) / 40 + rng.normal(0, 0.05, len(X_train)))
+    scaler = StandardScaler().fit(X_train)
+    X_scaled = scaler.transform(X_train)
+
+    gb_params = dict(n_estimators=40, max_depth=5, learning_rate=0.05, subsample=0.8, min_samples_split=5,
+                     min_samples_leaf=3, max_features='sqrt', random_state=seed)
+    models = {
+        'Gradient Boosting': GradientBoostingRegressor(**gb_params),
+        'Quantile 0.05': GradientBoostingRegressor(**dict(gb_params, loss='quantile', alpha=0.05)),
+        'XGBoost': xgb.XGBRegressor(n_estimators=40, max_depth=6, learning_rate=0.05, subsample=0.8,
+                                    colsample_bytree=0.8, min_child_weight=3, gamma=0.1, reg_alpha=0.1,
+                                    reg_lambda=1.0, random_state=seed)
+    }
+    ensembles = {}
+    for label, model in models.items():
+        model.fit(X_scaled, y_train)
+        ensembles[label] = export_model(model, scaler)
+
+    # Split boundaries are where a folded threshold can go wrong
+    X = [rng.uniform(lower, upper, (rows, 4))]
+    for ensemble in ensembles.values():
+        split = ensemble.left != np.arange(ensemble.n_nodes)
+        for f in range(4):
+            edges = np.unique(ensemble.threshold[split & (ensemble.feature == f)])
+            edges = np.concatenate([np.nextafter(edges, -np.inf), edges, np.nextafter(edges, np.inf)])
+            block = rng.uniform(lower, upper, (len(edges), 4))
+            block[:, f] = edges
+            X.append(block)
+    X = np.concatenate(X)
+
+    results = []
+    stacked = StackedEnsemble(list(ensembles.values())).predict(X)
+    for j, (label, ensemble) in enumerate(ensembles.items()):
+        fos = ensemble.predict(X)
+        traversal = copy.copy(ensemble)
+        traversal.tables = None
+        restored = TreeEnsemble.from_arrays(*ensemble.to_arrays())
+        exact = (np.array_equal(traversal.predict(X), fos) and np.array_equal(restored.predict(X), fos)
+                 and np.array_equal(stacked[:, j], fos))
+        results.append((label, check_parity(ensemble, models[label], scaler, X) if exact else float('inf')))
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import time
+
+    parser = argparse.ArgumentParser(description='Verify and benchmark the compiled tree engine')
+    parser.add_argument('--rows', type=int, default=10000, help='Rows in the parity/batch sample')
+    parser.add_argument('--tolerance', type=float, default=1e-9, help='Maximum allowed absolute difference')
+    parser.add_argument('--self-check', action='store_true',
+                        help='Only check parity on small models fitted here (no app import, no saved models)')
+    args = parser.parse_args()
+
+    if args.self_check:
+        results = self_check(min(args.rows, 2000), args.tolerance)
+        for label, diff in results:
+            print(f"  {'✓' if diff <= args.tolerance else '✗'} {label}: max |engine - model| = {diff:.2e}")
+        raise SystemExit(1 if any(diff > args.tolerance for _, diff in results) else 0)
+
+    # Parity is checked against the pickled models, so do not load the artifact
+    os.environ['FOS_MODEL_ARTIFACT'] = '0'
+    from app import FEATURE_NAMES, FEATURE_RANGES, model_registry
+
+    rng = np.random.default_rng(42)
+    X = np.column_stack([
+        rng.uniform(FEATURE_RANGES[name]['min'], FEATURE_RANGES[name]['max'], args.rows)
+        for name in FEATURE_NAMES
+    ])
+
+    def best_time(fn, repeat):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    version = model_registry.current
+    scaler = version.scaler
+    print(f"Model version: {version.name}")
+
+    failed = False
+    for label, model in (('Gradient Boosting', version.estimators['gradient_boosting']),
+                         ('XGBoost', version.estimators['xgboost'])):
+        ensemble = export_model(model, scaler)
+        diff = check_parity(ensemble, model, scaler, X)
+        status = '✓' if diff <= args.tolerance else '✗'
+        failed |= diff > args.tolerance
+
+        row = X[:1]
+        native_single = best_time(lambda: model.predict(scaler.transform(row)), 200)
+        engine_single = best_time(lambda: ensemble.predict(row), 200)
+        native_batch = best_time(lambda: model.predict(scaler.transform(X)), 5)
+        engine_batch = best_time(lambda: ensemble.predict(X), 5)
+
+        print(f"\n{label}: {ensemble.n_trees} trees, {ensemble.n_nodes} nodes, depth {ensemble.max_depth}")
+        print(f"  {status} Max |engine - model| over {args.rows} rows: {diff:.2e}")
+        print(f"  Single row: native {native_single * 1e6:.0f} µs, engine {engine_single * 1e6:.0f} µs")
+        print(f"  Batch:      native {args.rows / native_batch:,.0f} rows/s, "
+              f"engine {args.rows / engine_batch:,.0f} rows/s")
+
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Compact response encodings for the prediction endpoints.
+
+The Accept header selects the response format:
+
+    application/json                   verbose JSON (default)
+    application/vnd.fos.columnar+json  compact form: one array per output column
+    application/msgpack                compact form as MessagePack
+    application/vnd.fos.float32        FoS values only, little-endian float32
+
+The compact form carries the model metadata and the safety level names once
+per response; rows refer to a safety level by its index (-1 for invalid
+rows, whose FoS is null in JSON and NaN in the binary forms). MessagePack is
+written without the msgpack package: NumPy arrays of floats, small integers
+and booleans are packed in one vectorised step instead of value by value.
+
+Responses are gzip-compressed when the client accepts it and the body is
+large enough (see gzip_body and gzip_chunks).
+"""
+
+import gzip
+import json
+import struct
+import zlib
+
+import numpy as np
+
+# Accept media type -> format name
+FORMATS = {
+    'application/json': 'json',
+    'application/vnd.fos.columnar+json': 'columnar',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/vnd.fos.float32': 'float32',
+    'application/octet-stream': 'float32'
+}
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'columnar': 'application/vnd.fos.columnar+json',
+    'msgpack': 'application/msgpack',
+    'float32': 'application/vnd.fos.float32'
+}
+
+# Response headers describing a float32 body (exposed to browsers via CORS)
+HEADERS = ('X-FoS-Shape', 'X-FoS-Columns')
+
+
+def negotiate(accept):
+    """
+    The format for an Accept header: the served type with the highest
+    q-value, earliest listed on ties. Falls back to 'json' when the header
+    is missing or names nothing served here, so existing clients keep the
+    verbose form.
+    """
+    best, best_q = 'json', 0.0
+    for item in (accept or '').split(','):
+        media_type, _, params = item.partition(';')
+        fmt = FORMATS.get(media_type.strip().lower())
+        if fmt is None:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > best_q:
+            best, best_q = fmt, q
+    return best
+
+
+def encode(payload, fmt):
+    """
+    Encode a compact payload, returning (body bytes, content type, headers)
+
+    NumPy arrays in the payload are written as arrays (nested for 2-D).
+    """
+    if fmt == 'columnar':
+        body = (json.dumps(_plain(payload), sort_keys=True, separators=(',', ':')) + '\n').encode()
+        return body, CONTENT_TYPES[fmt], {}
+    if fmt == 'msgpack':
+        parts = []
+        _pack(payload, parts)
+        return b''.join(parts), CONTENT_TYPES[fmt], {}
+    if fmt == 'float32':
+        return _float32(payload)
+    raise ValueError(f'Unknown response format: {fmt}')
+
+
+def _plain(value):
+    """JSON-ready copy of value: arrays become lists and NaN becomes null"""
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == 'f':
+            nan = np.isnan(value)
+            if nan.any():
+                return np.where(nan, None, value).tolist()
+        return value.tolist()
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _float32(payload):
+    """
+    The FoS values of a compact payload as little-endian float32: the "fos"
+    entry, or one column per model of a batch's "predictions" (row-major)
+    """
+    headers = {}
+    if 'fos' in payload:
+        values = payload['fos']
+    else:
+        names = list(payload['predictions'])
+        values = np.column_stack([payload['predictions'][name]['fos'] for name in names])
+        if len(names) == 1:
+            values = values[:, 0]
+        headers['X-FoS-Columns'] = ','.join(names)
+    values = np.atleast_1d(np.asarray(values, dtype='<f4'))
+    headers['X-FoS-Shape'] = ','.join(str(n) for n in values.shape)
+    return np.ascontiguousarray(values).tobytes(), CONTENT_TYPES['float32'], headers
+
+
+def _length_header(n, fix, fix_limit, codes):
+    """MessagePack length prefix: fix form below fix_limit, else 16 or 32 bit"""
+    if n < fix_limit:
+        return bytes([fix | n])
+    if n < 0x10000:
+        return bytes([codes[0]]) + struct.pack('>H', n)
+    return bytes([codes[1]]) + struct.pack('>I', n)
+
+
+def _array_header(n):
+    return _length_header(n, 0x90, 16, (0xdc, 0xdd))
+
+
+def _pack(value, out):
+    """Append the MessagePack encoding of value to the list out"""
+    if value is None:
+        out.append(b'\xc0')
+    elif value is True or value is False:
+        out.append(b'\xc3' if value else b'\xc2')
+    elif isinstance(value, np.ndarray):
+        _pack_array(value, out)
+    elif isinstance(value, np.generic):
+        _pack(value.item(), out)
+    elif isinstance(value, int):
+        if 0 <= value < 0x80 or -32 <= value < 0:
+            out.append(struct.pack('b', value) if value < 0 else bytes([value]))
+        elif value < 0:
+            out.append(b'\xd3' + struct.pack('>q', value))
+        else:
+            out.append(b'\xcf' + struct.pack('>Q', value))
+    elif isinstance(value, float):
+        out.append(b'\xcb' + struct.pack('>d', value))
+    elif isinstance(value, str):
+        data = value.encode()
+        if len(data) < 32:
+            out.append(bytes([0xa0 | len(data)]))
+        elif len(data) < 0x100:
+            out.append(bytes([0xd9, len(data)]))
+        else:
+            out.append(_length_header(len(data), 0, 0, (0xda, 0xdb)))
+        out.append(data)
+    elif isinstance(value, dict):
+        out.append(_length_header(len(value), 0x80, 16, (0xde, 0xdf)))
+        for key, item in value.items():
+            _pack(str(key), out)
+            _pack(item, out)
+    elif isinstance(value, (list, tuple)):
+        out.append(_array_header(len(value)))
+        for item in value:
+            _pack(item, out)
+    else:
+        raise TypeError(f'Cannot encode {type(value).__name__} as MessagePack')
+
+
+def _element_bytes(flat):
+    """
+    (size, width) uint8 matrix holding the MessagePack encoding of each
+    element of a 1-D array, or None for dtypes packed value by value
+    """
+    n = len(flat)
+    if flat.dtype.kind == 'b':
+        return np.where(flat, 0xc3, 0xc2).astype(np.uint8).reshape(n, 1)
+    if flat.dtype.kind in 'iu':
+        if flat.min() >= -32 and flat.max() < 0x80:
+            # Positive and negative fixints: the value is its own encoding
+            return flat.astype(np.int8).view(np.uint8).reshape(n, 1)
+        code, dtype = 0xd3, '>i8'
+    elif flat.dtype.kind == 'f':
+        code, dtype = 0xcb, '>f8'
+    else:
+        return None
+    elements = np.empty((n, 9), dtype=np.uint8)
+    elements[:, 0] = code
+    elements[:, 1:] = flat.astype(dtype).view(np.uint8).reshape(n, 8)
+    return elements
+
+
+def _pack_array(array, out):
+    """Pack an N-D array as nested MessagePack arrays with NumPy"""
+    elements = _element_bytes(array.reshape(-1)) if array.size else None
+    if elements is None:
+        _pack(array.tolist(), out)
+        return
+    # Prefix every innermost row with its array header, then every row of
+    # the next dimension, and so on outwards
+    blocks = elements
+    for dim in reversed(array.shape[1:]):
+        blocks = blocks.reshape(-1, dim * blocks.shape[1])
+        header = np.frombuffer(_array_header(dim), dtype=np.uint8)
+        blocks = np.hstack([np.broadcast_to(header, (len(blocks), len(header))), blocks])
+    out.append(_array_header(array.shape[0]))
+    out.append(blocks.tobytes())
+
+
+def accepts_gzip(accept_encoding):
+    """True when an Accept-Encoding header allows gzip"""
+    for item in (accept_encoding or '').split(','):
+        coding, _, params = item.partition(';')
+        if coding.strip().lower() in ('gzip', '*'):
+            return params.replace(' ', '').lower() not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def gzip_body(body, level):
+    """gzip a complete response body (mtime 0, so equal bodies compress equally)"""
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def gzip_chunks(chunks, level):
+    """gzip a streamed response (an iterable of str or bytes chunks) as it is produced"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()